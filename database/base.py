@@ -12,6 +12,7 @@ from sqlalchemy.orm import (
     Mapped,
     declared_attr,
     mapped_column,
+    query_expression,
     relationship,
 )
 from sqlalchemy.sql import func
@@ -125,7 +126,7 @@ class PlanBase(VersionedBase):
     # is it worth the trouble?
     exported_at: Mapped[Optional[datetime]]
 
-    lifecycle_status_id: Mapped[uuid.UUID] = mapped_column(
+    lifecycle_status_id: Mapped[str] = mapped_column(
         ForeignKey("codes.lifecycle_status.id", name="plan_lifecycle_status_id_fkey"),
         index=True,
     )
@@ -143,6 +144,7 @@ class PlanBase(VersionedBase):
         return relationship(
             "LifeCycleDate",
             back_populates=f"{cls.__tablename__}",
+            order_by="LifeCycleDate.starting_at",
             lazy="joined",
             cascade="all, delete-orphan",
             passive_deletes=True,
@@ -177,7 +179,7 @@ class PlanObjectBase(PlanBase):
     height_unit: Mapped[Optional[str]]
     height_reference_point: Mapped[Optional[str]]
     ordering: Mapped[Optional[int]]
-    type_of_underground_id: Mapped[uuid.UUID] = mapped_column(
+    type_of_underground_id: Mapped[str] = mapped_column(
         ForeignKey("codes.type_of_underground.id", name="type_of_underground_id_fkey"),
         index=True,
     )
@@ -185,6 +187,12 @@ class PlanObjectBase(PlanBase):
         ForeignKey("hame.plan.id", name="plan_id_fkey"), index=True
     )
 
+    # GeoJSON geometry is only present if it is queried from the database
+    # with_expression.
+    @declared_attr
+    def geojson(cls) -> Mapped[Optional[Dict[str, Any]]]:  # noqa
+        return query_expression()
+
     # class reference in abstract base class, with backreference to class name
     # Let's load all the codes for objects joined.
     @declared_attr
@@ -1,8 +1,8 @@
-from typing import List, Type
+from typing import Dict, List, Tuple, Type
 
 from geoalchemy2 import Geometry
 from models import Base, CodeBase
-from sqlalchemy import Column, ForeignKey, Table, Uuid
+from sqlalchemy import Column, ForeignKey, Table, Uuid, literal, select, union_all
 from sqlalchemy.orm import Mapped, Session, relationship
 from sqlalchemy.sql import func
 
@@ -409,6 +409,59 @@ def get_code_uri(code_class: Type[CodeBase], value: str) -> str:
     return code_class(value=value).uri
 
 
+# Values and URIs of all codes by code id. Codes are loaded once per process, so
+# that plan data may refer to codes by id without joining the code tables.
+code_registry: Dict[str, Tuple[str, str]] = dict()
+# Version of the code lists the registry was loaded from. Other processes may change
+# the codes, so the registry must be loaded again if the version has changed.
+code_registry_version = ""
+
+
+def get_code_classes() -> List[Type[CodeBase]]:
+    """
+    Get all code classes.
+    """
+    return [
+        mapper.class_
+        for mapper in Base.registry.mappers
+        if issubclass(mapper.class_, CodeBase)
+    ]
+
+
+def load_code_registry(session: Session, version: str = "") -> None:
+    """
+    Load values and URIs of all codes in the database to the code registry, and
+    record the version of the code lists the codes were loaded from.
+    """
+    global code_registry, code_registry_version
+    code_classes = {
+        code_class.__tablename__: code_class for code_class in get_code_classes()
+    }
+    # Fetch all code lists with a single query.
+    code_query = union_all(
+        *[
+            select(literal(table), code_class.id, code_class.value)
+            for table, code_class in code_classes.items()
+        ]
+    )
+    # Replace the whole registry at once, so concurrent readers never see it
+    # half loaded.
+    code_registry = {
+        code_id: (value, get_code_uri(code_classes[table], value))
+        for table, code_id, value in session.execute(code_query)
+    }
+    code_registry_version = version
+
+
+def invalidate_code_registry() -> None:
+    """
+    Empty the code registry, so that codes are loaded again when they are needed.
+    """
+    global code_registry, code_registry_version
+    code_registry = dict()
+    code_registry_version = ""
+
+
 decisionmaker_by_status = {
     # TODO: Decisionmaker may depend on lifecycle status.
     str(i).zfill(2): "01"
@@ -1,9 +1,21 @@
 import enum
 import json
+import logging
 import os
-from typing import Dict, List, Optional, Tuple, Type
+import re
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
 
 import boto3
+import psycopg2
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine, make_url
+
+LOGGER = logging.getLogger()
+
+R = TypeVar("R")
 
 
 class User(enum.Enum):
@@ -33,6 +45,108 @@ env_credentials = {
 }
 
 
+# Seconds that credentials read from AWS secrets are reused in a warm lambda container
+credentials_ttl = float(os.environ.get("DB_CREDENTIALS_TTL", 900))
+
+# Credentials and the times they were read, and engines by connection string and
+# engine parameters. These are kept between lambda runs as long as the lambda
+# container stays warm.
+cached_credentials: Dict[User, Tuple[Dict[str, str], float]] = dict()
+cached_engines: Dict[Tuple[str, str], Engine] = dict()
+registry_lock = threading.Lock()
+# Handler latencies are logged separately for cold and warm lambda containers
+cold_start = True
+# Postgres rejects connections with outdated passwords with this error
+password_error = re.compile(r'password authentication failed for user "([^"]+)"')
+
+
+def get_engine(connection_string: str, **kwargs: Any) -> Engine:
+    """
+    Return an engine for the connection string and engine parameters. Engines and
+    their connection pools are shared by all callers in the same process.
+    """
+    kwargs.setdefault("pool_pre_ping", True)
+    key = (connection_string, repr(sorted(kwargs.items())))
+    with registry_lock:
+        engine = cached_engines.get(key)
+        if not engine:
+            engine = create_engine(connection_string, **kwargs)
+            cached_engines[key] = engine
+        return engine
+
+
+def drop_engines(username: str) -> None:
+    """
+    Close the connections of all cached engines of the database user, and forget the
+    engines. Must be called with the registry lock held.
+    """
+    for key, engine in list(cached_engines.items()):
+        if make_url(key[0]).username == username:
+            engine.dispose()
+            del cached_engines[key]
+
+
+def invalidate_user(username: str) -> None:
+    """
+    Forget the cached credentials and engines of the database user, e.g. when the
+    password of the user has been changed by another lambda.
+    """
+    with registry_lock:
+        for user, (credentials, _) in list(cached_credentials.items()):
+            if credentials["username"] == username:
+                del cached_credentials[user]
+        drop_engines(username)
+
+
+def retry_after_password_change(handler: Callable[..., R]) -> Callable[..., R]:
+    """
+    Decorator that runs the lambda handler once more, if the database rejects the
+    password cached in the warm lambda container. Passwords may have been changed by
+    db_manager, so the credentials of the user are read again and the engines with
+    the old password are closed.
+    """
+
+    @wraps(handler)
+    def wrapped(*args, **kwargs) -> R:
+        try:
+            return handler(*args, **kwargs)
+        except (exc.OperationalError, psycopg2.OperationalError) as error:
+            match = password_error.search(str(error))
+            if not match:
+                raise
+            LOGGER.warning(f"Password of {match[1]} rejected, reading it again...")
+            invalidate_user(match[1])
+            return handler(*args, **kwargs)
+
+    return wrapped
+
+
+def log_handler_time(start_time: float) -> Tuple[str, float]:
+    """
+    Log the time elapsed since lambda handler start. Returns whether the lambda
+    container was started cold or warm, and the elapsed time. Following handler runs
+    in the same container are logged as warm starts.
+    """
+    global cold_start
+    start = "cold_start" if cold_start else "warm_start"
+    elapsed = round(time.perf_counter() - start_time, 3)
+    LOGGER.info(f"Handler took {elapsed} s ({start.replace('_', ' ')})")
+    cold_start = False
+    return start, elapsed
+
+
+def invalidate_cache() -> None:
+    """
+    Forget all cached credentials and close all cached connections. Must be called
+    when database passwords are changed.
+    """
+    with registry_lock:
+        cached_credentials.clear()
+        for engine in cached_engines.values():
+            engine.dispose()
+        cached_engines.clear()
+
+
 class Db(enum.Enum):
     MAINTENANCE = 1
     MAIN = 2
@@ -48,20 +162,9 @@ class DatabaseHelper:
         """
         # if user is not specified, iterate through all users
         users: List | Type[User] = [user] if user else User
+        self._users: Dict[User, dict]
         if os.environ.get("READ_FROM_AWS", "1") == "1":
-            session = boto3.session.Session()
-            client = session.client(
-                service_name="secretsmanager",
-                region_name=os.environ.get("AWS_REGION_NAME"),
-            )
-            self._users = {
-                user: json.loads(
-                    client.get_secret_value(SecretId=os.environ[user.value])[
-                        "SecretString"
-                    ]
-                )
-                for user in users
-            }
+            self._users = self.get_aws_credentials(users)
         else:
             self._users = {user: env_credentials[user] for user in users}
         self._dbs = {
@@ -72,6 +175,43 @@ class DatabaseHelper:
         self._port = os.environ.get("DB_INSTANCE_PORT", "5432")
         self._region_name = os.environ.get("AWS_REGION_NAME")
 
+    @staticmethod
+    def get_aws_credentials(users: List | Type[User]) -> Dict[User, Dict[str, str]]:
+        """
+        Return user credentials from AWS secrets. Credentials are only read again if
+        they are older than the cache time to live.
+        """
+        with registry_lock:
+            now = time.monotonic()
+            expired_users = [
+                user
+                for user in users
+                if user not in cached_credentials
+                or now - cached_credentials[user][1] > credentials_ttl
+            ]
+            if expired_users:
+                session = boto3.session.Session()
+                client = session.client(
+                    service_name="secretsmanager",
+                    region_name=os.environ.get("AWS_REGION_NAME"),
+                )
+                for user in expired_users:
+                    old_credentials = cached_credentials.get(user, ({}, now))[0]
+                    cached_credentials[user] = (
+                        json.loads(
+                            client.get_secret_value(SecretId=os.environ[user.value])[
+                                "SecretString"
+                            ]
+                        ),
+                        now,
+                    )
+                    # Engines with the old password would fail to connect
+                    if old_credentials and (
+                        old_credentials != cached_credentials[user][0]
+                    ):
+                        drop_engines(old_credentials["username"])
+            return {user: cached_credentials[user][0] for user in users}
+
     def get_connection_parameters(
         self, user: Optional[User] = None, db: Db = Db.MAIN
     ) -> Dict[str, str]:
@@ -1,6 +1,7 @@
 import enum
 import json
 import logging
+import time
 from pathlib import Path
 from typing import Optional, TypedDict
 
@@ -9,7 +10,7 @@ from alembic import command
 from alembic.config import Config
 from alembic.script import ScriptDirectory
 from alembic.util.exc import CommandError
-from db_helper import DatabaseHelper, Db, User
+from db_helper import DatabaseHelper, Db, User, invalidate_cache, log_handler_time
 from psycopg2.sql import SQL, Identifier
 
 """
@@ -246,6 +247,8 @@ def change_passwords(db_helper: DatabaseHelper) -> str:
         change_password(User.READ_WRITE, db_helper, conn)
     finally:
         conn.close()
+    # Old passwords must not be used in this container anymore
+    invalidate_cache()
     msg = "Changed passwords"
     LOGGER.info(msg)
     return msg
@@ -255,6 +258,7 @@ def handler(event: Event, _) -> Response:
     """Handler which is called when accessing the endpoint."""
     # if the code fails before returning response, aws lambda will return http 500
     # with the exception stack trace, as desired.
+    start_time = time.perf_counter()
     response = Response(statusCode=200, body=json.dumps(""))
     db_helper = DatabaseHelper()
     try:
@@ -262,6 +266,7 @@ def handler(event: Event, _) -> Response:
     except KeyError:
         event_type = Action.CREATE_DB
     except ValueError:
+        log_handler_time(start_time)
         return Response(
             statusCode=400,
             body=f"Unknown action {event['action']}.",
@@ -278,4 +283,5 @@ def handler(event: Event, _) -> Response:
         else:
             msg = migrate_hame_db(db_helper)
     response["body"] = json.dumps(msg)
+    log_handler_time(start_time)
     return response
@@ -1,12 +1,18 @@
 import inspect
 import json
 import logging
+import time
 from typing import Any, Dict, List, Optional, Type, TypedDict
 
 import codes
 import requests
-from db_helper import DatabaseHelper, User
-from sqlalchemy import create_engine
+from db_helper import (
+    DatabaseHelper,
+    User,
+    get_engine,
+    log_handler_time,
+    retry_after_password_change,
+)
 from sqlalchemy.orm import Session, sessionmaker
 
 """
@@ -57,7 +63,7 @@ class KoodistotLoader:
     ) -> None:
         if api_url:
             self.api_base = api_url
-        engine = create_engine(connection_string)
+        engine = get_engine(connection_string)
         self.Session = sessionmaker(bind=engine)
 
         # Only load koodistot that have data source defined
@@ -277,13 +283,17 @@ class KoodistotLoader:
                     else:
                         LOGGER.debug(f"Invalid code data {element}")
             session.commit()
+        # Any codes registered in this process may be out of date now
+        codes.invalidate_code_registry()
         msg = f"{len(saved_objects)} inserted or updated. 0 deleted."
         LOGGER.info(msg)
         return msg
 
 
+@retry_after_password_change
 def handler(event: Event, _) -> Response:
     """Handler which is called when accessing the endpoint."""
+    start_time = time.perf_counter()
     response: Response = {"statusCode": 200, "body": json.dumps("")}
     db_helper = DatabaseHelper(user=User.ADMIN)
     load_suomifi_codes = event.get("suomifi_codes", True)
@@ -300,4 +310,5 @@ def handler(event: Event, _) -> Response:
     LOGGER.info("Saving objects...")
     msg = loader.save_objects(objects)
     response["body"] = json.dumps(msg)
+    log_handler_time(start_time)
     return response
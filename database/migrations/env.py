@@ -13,6 +13,8 @@ from models import *  # noqa
 from sqlalchemy import create_engine
 from triggers import (
     generate_add_plan_id_fkey_triggers,
+    generate_invalidate_plan_object_fragment_triggers,
+    generate_mark_plan_changed_triggers,
     generate_modified_at_triggers,
     generate_new_lifecycle_date_triggers,
     generate_new_lifecycle_status_triggers,
@@ -59,6 +61,14 @@ modified_at_trgs, modified_at_trgfuncs = generate_modified_at_triggers()
 
 
 add_plan_id_fkey_trgs, add_plan_id_fkey_trgfuncs = generate_add_plan_id_fkey_triggers()
+(
+    mark_plan_changed_trgs,
+    mark_plan_changed_trgfuncs,
+) = generate_mark_plan_changed_triggers()
+(
+    invalidate_plan_object_fragment_trgs,
+    invalidate_plan_object_fragment_trgfuncs,
+) = generate_invalidate_plan_object_fragment_triggers()
 (
     validate_polygon_geometry_trgs,
     validate_polygon_geometry_trgfuncs,
@@ -77,6 +87,10 @@ imported_triggers = (
     + new_lifecycle_status_trgs
     + add_plan_id_fkey_trgfuncs
     + add_plan_id_fkey_trgs
+    + mark_plan_changed_trgfuncs
+    + mark_plan_changed_trgs
+    + invalidate_plan_object_fragment_trgfuncs
+    + invalidate_plan_object_fragment_trgs
     + validate_polygon_geometry_trgfuncs
     + validate_polygon_geometry_trgs
     + [trg_validate_line_geometry]
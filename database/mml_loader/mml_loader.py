@@ -11,10 +11,15 @@ from xml.etree import ElementTree
 import pygml
 import requests
 from codes import AdministrativeRegion, Municipality
-from db_helper import DatabaseHelper, User
+from db_helper import (
+    DatabaseHelper,
+    User,
+    get_engine,
+    log_handler_time,
+    retry_after_password_change,
+)
 from geoalchemy2.shape import from_shape
 from shapely.geometry import MultiPolygon, shape
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 """
@@ -56,7 +61,7 @@ class MMLLoader:
             self.api_base = api_url
         self.api_key = api_key
 
-        engine = create_engine(connection_string)
+        engine = get_engine(connection_string)
         self.Session = sessionmaker(bind=engine)
         LOGGER.info("Loader initialized")
 
@@ -202,8 +207,10 @@ class MMLLoader:
         return msg
 
 
+@retry_after_password_change
 def handler(event, _) -> Response:
     """Handler which is called when accessing the endpoint."""
+    start_time = time.perf_counter()
     response: Response = {"statusCode": 200, "body": json.dumps("")}
     db_helper = DatabaseHelper(user=User.ADMIN)
     api_key = os.environ.get("MML_APIKEY")
@@ -219,4 +226,5 @@ def handler(event, _) -> Response:
     LOGGER.info("Saving objects...")
     msg = loader.save_geometries(geoms)
     response["body"] = json.dumps(msg)
+    log_handler_time(start_time)
     return response
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 # we have to import CodeBase in codes.py from here to allow two-way relationships
 from base import (  # noqa
@@ -15,7 +15,8 @@ from base import (  # noqa
 )
 from shapely.geometry import MultiLineString, MultiPoint, MultiPolygon
 from sqlalchemy import Column, ForeignKey, Index, Table, Uuid
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.orm import Mapped, mapped_column, query_expression, relationship
 from sqlalchemy.sql import func
 
 regulation_group_association = Table(
@@ -130,7 +131,7 @@ class Plan(PlanBase):
         "Organisation", backref="plans", lazy="joined"
     )
 
-    plan_type_id: Mapped[uuid.UUID] = mapped_column(
+    plan_type_id: Mapped[str] = mapped_column(
         ForeignKey("codes.plan_type.id", name="plan_type_id_fkey")
     )
     # Let's load all the codes for objects joined.
@@ -162,11 +163,23 @@ class Plan(PlanBase):
     matter_management_identifier: Mapped[Optional[str]]
     record_number: Mapped[Optional[str]]
     geom: Mapped[MultiPolygon]
+    # GeoJSON geometry is only present if it is queried from the database
+    # with_expression.
+    geojson: Mapped[Optional[Dict[str, Any]]] = query_expression()
     # Only plan should have validated_at field, since validation is only done
     # for complete plan objects. Also validation errors might concern multiple
     # models, not just one field or one table in database.
     validated_at: Mapped[Optional[datetime]]
     validation_errors: Mapped[Optional[dict[str, str]]]
+    # Digest of the validated plan data and code lists, and the validation response.
+    # If neither plan data nor code lists have changed, the plan need not be
+    # validated again.
+    validation_digest: Mapped[Optional[str]]
+    validation_response: Mapped[Optional[dict[str, str]]]
+    # Last known state of the plan matter in Ryhti: permanent identifier, phase keys
+    # by lifecycle status and digest of the exported phase. Plan matter phases can
+    # be written without fetching the plan matter first.
+    plan_matter_state: Mapped[Optional[dict[str, str]]]
     to_be_exported: Mapped[bool] = mapped_column(server_default="f")
 
     general_plan_regulation_groups: Mapped[List["PlanRegulationGroup"]] = relationship(
@@ -270,7 +283,7 @@ class PlanRegulationGroup(VersionedBase):
     ordering: Mapped[Optional[int]]
 
     # värikoodi?
-    type_of_plan_regulation_group_id: Mapped[uuid.UUID] = mapped_column(
+    type_of_plan_regulation_group_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.type_of_plan_regulation_group.id",
             name="type_of_plan_regulation_group_id_fkey",
@@ -361,7 +374,7 @@ class AdditionalInformation(VersionedBase, AttributeValueMixin):
         ),
         index=True,
     )
-    type_additional_information_id: Mapped[uuid.UUID] = mapped_column(
+    type_additional_information_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.type_of_additional_information.id",
             name="type_additional_information_id_fkey",
@@ -427,12 +440,12 @@ class PlanRegulation(PlanBase, AttributeValueMixin):
         )
     )
 
-    type_of_plan_regulation_id: Mapped[uuid.UUID] = mapped_column(
+    type_of_plan_regulation_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.type_of_plan_regulation.id", name="type_of_plan_regulation_id_fkey"
         )
     )
-    plan_theme_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+    plan_theme_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey("codes.plan_theme.id", name="plan_theme_id_fkey")
     )
     plan_regulation_group: Mapped[PlanRegulationGroup] = relationship(
@@ -487,7 +500,7 @@ class PlanProposition(PlanBase):
             ondelete="CASCADE",
         )
     )
-    plan_theme_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+    plan_theme_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey("codes.plan_theme.id", name="plan_theme_id_fkey")
     )
 
@@ -507,7 +520,7 @@ class SourceData(VersionedBase):
 
     __tablename__ = "source_data"
 
-    type_of_source_data_id: Mapped[uuid.UUID] = mapped_column(
+    type_of_source_data_id: Mapped[str] = mapped_column(
         ForeignKey("codes.type_of_source_data.id", name="type_of_source_data_id_fkey")
     )
     plan_id: Mapped[uuid.UUID] = mapped_column(
@@ -533,10 +546,10 @@ class Organisation(VersionedBase):
 
     name: Mapped[Optional[language_str]]
     business_id: Mapped[str]
-    municipality_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+    municipality_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey("codes.municipality.id", name="municipality_id_fkey")
     )
-    administrative_region_id: Mapped[uuid.UUID] = mapped_column(
+    administrative_region_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.administrative_region.id", name="administrative_region_id_fkey"
         )
@@ -555,26 +568,26 @@ class Document(VersionedBase):
 
     __tablename__ = "document"
 
-    type_of_document_id: Mapped[uuid.UUID] = mapped_column(
+    type_of_document_id: Mapped[str] = mapped_column(
         ForeignKey("codes.type_of_document.id", name="type_of_document_id_fkey")
     )
     plan_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("hame.plan.id", name="plan_id_fkey", ondelete="CASCADE")
     )
-    category_of_publicity_id: Mapped[uuid.UUID] = mapped_column(
+    category_of_publicity_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.category_of_publicity.id", name="category_of_publicity_id_fkey"
         )
     )
-    personal_data_content_id: Mapped[uuid.UUID] = mapped_column(
+    personal_data_content_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.personal_data_content.id", name="personal_data_content_id_fkey"
         )
     )
-    retention_time_id: Mapped[uuid.UUID] = mapped_column(
+    retention_time_id: Mapped[str] = mapped_column(
         ForeignKey("codes.retention_time.id", name="retention_time_id_fkey")
     )
-    language_id: Mapped[uuid.UUID] = mapped_column(
+    language_id: Mapped[str] = mapped_column(
         ForeignKey("codes.language.id", name="language_id_fkey")
     )
 
@@ -597,6 +610,8 @@ class Document(VersionedBase):
     exported_at: Mapped[Optional[datetime]]
     # Ryhti key for the latest file version that was uploaded:
     exported_file_key: Mapped[Optional[uuid.UUID]]
+    # Checksum of the latest file version that was uploaded:
+    exported_file_checksum: Mapped[Optional[str]]
     arrival_date: Mapped[Optional[datetime]]
     confirmation_date: Mapped[Optional[datetime]]
     decision: Mapped[bool]
@@ -612,7 +627,7 @@ class LifeCycleDate(VersionedBase):
 
     __tablename__ = "lifecycle_date"
 
-    lifecycle_status_id: Mapped[uuid.UUID] = mapped_column(
+    lifecycle_status_id: Mapped[str] = mapped_column(
         ForeignKey(
             "codes.lifecycle_status.id",
             name="plan_lifecycle_status_id_fkey",
@@ -714,18 +729,18 @@ class EventDate(VersionedBase):
         ),
         index=True,
     )
-    decision_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+    decision_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey(
             "codes.name_of_plan_case_decision.id",
             name="name_of_plan_case_decision_id_fkey",
         )
     )
-    processing_event_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+    processing_event_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey(
             "codes.type_of_processing_event.id", name="type_of_processing_event_fkey"
         )
     )
-    interaction_event_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+    interaction_event_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey(
             "codes.type_of_interaction_event.id", name="type_of_interaction_event_fkey"
         )
@@ -747,3 +762,49 @@ class EventDate(VersionedBase):
 
     starting_at: Mapped[datetime]
     ending_at: Mapped[Optional[datetime]]
+
+
+class PlanChange(VersionedBase):
+    """
+    Muuttunut kaava
+
+    Plans that have changed since they were last processed by Ryhti client. Rows are
+    added by database triggers whenever a plan or any of its related objects are
+    created, updated or deleted.
+    """
+
+    __tablename__ = "plan_change"
+
+    plan_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("hame.plan.id", name="plan_id_fkey", ondelete="CASCADE"),
+        unique=True,
+        comment="Plan that has changed",
+    )
+
+
+class PlanObjectFragment(VersionedBase):
+    """
+    Kaavakohteen Ryhti-sanoma
+
+    Ryhti JSON of a plan object, serialized by Ryhti client from the plan object as
+    it was at object_modified_at, with the code lists at code_list_version. Fragments
+    of plan objects that have not been modified since, and whose code lists have not
+    changed, are reused instead of serialized again. Rows are deleted by
+    database triggers when the plan object is deleted or its lifecycle dates change.
+    """
+
+    __tablename__ = "plan_object_fragment"
+
+    plan_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("hame.plan.id", name="plan_id_fkey", ondelete="CASCADE"),
+        index=True,
+    )
+    # Plan object may be in any of the plan object tables
+    plan_object_id: Mapped[uuid.UUID] = mapped_column(
+        unique=True, comment="Serialized plan object"
+    )
+    object_modified_at: Mapped[datetime]
+    # Fragments contain code URIs, so they must be serialized again if codes change
+    code_list_version: Mapped[Optional[str]]
+    # Plain JSON keeps the keys in the order Ryhti client serialized them
+    fragment: Mapped[Dict[str, Any]] = mapped_column(JSON)
@@ -1,14 +1,43 @@
+import base64
 import datetime
 import email.utils
 import enum
+import gc
+import gzip
+import hashlib
+import inspect
 import logging
 import os
-from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Type, TypedDict, cast
+import random
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NotRequired,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypedDict,
+    TypeVar,
+    cast,
+)
 from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 import base
 import boto3
+import codes
 import models
 import requests
 import simplejson as json  # type: ignore
@@ -23,16 +52,44 @@ from codes import (
     interaction_events_by_status,
     processing_events_by_status,
 )
-from db_helper import DatabaseHelper, User
+from db_helper import (
+    DatabaseHelper,
+    User,
+    get_engine,
+    log_handler_time,
+    retry_after_password_change,
+)
 from enums import AttributeValueDataType
 from geoalchemy2 import Geometry
 from geoalchemy2.shape import to_shape
+from jsonschema import Draft202012Validator
+from requests.adapters import HTTPAdapter
 from shapely import to_geojson
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Query, sessionmaker
-
-if TYPE_CHECKING:
-    import uuid
+from sqlalchemy import (
+    JSON,
+    Text,
+    case,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import (
+    Query,
+    Session,
+    joinedload,
+    lazyload,
+    selectinload,
+    sessionmaker,
+    with_expression,
+)
+from sqlalchemy.orm.attributes import set_committed_value
 
 """
 Client for validating and POSTing all Maakuntakaava data to Ryhti API
@@ -52,9 +109,6 @@ LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 LOCAL_TZ = ZoneInfo("Europe/Helsinki")
 
-# write access is required to update plan information after
-# validating or POSTing data
-db_helper = DatabaseHelper(user=User.READ_WRITE)
 # Let's fetch the syke secret from AWS secrets, so it cannot be read in plain
 # text when looking at lambda env variables.
 if os.environ.get("READ_FROM_AWS", "1") == "1":
@@ -78,6 +132,123 @@ xroad_port = int(os.environ.get("XROAD_HTTP_PORT", 8080))
 xroad_instance = os.environ.get("XROAD_INSTANCE", "FI-TEST")
 xroad_member_class = os.environ.get("XROAD_MEMBER_CLASS", "MUN")
 xroad_syke_client_id = os.environ.get("XROAD_SYKE_CLIENT_ID", "")
+# Maximum number of concurrent requests to Ryhti API
+max_workers = int(os.environ.get("RYHTI_MAX_WORKERS", 1))
+# Number of plans to process concurrently, each plan moving through all the stages on
+# its own. If zero, each stage is run for all plans before moving on to the next one.
+pipeline_workers = int(os.environ.get("RYHTI_PIPELINE_WORKERS", 0))
+# Number of plans to load and process at a time, releasing each batch before loading
+# the next one. If zero, all plans are loaded at once.
+batch_size = int(os.environ.get("RYHTI_BATCH_SIZE", 0))
+# Number of kept-alive connections to Ryhti public API and X-Road security server
+public_api_pool_size = int(os.environ.get("RYHTI_PUBLIC_API_POOL_SIZE", 10))
+xroad_pool_size = int(os.environ.get("XROAD_POOL_SIZE", 10))
+# Maximum number of X-Road requests in flight at any time, by all stages and plans
+xroad_max_in_flight = int(os.environ.get("XROAD_MAX_IN_FLIGHT", xroad_pool_size))
+# Maximum requests per second to Ryhti public API and X-Road, and the number of
+# requests that may be sent at once after idling. Zero rate means no limit.
+public_api_rate = float(os.environ.get("RYHTI_PUBLIC_API_RATE", 0))
+public_api_burst = int(os.environ.get("RYHTI_PUBLIC_API_BURST", 10))
+xroad_rate = float(os.environ.get("XROAD_RATE", 0))
+xroad_burst = int(os.environ.get("XROAD_BURST", 10))
+# Number of times a request is sent again after Ryhti has throttled it
+throttle_retries = int(os.environ.get("RYHTI_THROTTLE_RETRIES", 3))
+# Seconds to wait after throttling, if the response has no Retry-After header
+throttle_wait = float(os.environ.get("RYHTI_THROTTLE_WAIT", 1))
+# Longest Retry-After in seconds the client will wait for. If Ryhti asks to wait
+# longer, or past the deadline of the run, the plan is left for the next run.
+throttle_max_wait = float(os.environ.get("RYHTI_THROTTLE_MAX_WAIT", 60))
+# Number of times idempotent requests (validation, GET and HEAD) are sent again after
+# connection errors and server errors, and the first and longest backoff in seconds
+retries = int(os.environ.get("RYHTI_RETRIES", 3))
+retry_backoff = float(os.environ.get("RYHTI_RETRY_BACKOFF", 1))
+retry_max_backoff = float(os.environ.get("RYHTI_RETRY_MAX_BACKOFF", 30))
+# Requests to an API fail fast after this many consecutive failed requests. If zero,
+# requests are always sent.
+circuit_breaker_threshold = int(os.environ.get("RYHTI_CIRCUIT_BREAKER_THRESHOLD", 5))
+# Server errors that may go away if the request is sent again
+retry_statuses = {500, 502, 503, 504}
+# Keys that get a new random value every time a plan matter phase is serialized
+generated_keys = {
+    "planMatterPhaseKey",
+    "planDecisionKey",
+    "handlingEventKey",
+    "interactionEventKey",
+    "planReportKey",
+}
+# Seconds to wait for connecting to and reading from Ryhti API and other servers
+connect_timeout = float(os.environ.get("RYHTI_CONNECT_TIMEOUT", 10))
+read_timeout = float(os.environ.get("RYHTI_READ_TIMEOUT", 120))
+# Load all plan data with a fixed number of queries when caching plans
+bulk_load = os.environ.get("RYHTI_BULK_LOAD", "1") == "1"
+# Let PostGIS create GeoJSON geometries when loading plans
+server_side_geojson = os.environ.get("RYHTI_SERVER_SIDE_GEOJSON", "0") == "1"
+# Serialize plans from plain database rows instead of ORM objects
+row_serializer = os.environ.get("RYHTI_ROW_SERIALIZER", "0") == "1"
+# Save serialized plan objects in the database and only serialize modified ones again
+fragment_cache = os.environ.get("RYHTI_FRAGMENT_CACHE", "0") == "1"
+# Number of plan documents to upload concurrently
+document_upload_workers = int(os.environ.get("RYHTI_DOCUMENT_UPLOAD_WORKERS", 1))
+# Downloaded documents larger than this are buffered on disk instead of memory
+document_buffer_size = int(os.environ.get("RYHTI_DOCUMENT_BUFFER_SIZE", 16 * 1024**2))
+# Seconds an X-Road token is assumed to be valid, if the token has no expiry time
+xroad_token_lifetime = float(os.environ.get("XROAD_TOKEN_LIFETIME", 3600))
+# X-Road tokens are refreshed when they are about to expire in this many seconds
+xroad_token_refresh_margin = float(os.environ.get("XROAD_TOKEN_REFRESH_MARGIN", 300))
+# No new stages are started when the lambda has less than this many seconds left
+time_margin = float(os.environ.get("RYHTI_TIME_MARGIN", 30))
+# Check plans and plan matters against the local Ryhti schema before sending them.
+# The local schema is only a hand-written subset of the Ryhti schemas, so this is
+# off by default.
+prevalidate = os.environ.get("RYHTI_PREVALIDATE", "0") == "1"
+# Local subset of the Ryhti plan and plan matter schemas
+schema_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "ryhti_schema.json"
+)
+# Schema error messages are cut to this length
+max_schema_error_length = 300
+
+# X-Road tokens and their expiry times by client id and X-Road instance. Tokens are
+# kept between lambda runs as long as the lambda container stays warm.
+xroad_tokens: Dict[Tuple[str, str], Tuple[str, float]] = dict()
+xroad_token_lock = threading.Lock()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def memoize_fragment(method: Callable[..., Dict]) -> Callable[..., Dict]:
+    """
+    Decorator that makes a RyhtiClient method return the dict it has already built
+    for the same entity during the run. Entities are identified by id and
+    modification time, together with any other arguments.
+
+    Hits and misses are counted in client metrics. Memoized dicts are shared by all
+    the plans that contain them, so they must not be modified.
+    """
+    name = method.__name__.removeprefix("get_")
+
+    @wraps(method)
+    def memoized(
+        self: "RyhtiClient", entity: base.VersionedBase, *args, **kwargs
+    ) -> Dict:
+        key = (
+            name,
+            entity.id,
+            entity.modified_at,
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+        fragment = self.fragments.get(key)
+        self.count_metric(
+            "fragment_hits" if fragment is not None else "fragment_misses", name
+        )
+        if fragment is None:
+            fragment = method(self, entity, *args, **kwargs)
+            self.fragments[key] = fragment
+        return fragment
+
+    return memoized
 
 
 class Action(enum.Enum):
@@ -105,6 +276,8 @@ class ResponseBody(TypedDict):
     title: str
     details: Dict[str, str]
     ryhti_responses: Dict[str, RyhtiResponse]
+    metrics: NotRequired[Dict[str, Any]]
+    continuation_token: NotRequired[str]
 
 
 class Response(TypedDict):
@@ -131,11 +304,37 @@ class Event(TypedDict):
 
     If save_json is true, generated JSON as well as Ryhti API response are saved
     as {plan_id}.json and {plan_id}.response.json in the ryhti_debug directory.
+
+    Plans that have not changed since they were last validated are not validated
+    again, unless force_validation is true.
+
+    If only_changed is true, only plans that have changed in the database since
+    they were last POSTed are processed.
+
+    If the lambda runs out of time before all plans are processed, the response
+    contains a continuation_token. Send the same event with the continuation_token
+    to process the remaining plans.
+
+    When getting plans, page_size limits the number of plans returned at a time. If
+    there may be more plans, the response contains a continuation_token for the next
+    page. Keys listed in exclude (e.g. geometry or planObjects) are left out of the
+    plans at any depth, and coordinates are rounded to coordinate_precision decimals.
+    Responses are gzip compressed if the API Gateway request accepts gzip.
+
+    When getting a single plan through API Gateway, the response has an ETag. If
+    the request has a matching If-None-Match header, 304 is returned without
+    serializing the plan.
     """
 
     action: str  # Action
     plan_uuid: Optional[str]  # UUID for plan to be used
     save_json: Optional[bool]  # True if we want JSON files to be saved in ryhti_debug
+    force_validation: NotRequired[bool]  # True to validate unchanged plans too
+    only_changed: NotRequired[bool]  # True to only process changed plans
+    continuation_token: NotRequired[str]  # Token to resume an unfinished run
+    page_size: NotRequired[int]  # Number of plans to get at a time
+    exclude: NotRequired[List[str]]  # Keys to leave out of the plans we get
+    coordinate_precision: NotRequired[int]  # Decimals to round coordinates to
 
 
 class AWSAPIGatewayPayload(TypedDict):
@@ -147,6 +346,11 @@ class AWSAPIGatewayPayload(TypedDict):
     were contained in the whole HTTPS request, and the event is found in request body.
 
     https://docs.aws.amazon.com/apigateway/latest/developerguide/http-api-develop-integrations-lambda.html
+
+    REST API proxy requests have the same fields, but keep the case of header names,
+    and their bodies are base64 encoded, because the API accepts binary media types.
+
+    https://docs.aws.amazon.com/apigateway/latest/developerguide/set-up-lambda-proxy-integrations.html
     """
 
     version: Literal["2.0"]
@@ -154,6 +358,7 @@ class AWSAPIGatewayPayload(TypedDict):
     queryStringParameters: Dict
     requestContext: Dict
     body: str  # The event is stringified json, we have to jsonify it first
+    isBase64Encoded: bool
 
 
 class AWSAPIGatewayResponse(TypedDict):
@@ -165,6 +370,8 @@ class AWSAPIGatewayResponse(TypedDict):
 
     statusCode: int
     body: str  # Response body must be stringified for API gateway
+    headers: NotRequired[Dict[str, str]]
+    isBase64Encoded: NotRequired[bool]  # True if body is base64 encoded bytes
 
 
 class Period(TypedDict):
@@ -237,6 +444,131 @@ class RyhtiPlanMatter(TypedDict, total=False):
     planMatterPhases: List[RyhtiPlanMatterPhase]
 
 
+class RyhtiUnavailableError(requests.RequestException):
+    """
+    Raised instead of sending a request, when too many requests to the API have
+    failed in a row.
+    """
+
+
+class RyhtiThrottledError(requests.RequestException):
+    """
+    Raised when Ryhti has throttled a request for longer than the client may wait.
+    """
+
+
+def fail_softly(method: Callable[..., RyhtiResponse]) -> Callable[..., RyhtiResponse]:
+    """
+    Decorator that makes a RyhtiClient method, called with a plan or document id,
+    return an error response instead of raising if its requests fail. Other plans
+    can then be processed, and the failed plan is processed again on the next run.
+
+    Failed requests are recorded in client metrics. Plans whose requests were
+    throttled for too long are also marked unfinished, so that the run is continued
+    with them.
+    """
+
+    @wraps(method)
+    def wrapped(self: "RyhtiClient", key: str, *args, **kwargs) -> RyhtiResponse:
+        try:
+            return method(self, key, *args, **kwargs)
+        except requests.RequestException as error:
+            LOGGER.warning(f"Request failed for {key}: {error}")
+            self.failed_requests.add(key)
+            self.record_metric("request_errors", key, str(error))
+            if isinstance(error, RyhtiThrottledError):
+                self.unfinished_plans.add(key)
+            # There are no errors, so the response is saved as unexpected
+            return cast(
+                RyhtiResponse,
+                {
+                    "status": getattr(error.response, "status_code", None),
+                    "title": "Ryhti request failed.",
+                    "detail": str(error),
+                },
+            )
+
+    return wrapped
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failed requests to an API, shared by all the threads of a
+    client. Once the threshold is reached, the circuit stays open for the rest of the
+    run. Zero threshold means the circuit is never opened.
+    """
+
+    def __init__(self, threshold: int) -> None:
+        self.threshold = max(threshold, 0)
+        self.failures = 0
+        self.is_open = False
+        self.lock = threading.Lock()
+
+    def record(self, success: bool) -> None:
+        with self.lock:
+            self.failures = 0 if success else self.failures + 1
+            if self.threshold and self.failures >= self.threshold:
+                self.is_open = True
+
+
+class TokenBucket:
+    """
+    Request rate limiter shared by all the threads of a client. Tokens are added at
+    the given rate per second, up to burst tokens, and each request takes one token.
+    Zero rate means no limit, but the bucket may still be paused after throttling.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = max(rate, 0.0)
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        # No tokens are handed out before this monotonic time
+        self.paused_until = 0.0
+        # Total seconds requests have waited for tokens, and throttled responses
+        self.waited = 0.0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting until one is available. Returns the seconds waited.
+        """
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = self.paused_until - now
+                if delay <= 0:
+                    if not self.rate:
+                        break
+                    self.tokens = min(
+                        self.burst,
+                        self.tokens + (now - self.updated_at) * self.rate,
+                    )
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+        waited = time.monotonic() - start
+        with self.lock:
+            self.waited += waited
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for the given number of seconds. The bucket starts
+        empty after the pause, so that throttled requests are not all sent at once.
+        """
+        with self.lock:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.updated_at = max(self.updated_at, self.paused_until)
+
+
 class RyhtiClient:
     HEADERS = {
         "User-Agent": "ARHO - Open source Ryhti compatible database",
@@ -265,10 +597,60 @@ class RyhtiClient:
         event_type: Action = Action.VALIDATE_PLANS,
         plan_uuid: Optional[str] = None,
         debug_json: Optional[bool] = False,  # save JSON files for debugging
+        max_workers: int = 1,  # maximum number of concurrent requests
+        public_api_pool_size: int = 10,  # connections kept alive to public API
+        xroad_pool_size: int = 10,  # connections kept alive to X-Road server
+        xroad_max_in_flight: int = 10,  # maximum concurrent X-Road requests
+        public_api_rate: Tuple[float, int] = (0, 10),  # requests per second and burst
+        xroad_rate: Tuple[float, int] = (0, 10),  # requests per second and burst
+        throttle_retries: int = 3,  # times to resend throttled requests
+        throttle_max_wait: float = 60,  # longest Retry-After to wait for
+        retries: int = 3,  # times to resend idempotent requests after errors
+        retry_backoff: Tuple[float, float] = (1, 30),  # first and longest backoff
+        circuit_breaker_threshold: int = 5,  # failed requests before failing fast
+        timeout: Tuple[float, float] = (10, 120),  # connect and read timeouts
+        bulk_load: bool = True,  # load all plan data when caching plans
+        server_side_geojson: bool = False,  # load geometries as GeoJSON
+        row_serializer: bool = False,  # serialize plans without ORM objects
+        batch_size: int = 0,  # load and process this many plans at a time
+        fragment_cache: bool = False,  # reuse plan objects serialized in earlier runs
+        force_validation: bool = False,  # validate unchanged plans too
+        only_changed: bool = False,  # only process plans changed since last run
+        document_upload_workers: int = 1,  # maximum number of concurrent uploads
+        deadline: Optional[float] = None,  # monotonic time to stop processing plans
+        prevalidate: bool = False,  # check plans against local schema before sending
+        continuation_token: Optional[str] = None,  # resume an unfinished run
+        page_size: Optional[int] = None,  # only cache this many plans
     ) -> None:
         LOGGER.info("Initializing Ryhti client...")
         self.event_type = event_type
         self.debug_json = debug_json
+        self.max_workers = max(max_workers, 1)
+        self.bulk_load = bulk_load
+        self.server_side_geojson = server_side_geojson
+        self.row_serializer = row_serializer
+        self.batch_size = max(batch_size, 0)
+        self.fragment_cache = fragment_cache
+        self.force_validation = force_validation
+        self.only_changed = only_changed
+        self.document_upload_workers = max(document_upload_workers, 1)
+        self.deadline = deadline
+        self.prevalidate = prevalidate
+        # Plans that were finished in earlier runs, if resuming an unfinished run
+        self.resume_after, self.resume_done = decode_continuation_token(
+            continuation_token
+        )
+        # Last plan of the page, if there may be plans after it
+        self.next_page_after: Optional[str] = None
+        # Plans that could not be finished before the deadline
+        self.unfinished_plans: Set[str] = set()
+        # Request timings and other run statistics, to be returned with the response
+        # Worker threads update the metrics concurrently
+        self.metrics: Dict[str, Dict[str, Any]] = dict()
+        self.metrics_lock = threading.Lock()
+        # Regulation groups, regulations etc. already serialized during the run
+        self.fragments: Dict[Tuple, Dict] = dict()
+        self.fragment_lock = threading.Lock()
 
         # Public API only needs an API key and URL
         if public_api_url:
@@ -288,6 +670,7 @@ class RyhtiClient:
         if xroad_port:
             self.xroad_server_address += ":" + str(xroad_port)
         # X-Road API requires specifying X-Road instance in path
+        self.xroad_instance = xroad_instance
         self.xroad_api_path = "/r1/" + xroad_instance + self.xroad_api_path
         # X-Road API requires headers according to the X-Road REST API spec
         # https://docs.x-road.global/Protocols/pr-rest_x-road_message_protocol_for_rest.html#4-message-format
@@ -299,19 +682,70 @@ class RyhtiClient:
         # will be set later based on these:
         self.xroad_syke_client_id = xroad_syke_client_id
         self.xroad_syke_client_secret = xroad_syke_client_secret
+        # Time after which the token should be refreshed
+        self.xroad_token_refresh_at = 0.0
+
+        # All requests share the same connection pools, so that connections to Ryhti
+        # public API and X-Road security server are kept alive between requests.
+        # Other servers (i.e. plan documents) use the default pool size.
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.http.mount(
+            self.public_api_base,
+            HTTPAdapter(pool_connections=1, pool_maxsize=public_api_pool_size),
+        )
+        if self.xroad_server_address:
+            self.http.mount(
+                self.xroad_server_address,
+                HTTPAdapter(pool_connections=1, pool_maxsize=xroad_pool_size),
+            )
+        # Pipelined plans run their X-Road stages concurrently, so the number of
+        # requests to the security server is limited for the whole client.
+        self.xroad_slots = threading.BoundedSemaphore(max(xroad_max_in_flight, 1))
+        # Requests to each API share a rate limit, so that concurrent requests don't
+        # exceed the API quota. Throttled requests pause all requests to the API.
+        self.rate_limits = {
+            "public_api": TokenBucket(*public_api_rate),
+            "xroad": TokenBucket(*xroad_rate),
+        }
+        self.throttle_retries = max(throttle_retries, 0)
+        self.throttle_max_wait = throttle_max_wait
+        # Idempotent requests are retried, and requests to an API that keeps failing
+        # fail fast instead of holding up the remaining plans.
+        self.retries = max(retries, 0)
+        self.retry_backoff = retry_backoff
+        self.circuit_breakers = {
+            "public_api": CircuitBreaker(circuit_breaker_threshold),
+            "xroad": CircuitBreaker(circuit_breaker_threshold),
+        }
+        # Plans and documents whose requests failed during the run
+        self.failed_requests: Set[str] = set()
 
-        engine = create_engine(connection_string)
-        self.Session = sessionmaker(bind=engine)
+        self.Session = sessionmaker(bind=get_client_engine(connection_string))
         # Cache plans fetched from database
         self.plans: Dict[str, models.Plan] = dict()
         # Cache valid plans after validation, so they can be processed further.
         self.valid_plans: Dict[str, models.Plan] = dict()
+        # Cache digests of validated plan data, so they can be saved with responses.
+        self.plan_digests: Dict[str, str] = dict()
+        # Cache checksums of uploaded documents, so they can be saved with file keys.
+        self.document_checksums: Dict[str, str] = dict()
+        # Plan changes to be cleared after the changed plans have been processed.
+        self.plan_changes: Dict[str, datetime.datetime] = dict()
         # Cache plan dictionaries
         self.plan_dictionaries: Dict[str, RyhtiPlan] = dict()
+        # Cache plan objects serialized in earlier runs, with their modification times
+        self.plan_object_fragments: Dict[
+            str, Tuple[datetime.datetime, Optional[str], Dict]
+        ] = dict()
+        # Plan objects serialized during the run, to be saved in the database
+        self.new_plan_object_fragments: Dict[str, Dict[str, Any]] = dict()
         # Cache plan matter dictionaries
         self.plan_matter_dictionaries: Dict[str, RyhtiPlanMatter] = dict()
         # Cache valid plan matters after validation, so they can be processed further.
         self.valid_plan_matters: Dict[str, RyhtiPlanMatter] = dict()
+        # Known state of plan matters in Ryhti after POST, to be saved with responses.
+        self.plan_matter_states: Dict[str, Dict[str, Any]] = dict()
 
         # We only ever need code uri values, not codes themselves, so let's not bother
         # fetching codes from the database at all. URI is known from class and value.
@@ -335,19 +769,503 @@ class RyhtiClient:
         # and query.
         with self.Session(expire_on_commit=False) as session:
             LOGGER.info("Caching requested plans from database...")
-            # Only process specified plans
-            plan_query: Query = session.query(models.Plan)
+            # Only process specified plans. Plan data of batches are loaded only when
+            # each batch is processed.
+            plan_query = self.get_plan_query(session, load_plan_data=not batch_size)
             if plan_uuid:
                 LOGGER.info(f"Only fetching plan {plan_uuid}")
                 plan_query = plan_query.filter_by(id=plan_uuid)
+            if continuation_token:
+                LOGGER.info(f"Resuming run after plan {self.resume_after}")
+                if self.resume_after:
+                    plan_query = plan_query.filter(models.Plan.id > self.resume_after)
+                if self.resume_done:
+                    plan_query = plan_query.filter(
+                        models.Plan.id.not_in(self.resume_done)
+                    )
+            if self.only_changed:
+                LOGGER.info("Only fetching plans changed since last run")
+                plan_change_query = session.query(models.PlanChange)
+                if plan_uuid:
+                    plan_change_query = plan_change_query.filter_by(plan_id=plan_uuid)
+                self.plan_changes = {
+                    str(plan_change.plan_id): plan_change.modified_at
+                    for plan_change in plan_change_query.all()
+                }
+                plan_query = plan_query.filter(
+                    models.Plan.id.in_(self.plan_changes.keys())
+                )
+            # Plans are always processed in the same order, so that unfinished runs
+            # can be resumed from the first unfinished plan.
+            plan_query = plan_query.order_by(models.Plan.id)
+            if page_size:
+                plan_query = plan_query.limit(page_size)
             self.plans = {plan.id: plan for plan in plan_query.all()}
+            if page_size and len(self.plans) == page_size:
+                self.next_page_after = next(reversed(self.plans))
+            if not batch_size:
+                self.load_plan_object_fragments(session, self.plans.keys())
+        # Original order of plans, as finished plans may be released from the client
+        self.plan_order = list(self.plans)
         if not self.plans:
             LOGGER.info("No plans found in database.")
         else:
             LOGGER.info("Client initialized with plans to process:")
             LOGGER.info(self.plans)
+        # Plans must be validated again if code lists have changed.
+        self.code_list_version = ""
+        if self.plans:
+            self.code_list_version = self.get_code_list_version()
+            # Codes may have been changed by another process since the code registry
+            # was loaded in an earlier run.
+            if codes.code_registry_version != self.code_list_version:
+                codes.invalidate_code_registry()
+
+    def get_plan_query(self, session: Session, load_plan_data: bool = True) -> Query:
+        """
+        Returns the query for caching plans in the client. If load_plan_data is set,
+        all plan data are loaded with the plans, if bulk loading is enabled.
+        """
+        plan_query: Query = session.query(models.Plan).options(
+            *self.get_code_load_options(models.Plan),
+            joinedload(models.Plan.organisation).options(
+                *self.get_code_load_options(models.Organisation)
+            ),
+        )
+        # Plan data need not be loaded if plans are only serialized from rows
+        if (
+            load_plan_data
+            and self.bulk_load
+            and not (self.row_serializer and self.event_type is Action.GET_PLANS)
+        ):
+            plan_query = plan_query.options(*self.get_plan_load_options())
+        if self.server_side_geojson:
+            plan_query = plan_query.options(
+                with_expression(
+                    models.Plan.geojson,
+                    self.get_geojson_expression(models.Plan.geom),
+                )
+            )
+        return plan_query
+
+    def load_plan_object_fragments(
+        self, session: Session, plan_ids: Iterable[str]
+    ) -> None:
+        """
+        Cache the plan objects of the given plans serialized in earlier runs, if the
+        fragment cache is enabled.
+        """
+        plan_ids = list(plan_ids)
+        if not self.fragment_cache or not plan_ids:
+            return
+        LOGGER.info("Caching serialized plan objects from database...")
+        fragment_query = select(
+            models.PlanObjectFragment.plan_object_id,
+            models.PlanObjectFragment.object_modified_at,
+            models.PlanObjectFragment.code_list_version,
+            models.PlanObjectFragment.fragment,
+        ).where(models.PlanObjectFragment.plan_id.in_(plan_ids))
+        self.plan_object_fragments |= {
+            row.plan_object_id: (
+                row.object_modified_at,
+                row.code_list_version,
+                row.fragment,
+            )
+            for row in session.execute(fragment_query)
+        }
+
+    def load_plans(self, plan_ids: List[str]) -> None:
+        """
+        Replace the given plans cached in the client with plans that have all their
+        data loaded.
+        """
+        LOGGER.info(f"Caching data of {len(plan_ids)} plans from database...")
+        with self.Session(expire_on_commit=False) as session:
+            plan_query = self.get_plan_query(session).filter(
+                models.Plan.id.in_(plan_ids)
+            )
+            self.plans |= {plan.id: plan for plan in plan_query.all()}
+            self.load_plan_object_fragments(session, plan_ids)
+
+    def get_plan_batches(self) -> Iterator[List[str]]:
+        """
+        Yield the plans in the client in batches of batch_size plans. Data of each
+        batch are loaded before the batch is yielded, and all cached data of the
+        batch are released when the next batch is requested, so that only a single
+        batch is kept in memory at a time.
+
+        Peak memory usage of the process after each batch is recorded in client
+        metrics. Batches are not loaded once the deadline has passed.
+        """
+        plan_ids = list(self.plans)
+        # Plans of each batch are loaded again with all their data, so plans of the
+        # other batches need not be kept in the meantime.
+        self.plans = dict()
+        for index in range(0, len(plan_ids), self.batch_size):
+            batch = plan_ids[index : index + self.batch_size]
+            if not self.out_of_time(batch):
+                self.load_plans(batch)
+                yield batch
+            for plan_id in batch:
+                self.release_plan(plan_id)
+            with self.fragment_lock:
+                self.fragments = dict()
+            self.plan_object_fragments = dict()
+            # ORM objects refer to each other, so they are only freed by the collector
+            gc.collect()
+            self.record_peak_memory("batch", str(index // self.batch_size))
+
+    def record_peak_memory(self, stage: str, key: str) -> None:
+        """
+        Record the peak resident set size of the process so far for the given stage
+        and key (e.g. batch number) in client metrics.
+        """
+        # Linux reports maximum resident set size in kilobytes
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.record_metric(f"{stage}_peak_rss_mb", key, round(peak_mb, 1))
+        LOGGER.info(f"Peak memory usage after {stage} {key} is {peak_mb:.1f} MB")
+
+    def clear_plan_changes(self) -> None:
+        """
+        Remove processed plans from the queue of changed plans.
+
+        Plans that have changed again while we were processing them, that were
+        not finished before the deadline, or whose requests failed, stay in the
+        queue, so they will be processed on the next run.
+        """
+        plan_changes = {
+            plan_id: modified_at
+            for plan_id, modified_at in self.plan_changes.items()
+            if plan_id not in self.unfinished_plans
+            and plan_id not in self.failed_requests
+        }
+        if not plan_changes:
+            return
+        LOGGER.info("Clearing processed plan changes...")
+        with self.Session() as session:
+            session.execute(
+                delete(models.PlanChange).where(
+                    tuple_(
+                        models.PlanChange.plan_id, models.PlanChange.modified_at
+                    ).in_(plan_changes.items())
+                )
+            )
+            session.commit()
+
+    def get_code_list_version(self) -> str:
+        """
+        Returns digest of the values and statuses of all codes in the database.
+        """
+        with self.Session() as session:
+            return get_code_list_version(session)
+
+    def get_code(self, code_id: str) -> Tuple[str, str]:
+        """
+        Returns value and URI of the code with the given id. Codes are only fetched
+        from the database if the code is not found in the code registry, i.e. if the
+        registry is empty, the code lists have changed since the registry was loaded
+        or the code has been added after the registry was loaded.
+        """
+        code = codes.code_registry.get(code_id)
+        if code is None:
+            with self.Session() as session:
+                codes.load_code_registry(session, self.code_list_version)
+            code = codes.code_registry[code_id]
+        return code
+
+    def get_code_value_by_id(self, code_id: str) -> str:
+        """
+        Returns value of the code with the given id.
+        """
+        return self.get_code(code_id)[0]
+
+    def get_code_uri_by_id(self, code_id: str) -> str:
+        """
+        Returns URI of the code with the given id.
+        """
+        return self.get_code(code_id)[1]
+
+    def get_plan_digest(self, plan_dict: RyhtiPlan, parameters: Dict) -> str:
+        """
+        Returns digest of the plan dictionary, the validation parameters and the code
+        lists. If plans are checked against the local schema, the schema version is
+        included too, so that plans are validated again when the schema changes or
+        prevalidation is turned off.
+        """
+        digest_data = {
+            "plan": plan_dict,
+            "parameters": parameters,
+            "code_lists": self.code_list_version,
+        }
+        if self.prevalidate:
+            digest_data["schema"] = get_schema_version()
+        plan_data = json.dumps(digest_data, sort_keys=True)
+        return hashlib.sha256(plan_data.encode()).hexdigest()
+
+    def get_plan_load_options(self) -> List[Any]:
+        """
+        Return loader options that fetch all plan data needed for serializing plans
+        and plan matters.
+
+        All one-to-many and many-to-many relations are loaded with separate selectin
+        queries for all the plans at once, instead of joining them in ever wider row
+        sets. Therefore, the number of queries stays the same no matter how many
+        plans or plan objects there are. Codes are not loaded at all, they are found
+        in the code registry instead.
+        """
+
+        def lifecycle_dates(attribute: Any) -> Any:
+            return selectinload(attribute).options(
+                *self.get_code_load_options(models.LifeCycleDate),
+                selectinload(models.LifeCycleDate.event_dates).options(
+                    *self.get_code_load_options(models.EventDate)
+                ),
+            )
+
+        def regulation_groups(attribute: Any) -> Any:
+            return selectinload(attribute).options(
+                *self.get_code_load_options(models.PlanRegulationGroup),
+                selectinload(models.PlanRegulationGroup.plan_regulations).options(
+                    *self.get_code_load_options(models.PlanRegulation),
+                    lifecycle_dates(models.PlanRegulation.lifecycle_dates),
+                    selectinload(
+                        models.PlanRegulation.types_of_verbal_plan_regulations
+                    ),
+                    selectinload(models.PlanRegulation.additional_information).options(
+                        *self.get_code_load_options(models.AdditionalInformation)
+                    ),
+                ),
+                selectinload(models.PlanRegulationGroup.plan_propositions).options(
+                    *self.get_code_load_options(models.PlanProposition),
+                    lifecycle_dates(models.PlanProposition.lifecycle_dates),
+                ),
+            )
+
+        def plan_objects(plan_object_class: Type[base.PlanObjectBase]) -> Any:
+            options = [
+                *self.get_code_load_options(plan_object_class),
+                lifecycle_dates(plan_object_class.lifecycle_dates),
+                regulation_groups(plan_object_class.plan_regulation_groups),
+            ]
+            if self.server_side_geojson:
+                options.append(
+                    with_expression(
+                        plan_object_class.geojson,
+                        self.get_geojson_expression(plan_object_class.geom),  # type: ignore # noqa
+                    )
+                )
+            return selectinload(
+                getattr(models.Plan, f"{plan_object_class.__tablename__}s")
+            ).options(*options)
+
+        plan_object_options = [
+            plan_objects(plan_object_class)
+            for plan_object_class in (
+                models.LandUseArea,
+                models.OtherArea,
+                models.Line,
+                models.LandUsePoint,
+                models.OtherPoint,
+            )
+        ]
+        return [
+            selectinload(models.Plan.documents).options(
+                *self.get_code_load_options(models.Document)
+            ),
+            selectinload(models.Plan.legal_effects_of_master_plan),
+            lifecycle_dates(models.Plan.lifecycle_dates),
+            regulation_groups(models.Plan.general_plan_regulation_groups),
+            *plan_object_options,
+        ]
+
+    def get_code_load_options(self, entity: Type[base.Base]) -> List[Any]:
+        """
+        Return loader options that skip joining the code tables of the given class.
+        Codes are found in the code registry by id instead.
+
+        Many-to-many code relations cannot be found by id, so they are still loaded.
+        """
+        return [
+            lazyload(getattr(entity, relationship.key))
+            for relationship in entity.__mapper__.relationships
+            if issubclass(relationship.mapper.class_, codes.CodeBase)
+            and relationship.secondary is None
+        ]
+
+    def request(
+        self, method: str, url: str, retry: Optional[bool] = None, **kwargs
+    ) -> requests.Response:
+        """
+        Make a request using the pooled connections of the client. Client timeouts
+        are used unless another timeout is given.
+
+        Idempotent requests are sent again after connection errors and server errors,
+        with jittered exponential backoff. GET and HEAD requests are retried unless
+        retry is False, other requests only if retry is True. Retries are not
+        started if they would pass the deadline of the run.
+
+        If too many requests to Ryhti API have failed in a row, RyhtiUnavailableError
+        is raised without sending the request.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if retry is None:
+            retry = method in ("GET", "HEAD")
+        api = self.get_api(url)
+        breaker = self.circuit_breakers[api] if api else None
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            if breaker and breaker.is_open:
+                raise RyhtiUnavailableError(
+                    f"Too many failed requests to {api}, not sending request to {url}"
+                )
+            error: Optional[requests.RequestException] = None
+            try:
+                response = self.request_once(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as request_error:
+                error = request_error
+            else:
+                if response.status_code not in retry_statuses:
+                    if breaker:
+                        breaker.record(success=True)
+                    return response
+            if breaker:
+                breaker.record(success=False)
+            if attempt == attempts - 1:
+                break
+            first_backoff, max_backoff = self.retry_backoff
+            backoff = min(first_backoff * 2**attempt, max_backoff)
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+            if self.deadline is not None and time.monotonic() + delay > self.deadline:
+                break
+            LOGGER.warning(
+                f"Request to {url} failed with {error or response.status_code}, "
+                f"retrying in {delay:.1f} s"
+            )
+            self.count_metric("retries", api or "other")
+            if not error:
+                response.close()
+            time.sleep(delay)
+        if error:
+            raise error
+        return response
+
+    def request_once(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Make a single request, authenticating to X-Road again if the token is about
+        to expire or has been rejected.
+        """
+        headers = kwargs.get("headers") or {}
+        authenticated = (
+            self.xroad_server_address
+            and url.startswith(self.xroad_server_address)
+            and not url.endswith("/Authenticate")
+            and "Authorization" in headers
+        )
+        if authenticated and time.time() > self.xroad_token_refresh_at:
+            LOGGER.info("X-Road token about to expire, refreshing...")
+            self.xroad_ryhti_authenticate()
+            kwargs["headers"] = headers | {
+                "Authorization": self.xroad_headers["Authorization"]
+            }
+        response = self.send(method, url, **kwargs)
+        if authenticated and response.status_code == 401:
+            # Token may have been revoked or expired early. Authenticate once more.
+            LOGGER.info("X-Road token rejected, authenticating again...")
+            response.close()
+            self.xroad_ryhti_authenticate(
+                rejected_token=kwargs["headers"]["Authorization"]
+            )
+            kwargs["headers"] = kwargs["headers"] | {
+                "Authorization": self.xroad_headers["Authorization"]
+            }
+            # Files must be sent again from the start
+            for file in (kwargs.get("files") or {}).values():
+                file[1].seek(0)
+            response = self.send(method, url, **kwargs)
+        return response
+
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a single request, waiting for the rate limit of the API and, if the
+        request is sent to X-Road, for a free slot if the maximum number of X-Road
+        requests are already in flight.
+
+        Throttled requests (429) are sent again after the time given in Retry-After.
+        If the wait is longer than throttle_max_wait or would pass the deadline,
+        RyhtiThrottledError is raised instead.
+        Requests to other servers (i.e. plan documents) are not limited.
+        """
+        api = self.get_api(url)
+        if not api:
+            return self.http.request(method, url, **kwargs)
+        bucket = self.rate_limits[api]
+        for attempt in range(self.throttle_retries + 1):
+            if attempt:
+                # Files must be sent again from the start
+                for file in (kwargs.get("files") or {}).values():
+                    file[1].seek(0)
+            bucket.acquire()
+            if api == "xroad":
+                with self.xroad_slots:
+                    response = self.http.request(method, url, **kwargs)
+            else:
+                response = self.http.request(method, url, **kwargs)
+            if response.status_code != 429:
+                break
+            retry_after = get_retry_after(response)
+            wait = throttle_wait if retry_after is None else retry_after
+            if wait > self.throttle_max_wait or (
+                self.deadline is not None and time.monotonic() + wait > self.deadline
+            ):
+                response.close()
+                raise RyhtiThrottledError(
+                    f"{api} throttled request to {url} for {wait} s", response=response
+                )
+            LOGGER.warning(f"{api} throttled request to {url}, waiting {wait} s")
+            bucket.pause(wait)
+            if attempt < self.throttle_retries:
+                response.close()
+        self.record_metric("rate_limit_wait_seconds", api, round(bucket.waited, 3))
+        self.record_metric("rate_limit_throttled", api, bucket.throttled)
+        return response
+
+    def get_api(self, url: str) -> Optional[str]:
+        """
+        Returns the Ryhti API the url belongs to, or None if the url is not in Ryhti.
+        """
+        if self.xroad_server_address and url.startswith(self.xroad_server_address):
+            return "xroad"
+        if url.startswith(self.public_api_base):
+            return "public_api"
+        return None
+
+    def xroad_ryhti_authenticate(self, rejected_token: Optional[str] = None):
+        """
+        Set X-Road bearer token in X-Road headers.
+
+        Tokens are cached by client id and X-Road instance, so that warm lambda
+        containers don't have to authenticate again. A new token is requested if
+        there is no cached token, if the cached token is about to expire, or if the
+        cached token was rejected by X-Road API.
+        """
+        token_key = (self.xroad_syke_client_id or "", self.xroad_instance)
+        with xroad_token_lock:
+            cached_token = xroad_tokens.get(token_key)
+            if cached_token:
+                bearer_token, expires_at = cached_token
+                if (
+                    f"Bearer {bearer_token}" != rejected_token
+                    and expires_at - time.time() > xroad_token_refresh_margin
+                ):
+                    LOGGER.info("Using cached X-Road token.")
+                    self.xroad_headers["Authorization"] = f"Bearer {bearer_token}"
+                    self.xroad_token_refresh_at = (
+                        expires_at - xroad_token_refresh_margin
+                    )
+                    return
+            self.xroad_ryhti_authenticate_with_secret(token_key)
 
-    def xroad_ryhti_authenticate(self):
+    def xroad_ryhti_authenticate_with_secret(self, token_key: Tuple[str, str]):
         # Seems that Ryhti API does not use the standard OAuth2 client credentials
         # clientId:secret Bearer header in token endpoint. Instead, there is a custom
         # authentication endpoint /api/Authenticate that wishes us to deliver the
@@ -364,7 +1282,8 @@ class RyhtiClient:
         LOGGER.info(authentication_url)
         LOGGER.info("URL parameters")
         LOGGER.info(url_params)
-        response = requests.post(
+        response = self.request(
+            "POST",
             url=authentication_url,
             headers=self.xroad_headers,
             data=authentication_data,
@@ -378,7 +1297,12 @@ class RyhtiClient:
         # The returned token is a jsonified string, so json() will return the bare
         # string.
         bearer_token = response.json()
+        expires_at = (
+            get_token_expiry(bearer_token) or time.time() + xroad_token_lifetime
+        )
+        xroad_tokens[token_key] = (bearer_token, expires_at)
         self.xroad_headers["Authorization"] = f"Bearer {bearer_token}"
+        self.xroad_token_refresh_at = expires_at - xroad_token_refresh_margin
 
     def get_plan_matter_api_path(self, plan_type_uri: str) -> str:
         """
@@ -392,6 +1316,42 @@ class RyhtiClient:
         top_level_code = plan_type_uri.split("/")[-1][0]
         return api_paths[top_level_code]
 
+    def get_administrative_area_identifier(self, plan: models.Plan) -> str:
+        """
+        Returns the municipality or, if the plan has no municipality, the region of
+        the plan organisation.
+        """
+        if plan.organisation.municipality_id:
+            return self.get_code_value_by_id(plan.organisation.municipality_id)
+        return self.get_code_value_by_id(plan.organisation.administrative_region_id)
+
+    def get_geojson_expression(self, geometry: Any) -> Any:
+        """
+        Returns SQL expression that makes PostGIS create the same GeoJSON geometry
+        dict as get_geojson.
+        """
+        # Ryhti API may not allow single geometries in multigeometries in all cases.
+        # Let's make them into single geometries instead:
+        single_geometry = case(
+            (func.ST_NumGeometries(geometry) == 1, func.ST_GeometryN(geometry, 1)),
+            else_=geometry,
+        )
+        # 15 decimals are enough to get the exact coordinates back. The CRS member is
+        # left out, the SRID is added separately.
+        return func.ST_AsGeoJSON(single_geometry, 15, 0).cast(JSON)
+
+    def get_plan_geojson(self, plan_base: models.Plan | base.PlanObjectBase) -> dict:
+        """
+        Returns geojson format dict of plan or plan object geometry, using the GeoJSON
+        geometry created by the database if it has been loaded.
+        """
+        if plan_base.geojson is not None:
+            return {
+                "srid": str(base.PROJECT_SRID),
+                "geometry": plan_base.geojson,
+            }
+        return self.get_geojson(plan_base.geom)
+
     def get_geojson(self, geometry: Geometry) -> dict:
         """
         Returns geojson format dict with the correct SRID set.
@@ -463,7 +1423,8 @@ class RyhtiClient:
         return [
             lifecycle_date
             for lifecycle_date in plan_base.lifecycle_dates
-            if lifecycle_date.lifecycle_status.value == status_value
+            if self.get_code_value_by_id(lifecycle_date.lifecycle_status_id)
+            == status_value
         ]
 
     def get_lifecycle_periods(
@@ -497,18 +1458,20 @@ class RyhtiClient:
             return (
                 (
                     event_class is NameOfPlanCaseDecision
-                    and event_date.decision
-                    and event_date.decision.value == event_value
+                    and event_date.decision_id is not None
+                    and self.get_code_value_by_id(event_date.decision_id) == event_value
                 )
                 or (
                     event_class is TypeOfProcessingEvent
-                    and event_date.processing_event
-                    and event_date.processing_event.value == event_value
+                    and event_date.processing_event_id is not None
+                    and self.get_code_value_by_id(event_date.processing_event_id)
+                    == event_value
                 )
                 or (
                     event_class is TypeOfInteractionEvent
-                    and event_date.interaction_event
-                    and event_date.interaction_event.value == event_value
+                    and event_date.interaction_event_id is not None
+                    and self.get_code_value_by_id(event_date.interaction_event_id)
+                    == event_value
                 )
             )
 
@@ -523,26 +1486,41 @@ class RyhtiClient:
         """
         return periods[-1] if periods else None
 
+    def serialize_plan_recommendation(
+        self, plan_recommendation: Any, period_of_validity: Optional[Period]
+    ) -> Dict:
+        """
+        Construct a dict of Ryhti compatible plan recommendation from a plan
+        proposition object or database row.
+        """
+        recommendation_dict: Dict[str, Any] = dict()
+        recommendation_dict["planRecommendationKey"] = plan_recommendation.id
+        recommendation_dict["lifeCycleStatus"] = self.get_code_uri_by_id(
+            plan_recommendation.lifecycle_status_id
+        )
+        if plan_recommendation.plan_theme_id:
+            recommendation_dict["planThemes"] = [
+                self.get_code_uri_by_id(plan_recommendation.plan_theme_id)
+            ]
+        recommendation_dict["recommendationNumber"] = plan_recommendation.ordering
+        recommendation_dict["periodOfValidity"] = period_of_validity
+        recommendation_dict["value"] = plan_recommendation.text_value
+        return recommendation_dict
+
+    @memoize_fragment
     def get_plan_recommendation(
         self, plan_recommendation: models.PlanProposition
     ) -> Dict:
         """
         Construct a dict of Ryhti compatible plan recommendation.
         """
-        recommendation_dict = dict()
-        recommendation_dict["planRecommendationKey"] = plan_recommendation.id
-        recommendation_dict[
-            "lifeCycleStatus"
-        ] = plan_recommendation.lifecycle_status.uri
-        if plan_recommendation.plan_theme:
-            recommendation_dict["planThemes"] = [plan_recommendation.plan_theme.uri]
-        recommendation_dict["recommendationNumber"] = plan_recommendation.ordering
         # we should only have one valid period. If there are several, pick last
-        recommendation_dict["periodOfValidity"] = self.get_last_period(
-            self.get_lifecycle_periods(plan_recommendation, self.valid_status_value)
+        return self.serialize_plan_recommendation(
+            plan_recommendation,
+            self.get_last_period(
+                self.get_lifecycle_periods(plan_recommendation, self.valid_status_value)
+            ),
         )
-        recommendation_dict["value"] = plan_recommendation.text_value
-        return recommendation_dict
 
     def get_attribute_value(self, attribute_value: base.AttributeValueMixin) -> Dict:
         value = {"dataType": attribute_value.value_data_type.value}
@@ -608,11 +1586,15 @@ class RyhtiClient:
 
         return value
 
-    def get_additional_information(
-        self, additional_information: models.AdditionalInformation
-    ) -> Dict:
-        additional_information_dict = {
-            "type": additional_information.type_of_additional_information.uri
+    def serialize_additional_information(self, additional_information: Any) -> Dict:
+        """
+        Construct a dict of Ryhti compatible additional information from an
+        additional information object or database row.
+        """
+        additional_information_dict: Dict[str, Any] = {
+            "type": self.get_code_uri_by_id(
+                additional_information.type_additional_information_id
+            )
         }
         if additional_information.value_data_type is not None:
             additional_information_dict["value"] = self.get_attribute_value(
@@ -621,52 +1603,90 @@ class RyhtiClient:
 
         return additional_information_dict
 
-    def get_plan_regulation(self, plan_regulation: models.PlanRegulation) -> Dict:
+    @memoize_fragment
+    def get_additional_information(
+        self, additional_information: models.AdditionalInformation
+    ) -> Dict:
+        return self.serialize_additional_information(additional_information)
+
+    def serialize_plan_regulation(
+        self,
+        plan_regulation: Any,
+        period_of_validity: Optional[Period],
+        verbal_regulations: List[str],
+        additional_informations: List[Dict],
+    ) -> Dict:
         """
-        Construct a dict of Ryhti compatible plan regulation.
+        Construct a dict of Ryhti compatible plan regulation from a plan regulation
+        object or database row, and the URIs of its verbal regulation types and its
+        additional information dicts.
         """
-        regulation_dict = dict()
+        regulation_dict: Dict[str, Any] = dict()
         regulation_dict["planRegulationKey"] = plan_regulation.id
-        regulation_dict["lifeCycleStatus"] = plan_regulation.lifecycle_status.uri
-        regulation_dict["type"] = plan_regulation.type_of_plan_regulation.uri
-        if plan_regulation.plan_theme:
-            regulation_dict["planThemes"] = [plan_regulation.plan_theme.uri]
+        regulation_dict["lifeCycleStatus"] = self.get_code_uri_by_id(
+            plan_regulation.lifecycle_status_id
+        )
+        regulation_dict["type"] = self.get_code_uri_by_id(
+            plan_regulation.type_of_plan_regulation_id
+        )
+        if plan_regulation.plan_theme_id:
+            regulation_dict["planThemes"] = [
+                self.get_code_uri_by_id(plan_regulation.plan_theme_id)
+            ]
         regulation_dict["subjectIdentifiers"] = plan_regulation.subject_identifiers
         regulation_dict["regulationNumber"] = str(plan_regulation.ordering)
-        # we should only have one valid period. If there are several, pick last
-        regulation_dict["periodOfValidity"] = self.get_last_period(
-            self.get_lifecycle_periods(plan_regulation, self.valid_status_value)
-        )
+        regulation_dict["periodOfValidity"] = period_of_validity
 
-        if plan_regulation.types_of_verbal_plan_regulations:
-            regulation_dict["verbalRegulations"] = [
-                type_code.uri
-                for type_code in plan_regulation.types_of_verbal_plan_regulations
-            ]
+        if verbal_regulations:
+            regulation_dict["verbalRegulations"] = verbal_regulations
 
         # Additional informations may contain multiple additional info
         # code values.
-        regulation_dict["additionalInformations"] = [
-            self.get_additional_information(ai)
-            for ai in plan_regulation.additional_information
-        ]
+        regulation_dict["additionalInformations"] = additional_informations
 
         if plan_regulation.value_data_type is not None:
             regulation_dict["value"] = self.get_attribute_value(plan_regulation)
 
         return regulation_dict
 
-    def get_plan_regulation_group(
-        self, group: models.PlanRegulationGroup, general: bool = False
+    @memoize_fragment
+    def get_plan_regulation(self, plan_regulation: models.PlanRegulation) -> Dict:
+        """
+        Construct a dict of Ryhti compatible plan regulation.
+        """
+        # we should only have one valid period. If there are several, pick last
+        return self.serialize_plan_regulation(
+            plan_regulation,
+            self.get_last_period(
+                self.get_lifecycle_periods(plan_regulation, self.valid_status_value)
+            ),
+            [
+                type_code.uri
+                for type_code in plan_regulation.types_of_verbal_plan_regulations
+            ],
+            [
+                self.get_additional_information(ai)
+                for ai in plan_regulation.additional_information
+            ],
+        )
+
+    def serialize_plan_regulation_group(
+        self,
+        group: Any,
+        plan_recommendations: List[Dict],
+        plan_regulations: List[Dict],
+        general: bool = False,
     ) -> Dict:
         """
-        Construct a dict of Ryhti compatible plan regulation group.
+        Construct a dict of Ryhti compatible plan regulation group from a plan
+        regulation group object or database row, and its recommendation and
+        regulation dicts.
 
         Plan regulation groups and general regulation groups have some minor
         differences, so you can specify if you want to create a general
         regulation group.
         """
-        group_dict = dict()
+        group_dict: Dict[str, Any] = dict()
         if general:
             group_dict["generalRegulationGroupKey"] = group.id
         else:
@@ -677,32 +1697,50 @@ class RyhtiClient:
         if not general:
             group_dict["letterIdentifier"] = group.short_name
             group_dict["colorNumber"] = "#FFFFFF"
-        group_dict["planRecommendations"] = []
-        for recommendation in group.plan_propositions:
-            group_dict["planRecommendations"].append(
-                self.get_plan_recommendation(recommendation)
-            )
-        group_dict["planRegulations"] = []
-        for regulation in group.plan_regulations:
-            group_dict["planRegulations"].append(self.get_plan_regulation(regulation))
+        group_dict["planRecommendations"] = plan_recommendations
+        group_dict["planRegulations"] = plan_regulations
         return group_dict
 
-    def get_plan_object(self, plan_object: base.PlanObjectBase) -> Dict:
+    @memoize_fragment
+    def get_plan_regulation_group(
+        self, group: models.PlanRegulationGroup, general: bool = False
+    ) -> Dict:
         """
-        Construct a dict of Ryhti compatible plan object.
+        Construct a dict of Ryhti compatible plan regulation group.
+        """
+        return self.serialize_plan_regulation_group(
+            group,
+            [
+                self.get_plan_recommendation(recommendation)
+                for recommendation in group.plan_propositions
+            ],
+            [
+                self.get_plan_regulation(regulation)
+                for regulation in group.plan_regulations
+            ],
+            general=general,
+        )
+
+    def serialize_plan_object(
+        self, plan_object: Any, geometry: Dict, period_of_validity: Optional[Period]
+    ) -> Dict:
+        """
+        Construct a dict of Ryhti compatible plan object from a plan object or
+        database row, and its geometry dict.
         """
-        plan_object_dict = dict()
+        plan_object_dict: Dict[str, Any] = dict()
         plan_object_dict["planObjectKey"] = plan_object.id
-        plan_object_dict["lifeCycleStatus"] = plan_object.lifecycle_status.uri
-        plan_object_dict["undergroundStatus"] = plan_object.type_of_underground.uri
-        plan_object_dict["geometry"] = self.get_geojson(plan_object.geom)
+        plan_object_dict["lifeCycleStatus"] = self.get_code_uri_by_id(
+            plan_object.lifecycle_status_id
+        )
+        plan_object_dict["undergroundStatus"] = self.get_code_uri_by_id(
+            plan_object.type_of_underground_id
+        )
+        plan_object_dict["geometry"] = geometry
         plan_object_dict["name"] = plan_object.name
         plan_object_dict["description"] = plan_object.description
         plan_object_dict["objectNumber"] = plan_object.ordering
-        # we should only have one valid period. If there are several, pick last
-        plan_object_dict["periodOfValidity"] = self.get_last_period(
-            self.get_lifecycle_periods(plan_object, self.valid_status_value)
-        )
+        plan_object_dict["periodOfValidity"] = period_of_validity
         if plan_object.height_min or plan_object.height_max:
             plan_object_dict["verticalLimit"] = {
                 "dataType": "DecimalRange",
@@ -713,6 +1751,19 @@ class RyhtiClient:
             }
         return plan_object_dict
 
+    def get_plan_object(self, plan_object: base.PlanObjectBase) -> Dict:
+        """
+        Construct a dict of Ryhti compatible plan object.
+        """
+        # we should only have one valid period. If there are several, pick last
+        return self.serialize_plan_object(
+            plan_object,
+            self.get_plan_geojson(plan_object),
+            self.get_last_period(
+                self.get_lifecycle_periods(plan_object, self.valid_status_value)
+            ),
+        )
+
     def get_plan_object_dicts(self, plan_objects: List[base.PlanObjectBase]) -> List:
         """
         Construct a list of Ryhti compatible plan object dicts from plan objects
@@ -720,9 +1771,69 @@ class RyhtiClient:
         """
         plan_object_dicts = []
         for plan_object in plan_objects:
-            plan_object_dicts.append(self.get_plan_object(plan_object))
+            if self.fragment_cache:
+                plan_object_dicts.append(self.get_saved_plan_object(plan_object))
+            else:
+                plan_object_dicts.append(self.get_plan_object(plan_object))
         return plan_object_dicts
 
+    def get_saved_plan_object(self, plan_object: base.PlanObjectBase) -> Dict:
+        """
+        Return the Ryhti compatible plan object saved in an earlier run, if the plan
+        object and the code lists have not been modified since. Otherwise, construct
+        the plan object dict and queue it to be saved in the database.
+        """
+        saved = self.plan_object_fragments.get(plan_object.id)
+        reused = saved is not None and saved[:2] == (
+            plan_object.modified_at,
+            self.code_list_version,
+        )
+        self.count_metric("plan_object_fragments", "reused" if reused else "serialized")
+        if saved is not None and reused:
+            return saved[2]
+        # Saved fragments must be plain JSON, while heights are Decimal. Return the
+        # same plain JSON as will be reused later, so that the plan digest does not
+        # depend on whether the plan object was serialized again or not.
+        plan_object_dict = json.loads(json.dumps(self.get_plan_object(plan_object)))
+        with self.fragment_lock:
+            self.new_plan_object_fragments[plan_object.id] = {
+                "plan_id": plan_object.plan_id,
+                "plan_object_id": plan_object.id,
+                "object_modified_at": plan_object.modified_at,
+                "code_list_version": self.code_list_version,
+                "fragment": plan_object_dict,
+            }
+        return plan_object_dict
+
+    def save_plan_object_fragments(self) -> None:
+        """
+        Save the plan objects serialized during the run in the database, so that they
+        need not be serialized again until they are modified.
+        """
+        with self.fragment_lock:
+            new_fragments = list(self.new_plan_object_fragments.values())
+            self.new_plan_object_fragments = dict()
+        if not new_fragments:
+            return
+        LOGGER.info("Saving serialized plan objects...")
+        insert_statement = insert(models.PlanObjectFragment).values(new_fragments)
+        with self.Session() as session:
+            session.execute(
+                insert_statement.on_conflict_do_update(
+                    index_elements=[models.PlanObjectFragment.plan_object_id],
+                    set_={
+                        "object_modified_at": (
+                            insert_statement.excluded.object_modified_at
+                        ),
+                        "code_list_version": (
+                            insert_statement.excluded.code_list_version
+                        ),
+                        "fragment": insert_statement.excluded.fragment,
+                    },
+                )
+            )
+            session.commit()
+
     def get_plan_regulation_groups(
         self, plan_objects: List[base.PlanObjectBase]
     ) -> List:
@@ -731,6 +1842,20 @@ class RyhtiClient:
         in the local database.
         """
         group_dicts = []
+        if self.bulk_load:
+            # All the plan regulation groups have already been loaded with the plan
+            # objects. Order them like the database would.
+            loaded_groups = {
+                regulation_group.id: cast(models.PlanRegulationGroup, regulation_group)
+                for plan_object in plan_objects
+                for regulation_group in plan_object.plan_regulation_groups
+            }
+            for group in sorted(
+                loaded_groups.values(),
+                key=lambda group: (group.ordering is None, group.ordering or 0),
+            ):
+                group_dicts.append(self.get_plan_regulation_group(group))
+            return group_dicts
         group_ids = set(
             [
                 regulation_group.id
@@ -753,7 +1878,7 @@ class RyhtiClient:
 
     def get_plan_regulation_group_relations(
         self, plan_objects: List[base.PlanObjectBase]
-    ) -> List[Dict[str, "uuid.UUID"]]:
+    ) -> List[Dict]:
         """
         Construct a list of Ryhti compatible plan regulation group relations from plan
         objects in the local database.
@@ -767,65 +1892,51 @@ class RyhtiClient:
             for regulation_group in plan_object.plan_regulation_groups
         ]
 
-    def get_plan_dictionary(self, plan: models.Plan) -> RyhtiPlan:
+    def serialize_plan(
+        self,
+        plan: Any,
+        geographical_area: Dict,
+        legal_effects: List[str],
+        general_regulation_groups: List[Dict],
+        plan_objects: List[Dict],
+        plan_regulation_groups: List[Dict],
+        plan_regulation_group_relations: List[Dict],
+        period_of_validity: Optional[Period],
+        period_of_approval: Optional[Period],
+    ) -> RyhtiPlan:
         """
-        Construct a dict of single Ryhti compatible plan from plan in the
-        local database.
+        Construct a dict of single Ryhti compatible plan from a plan object or
+        database row, and the URIs of its legal effects and the dicts of its plan
+        objects and regulation groups.
         """
         plan_dictionary = RyhtiPlan()
 
         # planKey should always be the local uuid, not the permanent plan matter id.
         plan_dictionary["planKey"] = plan.id
-        # Let's have all the code values preloaded joined from db.
+        # Code values are found in the code registry, no need to join them from db.
         # It makes this super easy:
-        plan_dictionary["lifeCycleStatus"] = plan.lifecycle_status.uri
-        plan_dictionary["legalEffectOfLocalMasterPlans"] = (
-            [effect.uri for effect in plan.legal_effects_of_master_plan]
-            if plan.legal_effects_of_master_plan
-            else None
+        plan_dictionary["lifeCycleStatus"] = self.get_code_uri_by_id(
+            plan.lifecycle_status_id
         )
+        plan_dictionary["legalEffectOfLocalMasterPlans"] = legal_effects or None
         plan_dictionary["scale"] = plan.scale
-        plan_dictionary["geographicalArea"] = self.get_geojson(plan.geom)
+        plan_dictionary["geographicalArea"] = geographical_area
         # For reasons unknown, Ryhti does not allow multilanguage description.
         plan_description = (
             plan.description.get("fin") if isinstance(plan.description, dict) else None
         )
         plan_dictionary["planDescription"] = plan_description
 
-        # Here come the dependent objects. They are related to the plan directly or
-        # via the plan objects, so we better fetch the objects first and then move on.
-        plan_objects: List[base.PlanObjectBase] = []
-        with self.Session(expire_on_commit=False) as session:
-            session.add(plan)
-            plan_objects += plan.land_use_areas
-            plan_objects += plan.other_areas
-            plan_objects += plan.lines
-            plan_objects += plan.land_use_points
-            plan_objects += plan.other_points
-
-        plan_dictionary["generalRegulationGroups"] = [
-            self.get_plan_regulation_group(regulation_group, general=True)
-            for regulation_group in plan.general_plan_regulation_groups
-        ]
-
+        plan_dictionary["generalRegulationGroups"] = general_regulation_groups
         # Our plans have lots of different plan objects, each of which has one plan
         # regulation group.
-        plan_dictionary["planObjects"] = self.get_plan_object_dicts(plan_objects)
-        plan_dictionary["planRegulationGroups"] = self.get_plan_regulation_groups(
-            plan_objects
-        )
+        plan_dictionary["planObjects"] = plan_objects
+        plan_dictionary["planRegulationGroups"] = plan_regulation_groups
         plan_dictionary[
             "planRegulationGroupRelations"
-        ] = self.get_plan_regulation_group_relations(plan_objects)
+        ] = plan_regulation_group_relations
 
-        # we should only have one valid period. If there are several, pick last
-        plan_dictionary["periodOfValidity"] = self.get_last_period(
-            self.get_lifecycle_periods(plan, self.valid_status_value)
-        )
-        # we should only have one approved period. If there are several, pick last
-        period_of_approval = self.get_last_period(
-            self.get_lifecycle_periods(plan, self.approved_status_value)
-        )
+        plan_dictionary["periodOfValidity"] = period_of_validity
         plan_dictionary["approvalDate"] = (
             period_of_approval["begin"] if period_of_approval else None
         )
@@ -839,16 +1950,374 @@ class RyhtiClient:
 
         return plan_dictionary
 
-    def get_plan_dictionaries(self) -> Dict[str, RyhtiPlan]:
+    def get_plan_dictionary(self, plan: models.Plan) -> RyhtiPlan:
         """
-        Construct a dict of valid Ryhti compatible plan dictionaries from plans in the
+        Construct a dict of single Ryhti compatible plan from plan in the
         local database.
         """
+        legal_effects = [effect.uri for effect in plan.legal_effects_of_master_plan]
+
+        # Here come the dependent objects. They are related to the plan directly or
+        # via the plan objects, so we better fetch the objects first and then move on.
+        plan_objects: List[base.PlanObjectBase] = []
+        with self.Session(expire_on_commit=False) as session:
+            session.add(plan)
+            plan_objects += plan.land_use_areas
+            plan_objects += plan.other_areas
+            plan_objects += plan.lines
+            plan_objects += plan.land_use_points
+            plan_objects += plan.other_points
+
+        # we should only have one valid and one approved period. If there are
+        # several, pick last
+        return self.serialize_plan(
+            plan,
+            self.get_plan_geojson(plan),
+            legal_effects,
+            [
+                self.get_plan_regulation_group(regulation_group, general=True)
+                for regulation_group in plan.general_plan_regulation_groups
+            ],
+            self.get_plan_object_dicts(plan_objects),
+            self.get_plan_regulation_groups(plan_objects),
+            self.get_plan_regulation_group_relations(plan_objects),
+            self.get_last_period(
+                self.get_lifecycle_periods(plan, self.valid_status_value)
+            ),
+            self.get_last_period(
+                self.get_lifecycle_periods(plan, self.approved_status_value)
+            ),
+        )
+
+    def get_plan_dictionaries(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiPlan]:
+        """
+        Construct a dict of valid Ryhti compatible plan dictionaries from plans in the
+        local database. Optionally, only serialize the given plans.
+        """
+        if self.row_serializer:
+            return self.get_plan_dictionaries_from_rows(plan_ids)
         plan_dictionaries = dict()
-        for plan_id, plan in self.plans.items():
+        for plan_id, plan in self.select_plans(self.plans, plan_ids).items():
             plan_dictionaries[plan_id] = self.get_plan_dictionary(plan)
         return plan_dictionaries
 
+    def get_plan_dictionaries_from_rows(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiPlan]:
+        """
+        Construct the same plan dictionaries as get_plan_dictionaries, but from plain
+        database rows instead of ORM objects. Optionally, only serialize the given
+        plans.
+
+        All the plan data is selected as flat column tuples with a fixed number of
+        queries for all the plans at once. No ORM objects, identity map entries or
+        joined code objects are created, so large plans take much less memory.
+        """
+        plan_ids = list(self.select_plans(self.plans, plan_ids))
+        if not plan_ids:
+            return dict()
+        plan_object_classes: Tuple[Type[base.PlanObjectBase], ...] = (
+            models.LandUseArea,
+            models.OtherArea,
+            models.Line,
+            models.LandUsePoint,
+            models.OtherPoint,
+        )
+        association = models.regulation_group_association
+
+        def geometry_column(plan_class: Any) -> Any:
+            if self.server_side_geojson:
+                return self.get_geojson_expression(plan_class.geom).label("geometry")
+            return plan_class.geom.label("geometry")
+
+        def get_geojson(geometry: Any) -> dict:
+            if self.server_side_geojson:
+                return {"srid": str(base.PROJECT_SRID), "geometry": geometry}
+            return self.get_geojson(geometry)
+
+        def attribute_value_columns(attribute_class: Any) -> List[Any]:
+            return [
+                attribute_class.value_data_type,
+                attribute_class.numeric_value,
+                attribute_class.numeric_range_min,
+                attribute_class.numeric_range_max,
+                attribute_class.unit,
+                attribute_class.text_value,
+                attribute_class.text_syntax,
+                attribute_class.code_list,
+                attribute_class.code_value,
+                attribute_class.code_title,
+            ]
+
+        def group_rows(rows: Iterable[Any], key: str) -> Dict[Any, List[Any]]:
+            grouped: Dict[Any, List[Any]] = dict()
+            for row in rows:
+                grouped.setdefault(getattr(row, key), []).append(row)
+            return grouped
+
+        with self.Session() as session:
+            plan_rows = {
+                row.id: row
+                for row in session.execute(
+                    select(
+                        models.Plan.id,
+                        models.Plan.lifecycle_status_id,
+                        models.Plan.scale,
+                        models.Plan.description,
+                        geometry_column(models.Plan),
+                    ).where(models.Plan.id.in_(plan_ids))
+                )
+            }
+            legal_effect_rows = group_rows(
+                session.execute(
+                    select(models.legal_effects_association).where(
+                        models.legal_effects_association.c.plan_id.in_(plan_ids)
+                    )
+                ),
+                "plan_id",
+            )
+            # Plan objects of each plan, in the same order as the plan relationships
+            plan_object_rows: Dict[Any, List[Any]] = dict()
+            object_ids: Dict[str, List[Any]] = dict()
+            for plan_object_class in plan_object_classes:
+                rows = session.execute(
+                    select(
+                        plan_object_class.id,
+                        plan_object_class.plan_id,
+                        plan_object_class.lifecycle_status_id,
+                        plan_object_class.type_of_underground_id,
+                        plan_object_class.name,
+                        plan_object_class.description,
+                        plan_object_class.ordering,
+                        plan_object_class.height_min,
+                        plan_object_class.height_max,
+                        plan_object_class.height_unit,
+                        geometry_column(plan_object_class),
+                    )
+                    .where(plan_object_class.plan_id.in_(plan_ids))
+                    .order_by(plan_object_class.ordering)
+                ).all()
+                object_ids[f"{plan_object_class.__tablename__}_id"] = [
+                    row.id for row in rows
+                ]
+                for row in rows:
+                    plan_object_rows.setdefault(row.plan_id, []).append(row)
+
+            # Regulation groups of plans and plan objects
+            association_rows = session.execute(
+                select(
+                    association.c.plan_regulation_group_id,
+                    func.coalesce(
+                        association.c.plan_id,
+                        *(association.c[column] for column in object_ids),
+                    ).label("owner_id"),
+                ).where(
+                    or_(
+                        association.c.plan_id.in_(plan_ids),
+                        *(
+                            association.c[column].in_(ids)
+                            for column, ids in object_ids.items()
+                            if ids
+                        ),
+                    )
+                )
+            ).all()
+            group_ids_by_owner = {
+                owner_id: [row.plan_regulation_group_id for row in rows]
+                for owner_id, rows in group_rows(association_rows, "owner_id").items()
+            }
+            group_ids = {row.plan_regulation_group_id for row in association_rows}
+            group_rows_by_id = {
+                row.id: row
+                for row in session.execute(
+                    select(
+                        models.PlanRegulationGroup.id,
+                        models.PlanRegulationGroup.name,
+                        models.PlanRegulationGroup.ordering,
+                        models.PlanRegulationGroup.short_name,
+                    ).where(models.PlanRegulationGroup.id.in_(group_ids))
+                )
+            }
+            regulation_rows = session.execute(
+                select(
+                    models.PlanRegulation.id,
+                    models.PlanRegulation.plan_regulation_group_id,
+                    models.PlanRegulation.lifecycle_status_id,
+                    models.PlanRegulation.type_of_plan_regulation_id,
+                    models.PlanRegulation.plan_theme_id,
+                    models.PlanRegulation.subject_identifiers,
+                    models.PlanRegulation.ordering,
+                    *attribute_value_columns(models.PlanRegulation),
+                )
+                .where(models.PlanRegulation.plan_regulation_group_id.in_(group_ids))
+                .order_by(models.PlanRegulation.ordering)
+            ).all()
+            regulation_ids = [row.id for row in regulation_rows]
+            proposition_rows = session.execute(
+                select(
+                    models.PlanProposition.id,
+                    models.PlanProposition.plan_regulation_group_id,
+                    models.PlanProposition.lifecycle_status_id,
+                    models.PlanProposition.plan_theme_id,
+                    models.PlanProposition.ordering,
+                    models.PlanProposition.text_value,
+                )
+                .where(models.PlanProposition.plan_regulation_group_id.in_(group_ids))
+                .order_by(models.PlanProposition.ordering)
+            ).all()
+            additional_information_rows = session.execute(
+                select(
+                    models.AdditionalInformation.plan_regulation_id,
+                    models.AdditionalInformation.type_additional_information_id,
+                    *attribute_value_columns(models.AdditionalInformation),
+                ).where(
+                    models.AdditionalInformation.plan_regulation_id.in_(regulation_ids)
+                )
+            ).all()
+            verbal_association = models.type_of_verbal_regulation_association
+            verbal_regulation_rows = session.execute(
+                select(verbal_association).where(
+                    verbal_association.c.plan_regulation_id.in_(regulation_ids)
+                )
+            ).all()
+
+            # Only valid and approved lifecycle dates are ever serialized
+            lifecycle_date_owners = [
+                models.LifeCycleDate.plan_id,
+                *(getattr(models.LifeCycleDate, column) for column in object_ids),
+                models.LifeCycleDate.plan_regulation_id,
+                models.LifeCycleDate.plan_proposition_id,
+            ]
+            owner_ids = [
+                *plan_ids,
+                *(object_id for ids in object_ids.values() for object_id in ids),
+                *regulation_ids,
+                *(row.id for row in proposition_rows),
+            ]
+            lifecycle_date_rows = session.execute(
+                select(
+                    func.coalesce(*lifecycle_date_owners).label("owner_id"),
+                    codes.LifeCycleStatus.value,
+                    models.LifeCycleDate.starting_at,
+                    models.LifeCycleDate.ending_at,
+                )
+                .select_from(models.LifeCycleDate)
+                .join(models.LifeCycleDate.lifecycle_status)
+                .where(
+                    codes.LifeCycleStatus.value.in_(
+                        (self.valid_status_value, self.approved_status_value)
+                    ),
+                    or_(*(owner.in_(owner_ids) for owner in lifecycle_date_owners)),
+                )
+                .order_by(models.LifeCycleDate.starting_at)
+            ).all()
+
+        regulations_by_group = group_rows(regulation_rows, "plan_regulation_group_id")
+        propositions_by_group = group_rows(proposition_rows, "plan_regulation_group_id")
+        additional_information_by_regulation = group_rows(
+            additional_information_rows, "plan_regulation_id"
+        )
+        verbal_regulations_by_regulation = group_rows(
+            verbal_regulation_rows, "plan_regulation_id"
+        )
+        lifecycle_dates: Dict[Tuple[Any, str], List[Any]] = dict()
+        for row in lifecycle_date_rows:
+            lifecycle_dates.setdefault((row.owner_id, row.value), []).append(row)
+
+        def get_last_period(owner_id: Any, status_value: str) -> Optional[Period]:
+            # we should only have one period. If there are several, pick last
+            return self.get_last_period(
+                self.get_periods(lifecycle_dates.get((owner_id, status_value), []))
+            )
+
+        def get_regulation(row: Any) -> Dict:
+            return self.serialize_plan_regulation(
+                row,
+                get_last_period(row.id, self.valid_status_value),
+                [
+                    self.get_code_uri_by_id(
+                        verbal_row.type_of_verbal_plan_regulation_id
+                    )
+                    for verbal_row in verbal_regulations_by_regulation.get(row.id, [])
+                ],
+                [
+                    self.serialize_additional_information(ai_row)
+                    for ai_row in additional_information_by_regulation.get(row.id, [])
+                ],
+            )
+
+        def get_group(group_id: Any, general: bool = False) -> Dict:
+            row = group_rows_by_id[group_id]
+            return self.serialize_plan_regulation_group(
+                row,
+                [
+                    self.serialize_plan_recommendation(
+                        proposition_row,
+                        get_last_period(proposition_row.id, self.valid_status_value),
+                    )
+                    for proposition_row in propositions_by_group.get(row.id, [])
+                ],
+                [
+                    get_regulation(regulation_row)
+                    for regulation_row in regulations_by_group.get(row.id, [])
+                ],
+                general=general,
+            )
+
+        plan_dictionaries = dict()
+        for plan_id in plan_ids:
+            # The plan may have been deleted after the client was initialized
+            if plan_id not in plan_rows:
+                continue
+            plan_row = plan_rows[plan_id]
+            object_rows = plan_object_rows.get(plan_id, [])
+            # Order the regulation groups of all plan objects like the database would
+            object_group_ids = {
+                group_id: group_rows_by_id[group_id]
+                for row in object_rows
+                for group_id in group_ids_by_owner.get(row.id, [])
+            }
+            plan_dictionaries[plan_id] = self.serialize_plan(
+                plan_row,
+                get_geojson(plan_row.geometry),
+                [
+                    self.get_code_uri_by_id(row.legal_effects_of_master_plan_id)
+                    for row in legal_effect_rows.get(plan_id, [])
+                ],
+                [
+                    get_group(group_id, general=True)
+                    for group_id in group_ids_by_owner.get(plan_id, [])
+                ],
+                [
+                    self.serialize_plan_object(
+                        row,
+                        get_geojson(row.geometry),
+                        get_last_period(row.id, self.valid_status_value),
+                    )
+                    for row in object_rows
+                ],
+                [
+                    get_group(group_id)
+                    for group_id, group_row in sorted(
+                        object_group_ids.items(),
+                        key=lambda item: (
+                            item[1].ordering is None,
+                            item[1].ordering or 0,
+                        ),
+                    )
+                ],
+                [
+                    {"planObjectKey": row.id, "planRegulationGroupKey": group_id}
+                    for row in object_rows
+                    for group_id in group_ids_by_owner.get(row.id, [])
+                ],
+                get_last_period(plan_id, self.valid_status_value),
+                get_last_period(plan_id, self.approved_status_value),
+            )
+        return plan_dictionaries
+
     def get_plan_map(self, document: models.Document) -> Dict:
         """
         Construct a dict of single Ryhti compatible plan map.
@@ -865,21 +2334,31 @@ class RyhtiClient:
         """
         Construct a dict of single Ryhti compatible plan attachment document.
         """
-        attachment_document = dict()
+        attachment_document: Dict[str, Any] = dict()
         attachment_document["attachmentDocumentKey"] = document.id
         attachment_document[
             "documentIdentifier"
         ] = document.permanent_document_identifier
         attachment_document["name"] = document.name
-        attachment_document["personalDataContent"] = document.personal_data_content.uri
-        attachment_document["categoryOfPublicity"] = document.category_of_publicity.uri
+        attachment_document["personalDataContent"] = self.get_code_uri_by_id(
+            document.personal_data_content_id
+        )
+        attachment_document["categoryOfPublicity"] = self.get_code_uri_by_id(
+            document.category_of_publicity_id
+        )
         attachment_document["accessibility"] = document.accessibility
-        attachment_document["retentionTime"] = document.retention_time.uri
-        attachment_document["languages"] = [document.language.uri]
+        attachment_document["retentionTime"] = self.get_code_uri_by_id(
+            document.retention_time_id
+        )
+        attachment_document["languages"] = [
+            self.get_code_uri_by_id(document.language_id)
+        ]
         attachment_document["fileKey"] = document.exported_file_key
         attachment_document["documentDate"] = document.document_date
         attachment_document["arrivedDate"] = document.arrival_date
-        attachment_document["typeOfAttachment"] = document.type_of_document.uri
+        attachment_document["typeOfAttachment"] = self.get_code_uri_by_id(
+            document.type_of_document_id
+        )
         return attachment_document
 
     def get_other_plan_material(self, document: models.Document) -> Dict:
@@ -891,8 +2370,12 @@ class RyhtiClient:
         other_plan_material["name"] = document.name
         other_plan_material["fileKey"] = document.exported_file_key
         other_plan_material["otherPlanMaterialLink"] = document.url
-        other_plan_material["personalDataContent"] = document.personal_data_content.uri
-        other_plan_material["categoryOfPublicity"] = document.category_of_publicity.uri
+        other_plan_material["personalDataContent"] = self.get_code_uri_by_id(
+            document.personal_data_content_id
+        )
+        other_plan_material["categoryOfPublicity"] = self.get_code_uri_by_id(
+            document.category_of_publicity_id
+        )
         return other_plan_material
 
     def add_plan_report_to_plan_dict(
@@ -922,17 +2405,18 @@ class RyhtiClient:
 
         The exact type of the dictionary to be added depends on the document type.
         """
-        if document.type_of_document.value == "03":
+        document_type = self.get_code_value_by_id(document.type_of_document_id)
+        if document_type == "03":
             # Kaavakartta
             plan_dictionary["planMaps"].append(self.get_plan_map(document))
-        elif document.type_of_document.value == "06":
+        elif document_type == "06":
             # Kaavaselostus
             # For some reason, if there are multiple plan reports, they will have to be
             # added inside a single plan report instead of a list of plan reports.
             plan_dictionary = self.add_plan_report_to_plan_dict(
                 document, plan_dictionary
             )
-        elif document.type_of_document.value == "99":
+        elif document_type == "99":
             # Muu asiakirja
             plan_dictionary["otherPlanMaterials"].append(
                 self.get_other_plan_material(document)
@@ -950,10 +2434,11 @@ class RyhtiClient:
         database.
         """
         decisions: List[RyhtiPlanDecision] = []
+        lifecycle_status = self.get_code_value_by_id(plan.lifecycle_status_id)
         # Decision name must correspond to the phase the plan is in. This requires
         # mapping from lifecycle statuses to decision names.
-        print(decisions_by_status.get(plan.lifecycle_status.value, []))
-        for decision_value in decisions_by_status.get(plan.lifecycle_status.value, []):
+        print(decisions_by_status.get(lifecycle_status, []))
+        for decision_value in decisions_by_status.get(lifecycle_status, []):
             entry = RyhtiPlanDecision()
             # TODO: Let's just have random uuid for now, on the assumption that each
             # phase is only POSTed to ryhti once. If planners need to post and repost
@@ -963,14 +2448,14 @@ class RyhtiClient:
             entry["name"] = get_code_uri(NameOfPlanCaseDecision, decision_value)
             entry["typeOfDecisionMaker"] = get_code_uri(
                 TypeOfDecisionMaker,
-                decisionmaker_by_status[plan.lifecycle_status.value],
+                decisionmaker_by_status[lifecycle_status],
             )
             # Plan must be embedded in decision when POSTing!
             entry["plans"] = [self.plan_dictionaries[plan.id]]
 
             try:
                 lifecycle_date = self.get_lifecycle_dates_for_status(
-                    plan, plan.lifecycle_status.value
+                    plan, lifecycle_status
                 )[-1]
             except IndexError:
                 raise AssertionError(
@@ -1009,11 +2494,10 @@ class RyhtiClient:
         database.
         """
         events: List[RyhtiHandlingEvent] = []
+        lifecycle_status = self.get_code_value_by_id(plan.lifecycle_status_id)
         # Decision name must correspond to the phase the plan is in. This requires
         # mapping from lifecycle statuses to decision names.
-        for event_value in processing_events_by_status.get(
-            plan.lifecycle_status.value, []
-        ):
+        for event_value in processing_events_by_status.get(lifecycle_status, []):
             entry = RyhtiHandlingEvent()
             # TODO: Let's just have random uuid for now, on the assumption that each
             # phase is only POSTed to ryhti once. If planners need to post and repost
@@ -1026,7 +2510,7 @@ class RyhtiClient:
 
             try:
                 lifecycle_date = self.get_lifecycle_dates_for_status(
-                    plan, plan.lifecycle_status.value
+                    plan, lifecycle_status
                 )[-1]
             except IndexError:
                 raise AssertionError(
@@ -1065,11 +2549,10 @@ class RyhtiClient:
         database.
         """
         events: List[RyhtiInteractionEvent] = []
+        lifecycle_status = self.get_code_value_by_id(plan.lifecycle_status_id)
         # Decision name must correspond to the phase the plan is in. This requires
         # mapping from lifecycle statuses to decision names.
-        for event_value in interaction_events_by_status.get(
-            plan.lifecycle_status.value, []
-        ):
+        for event_value in interaction_events_by_status.get(lifecycle_status, []):
             entry = RyhtiInteractionEvent()
             # TODO: Let's just have random uuid for now, on the assumption that each
             # phase is only POSTed to ryhti once. If planners need to post and repost
@@ -1082,7 +2565,7 @@ class RyhtiClient:
 
             try:
                 lifecycle_date = self.get_lifecycle_dates_for_status(
-                    plan, plan.lifecycle_status.value
+                    plan, lifecycle_status
                 )[-1]
             except IndexError:
                 raise AssertionError(
@@ -1179,7 +2662,7 @@ class RyhtiClient:
         plan_matter["permanentPlanIdentifier"] = plan.permanent_plan_identifier
         # Plan type has to be proper URI (not just value) here, *unlike* when only
         # validating plan. Go figure.
-        plan_matter["planType"] = plan.plan_type.uri
+        plan_matter["planType"] = self.get_code_uri_by_id(plan.plan_type_id)
         # For reasons unknown, name is needed for plan matter but not for plan. Plan
         # only contains description, and only in one language.
         plan_matter["name"] = plan.name
@@ -1205,9 +2688,7 @@ class RyhtiClient:
         # Apparently Ryhti plans may cover multiple administrative areas, so the region
         # identifier has to be embedded in a list.
         plan_matter["administrativeAreaIdentifiers"] = [
-            plan.organisation.municipality.value
-            if plan.organisation.municipality
-            else plan.organisation.administrative_region.value
+            self.get_administrative_area_identifier(plan)
         ]
         # We have no need of importing the digital origin code list as long as we are
         # not digitizing old plans:
@@ -1222,452 +2703,875 @@ class RyhtiClient:
         plan_matter["planMatterPhases"] = self.get_plan_matter_phases(plan)
         return plan_matter
 
-    def get_plan_matters(self) -> Dict[str, RyhtiPlanMatter]:
+    def get_plan_matters(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiPlanMatter]:
         """
         Construct a dict of valid Ryhti compatible plan matters from valid plans in the
-        local database.
+        local database. Optionally, only serialize the given plans.
         """
         plan_matters = dict()
-        for plan in self.valid_plans.values():
+        for plan in self.select_plans(self.valid_plans, plan_ids).values():
             plan_matters[plan.id] = self.get_plan_matter(plan)
         return plan_matters
 
-    def validate_plans(self) -> Dict[str, RyhtiResponse]:
+    def record_timing(self, stage: str, key: str, start: float) -> None:
         """
-        Validates all plans serialized in client plan dictionaries.
+        Record the time elapsed since start for the given stage and key (e.g. plan id)
+        in client metrics.
         """
-        plan_validation_endpoint = f"{self.public_api_base}/Plan/validate"
-        responses: Dict[str, RyhtiResponse] = dict()
-        for plan_id, plan_dict in self.plan_dictionaries.items():
-            LOGGER.info(f"Validating JSON for plan {plan_id}...")
-
-            # Some plan fields may only be present in plan matter, not in the plan
-            # dictionary. In the context of plan validation, they must be provided as
-            # query parameters.
-            plan = self.plans[plan_id]
-            plan_type_parameter = plan.plan_type.value
-            # We only support one area id, no need for commas and concat:
-            admin_area_id_parameter = (
-                plan.organisation.municipality.value
-                if plan.organisation.municipality
-                else plan.organisation.administrative_region.value
-            )
-            if self.debug_json:
-                with open(f"ryhti_debug/{plan_id}.json", "w") as plan_file:
-                    json.dump(plan_dict, plan_file)
-            LOGGER.info(f"POSTing JSON: {json.dumps(plan_dict)}")
-
-            # requests apparently uses simplejson automatically if it is installed!
-            # A bit too much magic for my taste, but seems to work.
-            response = requests.post(
-                plan_validation_endpoint,
-                json=plan_dict,
-                headers=self.public_headers,
-                params={
-                    "planType": plan_type_parameter,
-                    "administrativeAreaIdentifiers": admin_area_id_parameter,
-                },
-            )
-            LOGGER.info(f"Got response {response}")
-            if response.status_code == 200:
-                # Successful validation does not return any json!
-                responses[plan_id] = {
-                    "status": 200,
-                    "errors": None,
-                    "detail": None,
-                    "warnings": None,
-                }
-            else:
-                try:
-                    # Validation errors always contain JSON
-                    responses[plan_id] = response.json()
-                except json.JSONDecodeError:
-                    # There is something wrong with the API
-                    response.raise_for_status()
-            if self.debug_json:
-                with open(f"ryhti_debug/{plan_id}.response.json", "w") as response_file:
-                    json.dump(responses[plan_id], response_file)
-            LOGGER.info(responses[plan_id])
-        return responses
+        elapsed = time.perf_counter() - start
+        self.record_metric(f"{stage}_seconds", key, round(elapsed, 3))
+        LOGGER.info(f"{stage} for {key} took {elapsed:.3f} s")
 
-    def upload_plan_documents(self) -> Dict[str, List[RyhtiResponse]]:
+    def record_metric(self, metric: str, key: str, value: Any) -> None:
         """
-        Upload any changed plan documents. If document has not been modified
-        since it was last uploaded, do nothing.
-        """
-        responses: Dict[str, List[RyhtiResponse]] = dict()
-        file_endpoint = self.xroad_server_address + self.xroad_api_path + "File"
-        upload_headers = self.xroad_headers.copy()
-        upload_headers["Content-Type"] = "multipart/form-data"
-        for plan in self.valid_plans.values():
-            responses[plan.id] = []
-            municipality = (
-                plan.organisation.municipality.value
-                if plan.organisation.municipality
-                else None
-            )
-            region = plan.organisation.administrative_region.value
-            for document in plan.documents:
-                if document.url:
-                    # No need to upload if document hasn't changed
-                    if (
-                        document.exported_at
-                        and document.exported_at
-                        > email.utils.parsedate_to_datetime(
-                            requests.head(document.url).headers["Last-Modified"]
-                        )
-                    ):
-                        LOGGER.info("File unchanged since last upload.")
-                        responses[plan.id].append(
-                            RyhtiResponse(
-                                status=None,
-                                detail="File unchanged since last upload.",
-                                errors=None,
-                                warnings=None,
-                            )
-                        )
-                        continue
-                    # Let's try streaming the file instead of downloading
-                    # and then uploading:
-                    file_request = requests.get(document.url, stream=True)
-                    if file_request.status_code == 200:
-                        file_name = document.url.split("/")[-1]
-                        file_type = file_request.headers["Content-Type"]
-                        files = {
-                            "file": (
-                                file_name,
-                                file_request.raw,
-                                file_type,
-                            )
-                        }
-                        # TODO: get coordinate system from file. Maybe not easy
-                        # if just streaming it thru.
-                        post_parameters = (
-                            {"municipalityId": municipality}
-                            if municipality
-                            else {"regionId": region}
-                        )
-                        post_response = requests.post(
-                            file_endpoint,
-                            files=files,
-                            params=post_parameters,
-                            headers=upload_headers,
-                        )
-                        post_response.raise_for_status()
-                        LOGGER.info(f"Posted file {post_response.json()}")
-                        responses[plan.id].append(
-                            RyhtiResponse(
-                                status=201,
-                                detail=post_response.json(),
-                                errors=None,
-                                warnings=None,
-                            )
-                        )
-                    else:
-                        LOGGER.warning("Could not fetch file! Please check file URL.")
-                        responses[plan.id].append(
-                            RyhtiResponse(
-                                status=None,
-                                detail="Could not fetch file! Please check file URL.",
-                                errors=None,
-                                warnings=None,
-                            )
-                        )
-        return responses
+        Record the value of the metric for the given key (e.g. plan id) in client
+        metrics.
+        """
+        with self.metrics_lock:
+            self.metrics.setdefault(metric, dict())[key] = value
 
-    def get_permanent_plan_identifiers(self) -> Dict[str, RyhtiResponse]:
+    def count_metric(self, metric: str, key: str) -> None:
         """
-        Get permanent plan identifiers for all plans that are marked
-        valid but do not have identifiers set yet.
-        """
-        responses: Dict[str, RyhtiResponse] = dict()
-        for plan in self.valid_plans.values():
-            if not plan.permanent_plan_identifier:
-                plan_identifier_endpoint = (
-                    self.xroad_server_address
-                    + self.xroad_api_path
-                    + self.get_plan_matter_api_path(plan.plan_type.uri)
-                    + "permanentPlanIdentifier"
-                )
-                LOGGER.info(f"Getting permanent identifier for plan {plan.id}...")
-                administrative_area_identifier = (
-                    plan.organisation.municipality.value
-                    if plan.organisation.municipality
-                    else plan.organisation.administrative_region.value
-                )
-                data = {
-                    "administrativeAreaIdentifier": administrative_area_identifier,
-                    "projectName": plan.producers_plan_identifier,
-                }
-                LOGGER.info("Request headers")
-                LOGGER.info(self.xroad_headers)
-                LOGGER.info("Request URL")
-                LOGGER.info(plan_identifier_endpoint)
-                LOGGER.info("Request data")
-                LOGGER.info(data)
-                response = requests.post(
-                    plan_identifier_endpoint, json=data, headers=self.xroad_headers
-                )
-                LOGGER.info("Plan identifier response:")
-                LOGGER.info(response.status_code)
-                LOGGER.info(response.headers)
-                LOGGER.info(response.text)
-                if response.status_code == 401:
-                    LOGGER.info(
-                        "No permission to get plan identifier in this region or municipality!"  # noqa
-                    )
-                    responses[plan.id] = {
-                        "status": 401,
-                        "errors": response.json(),
-                        "detail": None,
-                        "warnings": None,
-                    }
-                else:
-                    response.raise_for_status()
-                    LOGGER.info(f"Received identifier {response.json()}")
-                    responses[plan.id] = {
-                        "status": 200,
-                        "detail": response.json(),
-                        "errors": None,
-                        "warnings": None,
-                    }
-                if self.debug_json:
-                    with open(
-                        f"ryhti_debug/{plan.id}.identifier.response.json", "w"
-                    ) as response_file:
-                        response_file.write(str(plan_identifier_endpoint) + "\n")
-                        response_file.write(str(self.xroad_headers) + "\n")
-                        response_file.write(str(data) + "\n")
-                        json.dump(str(responses[plan.id]), response_file)
-        return responses
+        Add one to the count of the metric for the given key (e.g. API) in client
+        metrics.
+        """
+        with self.metrics_lock:
+            counts = self.metrics.setdefault(metric, dict())
+            counts[key] = counts.get(key, 0) + 1
 
-    def validate_plan_matters(self) -> Dict[str, RyhtiResponse]:
+    def select_plans(
+        self, items: Dict[str, T], plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, T]:
         """
-        Validates all plan matters serialized in client plan matter dictionaries.
+        Return the items of the given plans, in the order of the plan ids. If plan ids
+        are not given, all items are returned.
+
+        Pipelined plans add and release their items in other threads, so the items
+        are never iterated here. The returned dict is always a new one, so it may be
+        iterated safely.
         """
-        responses: Dict[str, RyhtiResponse] = dict()
-        for plan_id, plan_matter in self.plan_matter_dictionaries.items():
-            permanent_id = plan_matter["permanentPlanIdentifier"]
-            plan_matter_validation_endpoint = (
-                self.xroad_server_address
-                + self.xroad_api_path
-                + self.get_plan_matter_api_path(plan_matter["planType"])
-                + f"{permanent_id}/validate"
-            )
-            LOGGER.info(f"Validating JSON for plan matter {permanent_id}...")
+        if plan_ids is None:
+            return dict(items)
+        return {plan_id: items[plan_id] for plan_id in plan_ids if plan_id in items}
 
-            if self.debug_json:
-                with open(f"ryhti_debug/{permanent_id}.json", "w") as plan_file:
-                    json.dump(plan_matter, plan_file)
-            LOGGER.info(f"POSTing JSON: {json.dumps(plan_matter)}")
-
-            # requests apparently uses simplejson automatically if it is installed!
-            # A bit too much magic for my taste, but seems to work.
-            response = requests.post(
-                plan_matter_validation_endpoint,
-                json=plan_matter,
-                headers=self.xroad_headers,
-            )
-            LOGGER.info(f"Got response {response}")
-            LOGGER.info(response.text)
-            if response.status_code == 200:
-                # Successful validation might return warnings
-                responses[plan_id] = {
-                    "status": 200,
-                    "errors": None,
-                    "detail": None,
-                    "warnings": response.json()["warnings"],
+    def map_plans(
+        self,
+        function: Callable[[str, T], R],
+        items: Dict[str, T],
+        workers: Optional[int] = None,
+    ) -> Dict[str, R]:
+        """
+        Call function with each plan id and item, running at most max_workers calls
+        concurrently, unless another number of workers is given.
+
+        Results are returned in the same plan order as the items, no matter in which
+        order the calls finish. If any call raises an exception, it is raised here.
+
+        Calls are not started once the deadline has passed. Their plans are marked
+        unfinished and left out of the results.
+        """
+        skipped: Set[str] = set()
+
+        def call(plan_id: str, item: T) -> Optional[R]:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                skipped.add(plan_id)
+                self.unfinished_plans.add(plan_id)
+                return None
+            return function(plan_id, item)
+
+        workers = workers or self.max_workers
+        if workers == 1 or len(items) <= 1:
+            results = {plan_id: call(plan_id, item) for plan_id, item in items.items()}
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    plan_id: executor.submit(call, plan_id, item)
+                    for plan_id, item in items.items()
                 }
-            else:
-                try:
-                    # Validation errors always contain JSON
-                    responses[plan_id] = response.json()
-                except json.JSONDecodeError:
-                    # There is something wrong with the API
-                    response.raise_for_status()
-            if self.debug_json:
-                with open(
-                    f"ryhti_debug/{permanent_id}.response.json", "w"
-                ) as response_file:
-                    json.dump(responses[plan_id], response_file)
-            LOGGER.info(responses[plan_id])
-        return responses
+                results = {
+                    plan_id: future.result() for plan_id, future in futures.items()
+                }
+        if skipped:
+            LOGGER.info(f"Deadline reached, {len(skipped)} plans not started.")
+        return {
+            plan_id: cast(R, result)
+            for plan_id, result in results.items()
+            if plan_id not in skipped
+        }
 
-    def create_new_resource(
-        self, endpoint: str, resource_dict: RyhtiPlanMatter | RyhtiPlanMatterPhase
-    ) -> RyhtiResponse:
+    def validate_schema(
+        self, schema_name: str, ryhti_dict: RyhtiPlan | RyhtiPlanMatter
+    ) -> Optional[RyhtiResponse]:
         """
-        POST new resource to Ryhti API.
+        Checks the plan or plan matter dictionary against the local Ryhti schema.
+
+        Returns None if the dictionary is valid or prevalidation is disabled.
+        Otherwise, returns the errors in the same format as Ryhti API, so structural
+        errors can be reported without sending the dictionary to Ryhti.
         """
-        response = requests.post(
-            endpoint,
-            json=resource_dict,
-            headers=self.xroad_headers,
-        )
-        LOGGER.info(f"Got response {response}")
-        LOGGER.info(response.text)
-        if response.status_code == 201:
-            # POST successful! The API may give warnings when saving.
-            ryhti_response = {
-                "status": 201,
-                "errors": None,
-                "warnings": response.json()["warnings"],
-                "detail": None,
+        if not self.prevalidate:
+            return None
+        errors = [
+            {
+                "ruleId": f"schema.{error.validator}",
+                # Error messages may contain whole geometries, keep them readable
+                "message": error.message[:max_schema_error_length],
+                "instance": error.json_path,
             }
-        else:
-            try:
-                # API errors always contain JSON
-                ryhti_response = response.json()
-            except json.JSONDecodeError:
-                # There is something wrong with the API
-                response.raise_for_status()
-        return cast(RyhtiResponse, ryhti_response)
+            for error in sorted(
+                get_schema_validator(schema_name).iter_errors(ryhti_dict),
+                key=lambda error: error.json_path,
+            )
+        ]
+        if not errors:
+            return None
+        self.record_metric(
+            "schema_validation_errors",
+            str(ryhti_dict.get("planKey") or ryhti_dict.get("permanentPlanIdentifier")),
+            len(errors),
+        )
+        return {
+            "status": 422,
+            "detail": f"{schema_name} does not match the Ryhti schema.",
+            "errors": cast(dict, errors),
+            "warnings": None,
+        }
 
-    def update_resource(
-        self, endpoint: str, resource_dict: RyhtiPlanMatter | RyhtiPlanMatterPhase
-    ) -> RyhtiResponse:
+    @fail_softly
+    def validate_plan(self, plan_id: str, plan_dict: RyhtiPlan) -> RyhtiResponse:
         """
-        PUT resource to Ryhti API.
+        Validates a single plan dictionary with the public API.
         """
-        response = requests.put(
-            endpoint,
-            json=resource_dict,
-            headers=self.xroad_headers,
+        plan_validation_endpoint = f"{self.public_api_base}/Plan/validate"
+        LOGGER.info(f"Validating JSON for plan {plan_id}...")
+
+        # Some plan fields may only be present in plan matter, not in the plan
+        # dictionary. In the context of plan validation, they must be provided as
+        # query parameters.
+        plan = self.plans[plan_id]
+        plan_type_parameter = self.get_code_value_by_id(plan.plan_type_id)
+        # We only support one area id, no need for commas and concat:
+        admin_area_id_parameter = self.get_administrative_area_identifier(plan)
+        parameters = {
+            "planType": plan_type_parameter,
+            "administrativeAreaIdentifiers": admin_area_id_parameter,
+        }
+        # No need to validate again if plan and code lists haven't changed
+        digest = self.get_plan_digest(plan_dict, parameters)
+        self.plan_digests[plan_id] = digest
+        if (
+            not self.force_validation
+            and plan.validation_response
+            and plan.validation_digest == digest
+        ):
+            LOGGER.info("Plan unchanged since last validation, using saved response.")
+            self.record_metric("plan_validation_unchanged", plan_id, True)
+            return cast(RyhtiResponse, plan.validation_response)
+        schema_response = self.validate_schema("Plan", plan_dict)
+        if schema_response:
+            LOGGER.info(schema_response)
+            return schema_response
+        if self.debug_json:
+            with open(f"ryhti_debug/{plan_id}.json", "w") as plan_file:
+                json.dump(plan_dict, plan_file)
+        LOGGER.info(f"POSTing JSON: {json.dumps(plan_dict)}")
+
+        # requests apparently uses simplejson automatically if it is installed!
+        # A bit too much magic for my taste, but seems to work.
+        start = time.perf_counter()
+        response = self.request(
+            "POST",
+            plan_validation_endpoint,
+            json=plan_dict,
+            headers=self.public_headers,
+            params=parameters,
+            retry=True,
         )
+        self.record_timing("plan_validation", plan_id, start)
         LOGGER.info(f"Got response {response}")
-        LOGGER.info(response.text)
         if response.status_code == 200:
-            # PUT successful! The API may give warnings when saving.
-            ryhti_response = {
+            # Successful validation does not return any json!
+            ryhti_response: RyhtiResponse = {
                 "status": 200,
                 "errors": None,
-                "warnings": response.json()["warnings"],
                 "detail": None,
+                "warnings": None,
             }
         else:
             try:
-                # API errors always contain JSON
+                # Validation errors always contain JSON
                 ryhti_response = response.json()
             except json.JSONDecodeError:
                 # There is something wrong with the API
                 response.raise_for_status()
-        return cast(RyhtiResponse, ryhti_response)
+        if self.debug_json:
+            with open(f"ryhti_debug/{plan_id}.response.json", "w") as response_file:
+                json.dump(ryhti_response, response_file)
+        LOGGER.info(ryhti_response)
+        return ryhti_response
+
+    def validate_plans(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiResponse]:
+        """
+        Validates all plans serialized in client plan dictionaries. Optionally, only
+        validate the given plans.
 
-    def post_plan_matters(self) -> Dict[str, RyhtiResponse]:
+        Up to max_workers plans are validated concurrently. Responses are returned
+        in plan order.
         """
-        POST all marked and valid plan matter data in the client to Ryhti.
+        return self.map_plans(
+            self.validate_plan, self.select_plans(self.plan_dictionaries, plan_ids)
+        )
 
-        This means either creating a new plan matter, updating the plan matter,
-        creating a new plan matter phase, or updating the plan matter phase.
+    def get_document_last_modified(self, url: str) -> Optional[datetime.datetime]:
         """
-        responses: Dict[str, RyhtiResponse] = dict()
-        for plan_id, plan_matter in self.valid_plan_matters.items():
-            # 0) Check if plan is marked to be exported
-            if not self.plans[plan_id].to_be_exported:
-                continue
+        Returns the time the document was last modified, if the server reports it.
+        """
+        last_modified = self.request("HEAD", url).headers.get("Last-Modified")
+        if not last_modified:
+            return None
+        try:
+            return email.utils.parsedate_to_datetime(last_modified)
+        except (TypeError, ValueError):
+            LOGGER.warning(f"Could not parse Last-Modified header {last_modified}")
+            return None
+
+    @fail_softly
+    def upload_plan_document(
+        self, document_id: str, plan_document: Tuple[models.Plan, models.Document]
+    ) -> RyhtiResponse:
+        """
+        Upload a single plan document, unless it hasn't changed since it was last
+        uploaded.
 
-            permanent_id = plan_matter["permanentPlanIdentifier"]
-            plan_matter_endpoint = (
-                self.xroad_server_address
-                + self.xroad_api_path
-                + self.get_plan_matter_api_path(plan_matter["planType"])
-                + permanent_id
+        If the server reports when the document was last modified, there is no need to
+        even download a document that was uploaded after that. Otherwise, the document
+        is downloaded and its checksum compared to that of the uploaded file.
+        """
+        plan, document = plan_document
+        url = cast(str, document.url)
+        unchanged_response = RyhtiResponse(
+            status=None,
+            detail="File unchanged since last upload.",
+            errors=None,
+            warnings=None,
+        )
+        start = time.perf_counter()
+        if document.exported_at:
+            last_modified = self.get_document_last_modified(url)
+            if last_modified and document.exported_at > last_modified:
+                LOGGER.info("File unchanged since last upload.")
+                self.record_timing("document_upload", document_id, start)
+                return unchanged_response
+        # Buffer the file while calculating its checksum, so large files don't have to
+        # fit in memory. Closing the response returns the connection to the pool even
+        # if the file is not read.
+        with self.request(
+            "GET", url, stream=True
+        ) as file_request, tempfile.SpooledTemporaryFile(
+            max_size=document_buffer_size
+        ) as file:
+            if file_request.status_code != 200:
+                LOGGER.warning("Could not fetch file! Please check file URL.")
+                return RyhtiResponse(
+                    status=None,
+                    detail="Could not fetch file! Please check file URL.",
+                    errors=None,
+                    warnings=None,
+                )
+            file_hash = hashlib.sha256()
+            for chunk in file_request.iter_content(chunk_size=64 * 1024):
+                file_hash.update(chunk)
+                file.write(chunk)
+            checksum = file_hash.hexdigest()
+            self.record_metric("document_bytes", document_id, file.tell())
+            if (
+                document.exported_file_key
+                and document.exported_file_checksum == checksum
+            ):
+                LOGGER.info("File contents unchanged since last upload.")
+                self.record_timing("document_upload", document_id, start)
+                return unchanged_response
+            file.seek(0)
+
+            file_endpoint = self.xroad_server_address + self.xroad_api_path + "File"
+            upload_headers = self.xroad_headers.copy()
+            upload_headers["Content-Type"] = "multipart/form-data"
+            file_name = url.split("/")[-1]
+            file_type = file_request.headers["Content-Type"]
+            files = {"file": (file_name, file, file_type)}
+            # TODO: get coordinate system from file. Maybe not easy
+            # if just streaming it thru.
+            municipality = (
+                self.get_code_value_by_id(plan.organisation.municipality_id)
+                if plan.organisation.municipality_id
+                else None
             )
-            print(plan_matter_endpoint)
-
-            # 1) Check or create plan matter with the identifier
-            LOGGER.info(f"Checking if plan matter for plan {permanent_id} exists...")
-            get_response = requests.get(
-                plan_matter_endpoint, headers=self.xroad_headers
+            region = self.get_code_value_by_id(
+                plan.organisation.administrative_region_id
             )
-            if get_response.status_code == 404:
-                LOGGER.info(f"Plan matter {permanent_id} not found! Creating...")
-                responses[plan_id] = self.create_new_resource(
-                    plan_matter_endpoint, plan_matter
-                )
-                if self.debug_json:
-                    with open(
-                        f"ryhti_debug/{permanent_id}.plan_matter_post_response.json",
-                        "w",
-                    ) as response_file:
-                        json.dump(responses[plan_id], response_file)
-                LOGGER.info(responses[plan_id])
-                continue
-            # 2) If plan matter existed, check or create plan matter phase instead
-            elif get_response.status_code == 200:
-                LOGGER.info(
-                    f"Plan matter {permanent_id} found! "
-                    "Checking if plan matter phase exits..."
-                )
-                phases: List[RyhtiPlanMatterPhase] = get_response.json()[
-                    "planMatterPhases"
-                ]
-                local_phase = plan_matter["planMatterPhases"][0]
-                local_lifecycle_status = local_phase["lifeCycleStatus"]
-                print(phases)
-                print(local_phase)
-                try:
-                    current_phase = [
-                        phase
-                        for phase in phases
-                        if phase["lifeCycleStatus"] == local_lifecycle_status
-                    ][0]
-                except IndexError:
-                    LOGGER.info(
-                        f"Phase {local_lifecycle_status} not found! Creating..."
-                    )
-                    # Create new phase with locally generated id:
-                    plan_matter_phase_endpoint = (
-                        plan_matter_endpoint
-                        + "/phase/"
-                        + local_phase["planMatterPhaseKey"]
-                    )
-                    print(plan_matter_phase_endpoint)
-                    responses[plan_id] = self.create_new_resource(
-                        plan_matter_phase_endpoint, local_phase
-                    )
-                    if self.debug_json:
-                        with open(
-                            "ryhti_debug/"
-                            + permanent_id
-                            + ".plan_matter_phase_post_response.json",
-                            "w",
-                        ) as response_file:
-                            json.dump(responses[plan_id], response_file)
-                    LOGGER.info(responses[plan_id])
-                    continue
-                # 3) If plan matter phase existed, update plan matter phase instead
-                LOGGER.info(
-                    f"Plan matter phase {local_lifecycle_status} found! "
-                    "Updating phase..."
-                )
-                # Use existing phase id:
-                plan_matter_phase_endpoint = (
-                    plan_matter_endpoint
-                    + "/phase/"
-                    + current_phase["planMatterPhaseKey"]
-                )
-                responses[plan_id] = self.update_resource(
-                    plan_matter_phase_endpoint, local_phase
-                )
+            post_parameters = (
+                {"municipalityId": municipality}
+                if municipality
+                else {"regionId": region}
+            )
+            post_response = self.request(
+                "POST",
+                file_endpoint,
+                files=files,
+                params=post_parameters,
+                headers=upload_headers,
+            )
+            post_response.raise_for_status()
+        self.record_timing("document_upload", document_id, start)
+        LOGGER.info(f"Posted file {post_response.json()}")
+        self.document_checksums[document_id] = checksum
+        return RyhtiResponse(
+            status=201,
+            detail=post_response.json(),
+            errors=None,
+            warnings=None,
+        )
+
+    def upload_plan_documents(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, List[RyhtiResponse]]:
+        """
+        Upload any changed plan documents. If document has not been modified
+        since it was last uploaded, do nothing. Optionally, only upload documents
+        of the given plans.
+
+        Up to document_upload_workers documents are uploaded concurrently. Responses
+        are returned in plan and document order.
+        """
+        plans = self.select_plans(self.valid_plans, plan_ids)
+        documents = {
+            document.id: (plan, document)
+            for plan in plans.values()
+            for document in plan.documents
+            if document.url
+        }
+        document_responses = self.map_plans(
+            self.upload_plan_document, documents, workers=self.document_upload_workers
+        )
+        responses: Dict[str, List[RyhtiResponse]] = {plan_id: [] for plan_id in plans}
+        not_started = set()
+        for document_id, (plan, _) in documents.items():
+            if document_id in document_responses:
+                responses[plan.id].append(document_responses[document_id])
+            else:
+                not_started.add(plan.id)
+            if document_id in self.failed_requests:
+                # Plan must be exported again with the document
+                self.failed_requests.add(plan.id)
+            if document_id in self.unfinished_plans:
+                # Plan must be continued with the document in the next run
+                self.unfinished_plans.discard(document_id)
+                self.unfinished_plans.add(plan.id)
+        # Documents of plans not started before the deadline are uploaded next run
+        return {
+            plan_id: plan_responses
+            for plan_id, plan_responses in responses.items()
+            if plan_id not in not_started
+        }
+
+    @fail_softly
+    def get_permanent_plan_identifier(
+        self, plan_id: str, plan: models.Plan
+    ) -> RyhtiResponse:
+        """
+        Get permanent plan identifier for a single plan.
+        """
+        plan_identifier_endpoint = (
+            self.xroad_server_address
+            + self.xroad_api_path
+            + self.get_plan_matter_api_path(self.get_code_uri_by_id(plan.plan_type_id))
+            + "permanentPlanIdentifier"
+        )
+        LOGGER.info(f"Getting permanent identifier for plan {plan_id}...")
+        administrative_area_identifier = self.get_administrative_area_identifier(plan)
+        data = {
+            "administrativeAreaIdentifier": administrative_area_identifier,
+            "projectName": plan.producers_plan_identifier,
+        }
+        LOGGER.info("Request headers")
+        LOGGER.info(self.xroad_headers)
+        LOGGER.info("Request URL")
+        LOGGER.info(plan_identifier_endpoint)
+        LOGGER.info("Request data")
+        LOGGER.info(data)
+        response = self.request(
+            "POST",
+            plan_identifier_endpoint,
+            json=data,
+            headers=self.xroad_headers,
+        )
+        LOGGER.info("Plan identifier response:")
+        LOGGER.info(response.status_code)
+        LOGGER.info(response.headers)
+        LOGGER.info(response.text)
+        ryhti_response: RyhtiResponse
+        if response.status_code == 401:
+            LOGGER.info(
+                "No permission to get plan identifier in this region or municipality!"
+            )
+            ryhti_response = {
+                "status": 401,
+                "errors": response.json(),
+                "detail": None,
+                "warnings": None,
+            }
+        else:
+            response.raise_for_status()
+            LOGGER.info(f"Received identifier {response.json()}")
+            ryhti_response = {
+                "status": 200,
+                "detail": response.json(),
+                "errors": None,
+                "warnings": None,
+            }
+        if self.debug_json:
+            with open(
+                f"ryhti_debug/{plan_id}.identifier.response.json", "w"
+            ) as response_file:
+                response_file.write(str(plan_identifier_endpoint) + "\n")
+                response_file.write(str(self.xroad_headers) + "\n")
+                response_file.write(str(data) + "\n")
+                json.dump(str(ryhti_response), response_file)
+        return ryhti_response
+
+    def get_permanent_plan_identifiers(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiResponse]:
+        """
+        Get permanent plan identifiers for all plans that are marked
+        valid but do not have identifiers set yet. Optionally, only get identifiers
+        for the given plans.
+
+        Up to max_workers identifiers are requested concurrently. Responses are
+        returned in plan order.
+        """
+        plans = {
+            plan_id: plan
+            for plan_id, plan in self.select_plans(self.valid_plans, plan_ids).items()
+            if not plan.permanent_plan_identifier
+        }
+        return self.map_plans(self.get_permanent_plan_identifier, plans)
+
+    @fail_softly
+    def validate_plan_matter(
+        self, plan_id: str, plan_matter: RyhtiPlanMatter
+    ) -> RyhtiResponse:
+        """
+        Validates a single plan matter.
+        """
+        permanent_id = plan_matter["permanentPlanIdentifier"]
+        plan_matter_validation_endpoint = (
+            self.xroad_server_address
+            + self.xroad_api_path
+            + self.get_plan_matter_api_path(plan_matter["planType"])
+            + f"{permanent_id}/validate"
+        )
+        LOGGER.info(f"Validating JSON for plan matter {permanent_id}...")
+        schema_response = self.validate_schema("PlanMatter", plan_matter)
+        if schema_response:
+            LOGGER.info(schema_response)
+            return schema_response
+
+        if self.debug_json:
+            with open(f"ryhti_debug/{permanent_id}.json", "w") as plan_file:
+                json.dump(plan_matter, plan_file)
+        LOGGER.info(f"POSTing JSON: {json.dumps(plan_matter)}")
+
+        # requests apparently uses simplejson automatically if it is installed!
+        # A bit too much magic for my taste, but seems to work.
+        response = self.request(
+            "POST",
+            plan_matter_validation_endpoint,
+            json=plan_matter,
+            headers=self.xroad_headers,
+            retry=True,
+        )
+        LOGGER.info(f"Got response {response}")
+        LOGGER.info(response.text)
+        if response.status_code == 200:
+            # Successful validation might return warnings
+            ryhti_response: RyhtiResponse = {
+                "status": 200,
+                "errors": None,
+                "detail": None,
+                "warnings": response.json()["warnings"],
+            }
+        else:
+            try:
+                # Validation errors always contain JSON
+                ryhti_response = response.json()
+            except json.JSONDecodeError:
+                # There is something wrong with the API
+                response.raise_for_status()
+        if self.debug_json:
+            with open(
+                f"ryhti_debug/{permanent_id}.response.json", "w"
+            ) as response_file:
+                json.dump(ryhti_response, response_file)
+        LOGGER.info(ryhti_response)
+        return ryhti_response
+
+    def validate_plan_matters(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiResponse]:
+        """
+        Validates all plan matters serialized in client plan matter dictionaries.
+        Optionally, only validate the given plan matters.
+
+        Up to max_workers plan matters are validated concurrently. Responses are
+        returned in plan order.
+        """
+        return self.map_plans(
+            self.validate_plan_matter,
+            self.select_plans(self.plan_matter_dictionaries, plan_ids),
+        )
+
+    def create_new_resource(
+        self, endpoint: str, resource_dict: RyhtiPlanMatter | RyhtiPlanMatterPhase
+    ) -> RyhtiResponse:
+        """
+        POST new resource to Ryhti API.
+        """
+        response = self.request(
+            "POST",
+            endpoint,
+            json=resource_dict,
+            headers=self.xroad_headers,
+        )
+        return self.get_resource_response(response, 201)
+
+    def update_resource(
+        self, endpoint: str, resource_dict: RyhtiPlanMatter | RyhtiPlanMatterPhase
+    ) -> RyhtiResponse:
+        """
+        PUT resource to Ryhti API.
+        """
+        response = self.request(
+            "PUT",
+            endpoint,
+            json=resource_dict,
+            headers=self.xroad_headers,
+        )
+        return self.get_resource_response(response, 200)
+
+    def get_resource_response(
+        self, response: requests.Response, success_status: int
+    ) -> RyhtiResponse:
+        """
+        Returns Ryhti response to POST or PUT resource request.
+        """
+        LOGGER.info(f"Got response {response}")
+        LOGGER.info(response.text)
+        if response.status_code == success_status:
+            # POST or PUT successful! The API may give warnings when saving.
+            ryhti_response = {
+                "status": success_status,
+                "errors": None,
+                "warnings": response.json()["warnings"],
+                "detail": None,
+            }
+        else:
+            try:
+                # API errors always contain JSON
+                ryhti_response = response.json()
+            except json.JSONDecodeError:
+                # There is something wrong with the API
+                response.raise_for_status()
+        return cast(RyhtiResponse, ryhti_response)
+
+    def get_unchanged_phase_response(self, plan_id: str) -> RyhtiResponse:
+        """
+        Returns response for a plan matter phase that is already up to date in Ryhti.
+        """
+        self.record_metric("plan_matter_phase_unchanged", plan_id, True)
+        return RyhtiResponse(
+            status=304,
+            detail="Plan matter phase unchanged in Ryhti.",
+            errors=None,
+            warnings=None,
+        )
+
+    def post_plan_matter_phase_from_state(
+        self,
+        plan_id: str,
+        plan_matter_endpoint: str,
+        local_phase: RyhtiPlanMatterPhase,
+        digest: str,
+    ) -> Optional[RyhtiResponse]:
+        """
+        POST or PUT a single plan matter phase based on the last known state of the
+        plan matter in Ryhti, without fetching the plan matter first.
+
+        Returns None if Ryhti reports that the plan matter or phase was not found or
+        is in conflict, i.e. the known state is out of date.
+        """
+        state = self.plan_matter_states[plan_id]
+        local_lifecycle_status = local_phase["lifeCycleStatus"]
+        phase_key = state["phaseKeys"].get(local_lifecycle_status)
+        if phase_key and state.get("digest") == digest:
+            LOGGER.info(
+                f"Plan matter phase {local_lifecycle_status} unchanged since last "
+                "export! Not updating phase."
+            )
+            return self.get_unchanged_phase_response(plan_id)
+        if phase_key:
+            LOGGER.info(f"Updating known phase {local_lifecycle_status}...")
+            method, success_status = "PUT", 200
+        else:
+            LOGGER.info(f"Creating phase {local_lifecycle_status}...")
+            phase_key = local_phase["planMatterPhaseKey"]
+            method, success_status = "POST", 201
+        response = self.request(
+            method,
+            plan_matter_endpoint + "/phase/" + phase_key,
+            json=local_phase,
+            headers=self.xroad_headers,
+        )
+        if response.status_code in (404, 409):
+            LOGGER.info("Known plan matter state is out of date!")
+            response.close()
+            return None
+        return self.get_resource_response(response, success_status)
+
+    @fail_softly
+    def post_plan_matter(
+        self, plan_id: str, plan_matter: RyhtiPlanMatter
+    ) -> RyhtiResponse:
+        """
+        POST a single plan matter to Ryhti, creating or updating the plan matter or
+        its phase. Phases that are already up to date in Ryhti are not updated.
+
+        If the plan matter has been exported before, its phase is written based on
+        the last known state of the plan matter in Ryhti. The plan matter is only
+        fetched if it has not been exported, or if the known state is out of date.
+        """
+        permanent_id = plan_matter["permanentPlanIdentifier"]
+        plan_matter_endpoint = (
+            self.xroad_server_address
+            + self.xroad_api_path
+            + self.get_plan_matter_api_path(plan_matter["planType"])
+            + permanent_id
+        )
+        print(plan_matter_endpoint)
+        local_phase = plan_matter["planMatterPhases"][0]
+        digest = get_plan_matter_phase_digest(local_phase)
+
+        # 0) If we know the plan matter state in Ryhti, write the phase right away
+        ryhti_response = None
+        known_state = cast(
+            Optional[Dict[str, Any]], self.plans[plan_id].plan_matter_state
+        )
+        if known_state and known_state["permanentPlanIdentifier"] == permanent_id:
+            self.plan_matter_states[plan_id] = {
+                **known_state,
+                "phaseKeys": dict(known_state["phaseKeys"]),
+            }
+            ryhti_response = self.post_plan_matter_phase_from_state(
+                plan_id, plan_matter_endpoint, local_phase, digest
+            )
+        if ryhti_response is None:
+            ryhti_response = self.post_plan_matter_after_get(
+                plan_id, plan_matter, plan_matter_endpoint
+            )
+        # Remember the phase keys and the exported phase, so the plan matter need not
+        # be fetched next time
+        if ryhti_response.get("status") in (200, 201, 304):
+            state = self.plan_matter_states[plan_id]
+            state["phaseKeys"].setdefault(
+                local_phase["lifeCycleStatus"], local_phase["planMatterPhaseKey"]
+            )
+            state["digest"] = digest
+        else:
+            # Known state is only saved after successful export
+            self.plan_matter_states.pop(plan_id, None)
+        return ryhti_response
+
+    def post_plan_matter_after_get(
+        self, plan_id: str, plan_matter: RyhtiPlanMatter, plan_matter_endpoint: str
+    ) -> RyhtiResponse:
+        """
+        Fetch a single plan matter from Ryhti, and create the plan matter, or create
+        or update its phase, depending on what is found.
+        """
+        permanent_id = plan_matter["permanentPlanIdentifier"]
+        # 1) Check or create plan matter with the identifier
+        LOGGER.info(f"Checking if plan matter for plan {permanent_id} exists...")
+        get_response = self.request(
+            "GET", plan_matter_endpoint, headers=self.xroad_headers
+        )
+        if get_response.status_code in (200, 404):
+            self.plan_matter_states[plan_id] = {
+                "permanentPlanIdentifier": permanent_id,
+                "phaseKeys": {},
+                "digest": None,
+            }
+        if get_response.status_code == 404:
+            LOGGER.info(f"Plan matter {permanent_id} not found! Creating...")
+            ryhti_response = self.create_new_resource(plan_matter_endpoint, plan_matter)
+            if self.debug_json:
+                with open(
+                    f"ryhti_debug/{permanent_id}.plan_matter_post_response.json",
+                    "w",
+                ) as response_file:
+                    json.dump(ryhti_response, response_file)
+            LOGGER.info(ryhti_response)
+            return ryhti_response
+        # 2) If plan matter existed, check or create plan matter phase instead
+        elif get_response.status_code == 200:
+            LOGGER.info(
+                f"Plan matter {permanent_id} found! "
+                "Checking if plan matter phase exits..."
+            )
+            phases: List[RyhtiPlanMatterPhase] = get_response.json()["planMatterPhases"]
+            self.plan_matter_states[plan_id]["phaseKeys"] = {
+                phase["lifeCycleStatus"]: phase["planMatterPhaseKey"]
+                for phase in phases
+            }
+            local_phase = plan_matter["planMatterPhases"][0]
+            local_lifecycle_status = local_phase["lifeCycleStatus"]
+            print(phases)
+            print(local_phase)
+            try:
+                current_phase = [
+                    phase
+                    for phase in phases
+                    if phase["lifeCycleStatus"] == local_lifecycle_status
+                ][0]
+            except IndexError:
+                LOGGER.info(f"Phase {local_lifecycle_status} not found! Creating...")
+                # Create new phase with locally generated id:
+                plan_matter_phase_endpoint = (
+                    plan_matter_endpoint + "/phase/" + local_phase["planMatterPhaseKey"]
+                )
+                print(plan_matter_phase_endpoint)
+                ryhti_response = self.create_new_resource(
+                    plan_matter_phase_endpoint, local_phase
+                )
                 if self.debug_json:
                     with open(
                         "ryhti_debug/"
                         + permanent_id
-                        + ".plan_matter_phase_put_response.json",
+                        + ".plan_matter_phase_post_response.json",
                         "w",
                     ) as response_file:
-                        json.dump(responses[plan_id], response_file)
-                LOGGER.info(responses[plan_id])
-            else:
-                try:
-                    # API errors always contain JSON
-                    responses[plan_id] = get_response.json()
-                    LOGGER.info(responses[plan_id])
-                except json.JSONDecodeError:
-                    # There is something wrong with the API
-                    get_response.raise_for_status()
-        return responses
+                        json.dump(ryhti_response, response_file)
+                LOGGER.info(ryhti_response)
+                return ryhti_response
+            # 3) If plan matter phase existed, update plan matter phase instead,
+            # unless it is already up to date
+            if normalize_plan_matter_phase(
+                current_phase
+            ) == normalize_plan_matter_phase(local_phase):
+                LOGGER.info(
+                    f"Plan matter phase {local_lifecycle_status} found and "
+                    "unchanged! Not updating phase."
+                )
+                return self.get_unchanged_phase_response(plan_id)
+            LOGGER.info(
+                f"Plan matter phase {local_lifecycle_status} found! "
+                "Updating phase..."
+            )
+            # Use existing phase id:
+            plan_matter_phase_endpoint = (
+                plan_matter_endpoint + "/phase/" + current_phase["planMatterPhaseKey"]
+            )
+            ryhti_response = self.update_resource(
+                plan_matter_phase_endpoint, local_phase
+            )
+            if self.debug_json:
+                with open(
+                    "ryhti_debug/"
+                    + permanent_id
+                    + ".plan_matter_phase_put_response.json",
+                    "w",
+                ) as response_file:
+                    json.dump(ryhti_response, response_file)
+            LOGGER.info(ryhti_response)
+            return ryhti_response
+        try:
+            # API errors always contain JSON
+            ryhti_response = get_response.json()
+            LOGGER.info(ryhti_response)
+        except json.JSONDecodeError:
+            # There is something wrong with the API
+            get_response.raise_for_status()
+        return ryhti_response
+
+    def post_plan_matters(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiResponse]:
+        """
+        POST all marked and valid plan matter data in the client to Ryhti. Optionally,
+        only POST the given plan matters.
+
+        This means either creating a new plan matter, updating the plan matter,
+        creating a new plan matter phase, or updating the plan matter phase.
+
+        Up to max_workers plan matters are POSTed concurrently. Responses are
+        returned in plan order.
+        """
+        return self.map_plans(self.post_plan_matter, self.get_plans_to_post(plan_ids))
+
+    def get_plans_to_post(
+        self, plan_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, RyhtiPlanMatter]:
+        """
+        Returns the valid plan matters of those plans that are marked to be exported.
+        Optionally, only return plan matters of the given plans.
+        """
+        return {
+            plan_id: plan_matter
+            for plan_id, plan_matter in self.select_plans(
+                self.valid_plan_matters, plan_ids
+            ).items()
+            if self.plans[plan_id].to_be_exported
+        }
+
+    @staticmethod
+    def get_existing_plan_ids(session: Session, plan_ids: Iterable[str]) -> Set[str]:
+        """
+        Returns ids of those given plans that are still found in the database.
+        """
+        return set(
+            session.scalars(
+                select(models.Plan.id).where(models.Plan.id.in_(list(plan_ids)))
+            )
+        )
+
+    def update_plans(
+        self, session: Session, plan_values: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Update the given column values of all given plans in the database.
+
+        Plans are updated by primary key in a single executemany UPDATE per set of
+        columns, so we don't have to fetch and flush each plan separately. The client
+        engine sends the rows of the UPDATE in pages of 100 plans. All plans must
+        exist in the database.
+
+        Cached plans are updated too, without marking them modified, so that plans in
+        the client stay up to date with the database.
+        """
+        if not plan_values:
+            return
+        session.execute(
+            update(models.Plan),
+            [{"id": plan_id, **values} for plan_id, values in plan_values.items()],
+        )
+        for plan_id, values in plan_values.items():
+            plan = self.plans.get(plan_id)
+            if plan:
+                for key, value in values.items():
+                    set_committed_value(plan, key, value)
 
     def save_plan_validation_responses(
         self, responses: Dict[str, RyhtiResponse]
@@ -1686,12 +3590,12 @@ class RyhtiClient:
         If Ryhti request fails unexpectedly, save the returned error.
         """
         details: Dict[str, str] = {}
-        with self.Session(expire_on_commit=False) as session:
+        plan_values: Dict[str, Dict[str, Any]] = {}
+        validated_at = datetime.datetime.now(tz=LOCAL_TZ)
+        with self.Session() as session:
+            existing_plan_ids = self.get_existing_plan_ids(session, responses.keys())
             for plan_id, response in responses.items():
-                # TODO: do we have to fetch plan from db again? Can we use valid_plans
-                # dict?
-                plan = session.get(models.Plan, plan_id)
-                if not plan:
+                if plan_id not in existing_plan_ids:
                     # Plan has been deleted in the middle of validation. Nothing
                     # to see here, move on
                     LOGGER.info(
@@ -1700,29 +3604,36 @@ class RyhtiClient:
                     continue
                 LOGGER.info(f"Saving response for plan {plan_id}...")
                 LOGGER.info(response)
+                values = plan_values[plan_id] = dict()
                 # In case Ryhti API does not respond in the expected manner,
                 # save the response for debugging.
                 if "status" not in response or "errors" not in response:
                     details[
                         plan_id
                     ] = f"RYHTI API returned unexpected response: {response}"
-                    plan.validation_errors = f"RYHTI API ERROR: {response}"
+                    values["validation_errors"] = f"RYHTI API ERROR: {response}"
+                    # Plan must be validated again next time
+                    values["validation_digest"] = None
+                    values["validation_response"] = None
                     LOGGER.info(details[plan_id])
                     LOGGER.info(f"Ryhti response: {json.dumps(response)}")
                     continue
                 elif response["status"] == 200:
                     details[plan_id] = f"Validation successful for {plan_id}!"
-                    plan.validation_errors = (
-                        "Kaava on validi. Kaava-asiaa ei ole vielä validoitu."
-                    )
-                    self.valid_plans[plan_id] = plan
+                    values[
+                        "validation_errors"
+                    ] = "Kaava on validi. Kaava-asiaa ei ole vielä validoitu."
+                    self.valid_plans[plan_id] = self.plans[plan_id]
                 else:
                     details[plan_id] = f"Validation FAILED for {plan_id}."
-                    plan.validation_errors = response["errors"]
+                    values["validation_errors"] = response["errors"]
 
                 LOGGER.info(details[plan_id])
                 LOGGER.info(f"Ryhti response: {json.dumps(response)}")
-                plan.validated_at = datetime.datetime.now(tz=LOCAL_TZ)
+                values["validated_at"] = validated_at
+                values["validation_digest"] = self.plan_digests.get(plan_id)
+                values["validation_response"] = cast(dict, response)
+            self.update_plans(session, plan_values)
             session.commit()
         return Response(
             statusCode=200,
@@ -1749,6 +3660,9 @@ class RyhtiClient:
                     session.add(document)
                     if document_response["status"] == 201:
                         document.exported_file_key = document_response["detail"]
+                        document.exported_file_checksum = self.document_checksums.get(
+                            document.id
+                        )
                         document.exported_at = datetime.datetime.now(tz=LOCAL_TZ)
                     # We can only serialize the document after it has been uploaded
                     self.add_document_to_plan_dict(
@@ -1760,22 +3674,34 @@ class RyhtiClient:
         """
         Save permanent plan identifiers returned by RYHTI API to the database.
         """
-        with self.Session(expire_on_commit=False) as session:
-            for plan_id, response in responses.items():
-                # Make sure that the plan in the valid plans dict stays up to date
-                plan = self.valid_plans[plan_id]
-                session.add(plan)
-                if response["status"] == 200:
-                    plan.permanent_plan_identifier = response["detail"]
-                    plan.validation_errors = (
+        plan_values: Dict[str, Dict[str, Any]] = {}
+        for plan_id, response in responses.items():
+            if response["status"] == 200:
+                plan_values[plan_id] = {
+                    "permanent_plan_identifier": response["detail"],
+                    "validation_errors": (
                         "Kaava on validi. Pysyvä kaavatunnus tallennettu. Kaava-"
                         "asiaa ei ole vielä validoitu."
-                    )
-                elif response["status"] == 401:
-                    plan.validation_errors = (
+                    ),
+                }
+            elif response["status"] == 401:
+                plan_values[plan_id] = {
+                    "validation_errors": (
                         "Kaava on validi, mutta sinulla ei ole oikeuksia luoda "
                         "kaavaa tälle alueelle."
                     )
+                }
+        with self.Session() as session:
+            # Plans may have been deleted in the middle of the run
+            existing_plan_ids = self.get_existing_plan_ids(session, plan_values.keys())
+            self.update_plans(
+                session,
+                {
+                    plan_id: values
+                    for plan_id, values in plan_values.items()
+                    if plan_id in existing_plan_ids
+                },
+            )
             session.commit()
 
     def save_plan_matter_validation_responses(
@@ -1796,10 +3722,12 @@ class RyhtiClient:
         If Ryhti request fails unexpectedly, save the returned error.
         """
         details: Dict[str, str] = {}
-        with self.Session(expire_on_commit=False) as session:
+        plan_values: Dict[str, Dict[str, Any]] = {}
+        validated_at = datetime.datetime.now(tz=LOCAL_TZ)
+        with self.Session() as session:
+            existing_plan_ids = self.get_existing_plan_ids(session, responses.keys())
             for plan_id, response in responses.items():
-                plan: Optional[models.Plan] = session.get(models.Plan, plan_id)
-                if not plan:
+                if plan_id not in existing_plan_ids:
                     # Plan has been deleted in the middle of validation. Nothing
                     # to see here, move on
                     LOGGER.info(
@@ -1808,13 +3736,14 @@ class RyhtiClient:
                     continue
                 LOGGER.info(f"Saving response for plan matter {plan_id}...")
                 LOGGER.info(response)
+                values = plan_values[plan_id] = dict()
                 # In case Ryhti API does not respond in the expected manner,
                 # save the response for debugging.
                 if "status" not in response or "errors" not in response:
                     details[
                         plan_id
                     ] = f"RYHTI API returned unexpected response: {response}"
-                    plan.validation_errors = f"RYHTI API ERROR: {response}"
+                    values["validation_errors"] = f"RYHTI API ERROR: {response}"
                     LOGGER.info(details[plan_id])
                     LOGGER.info(f"Ryhti response: {json.dumps(response)}")
                     continue
@@ -1822,19 +3751,20 @@ class RyhtiClient:
                     details[
                         plan_id
                     ] = f"Plan matter validation successful for {plan_id}!"
-                    plan.validation_errors = (
-                        "Kaava-asia on validi ja sen voi viedä Ryhtiin."
-                    )
+                    values[
+                        "validation_errors"
+                    ] = "Kaava-asia on validi ja sen voi viedä Ryhtiin."
                     self.valid_plan_matters[plan_id] = self.plan_matter_dictionaries[
                         plan_id
                     ]
                 else:
                     details[plan_id] = f"Plan matter validation FAILED for {plan_id}."
-                    plan.validation_errors = response["errors"]
+                    values["validation_errors"] = response["errors"]
 
                 LOGGER.info(details[plan_id])
                 LOGGER.info(f"Ryhti response: {json.dumps(response)}")
-                plan.validated_at = datetime.datetime.now(tz=LOCAL_TZ)
+                values["validated_at"] = validated_at
+            self.update_plans(session, plan_values)
             session.commit()
         return Response(
             statusCode=200,
@@ -1851,7 +3781,9 @@ class RyhtiClient:
         """
         Save X-Road API POST response data to the database and return lambda response.
 
-        If POST is successful, update exported_at field.
+        If POST is successful, update exported_at field. If the plan matter phase
+        was already up to date in Ryhti, only unmark the plan to be exported. The
+        known state of the plan matter in Ryhti is saved for the next export.
 
         If POST is unsuccessful, save the error JSON in plan
         validation_errors json field (in addition to saving it to AWS logs and
@@ -1860,10 +3792,12 @@ class RyhtiClient:
         If Ryhti request fails unexpectedly, save the returned error.
         """
         details: Dict[str, str] = {}
-        with self.Session(expire_on_commit=False) as session:
+        plan_values: Dict[str, Dict[str, Any]] = {}
+        exported_at = datetime.datetime.now(tz=LOCAL_TZ)
+        with self.Session() as session:
+            existing_plan_ids = self.get_existing_plan_ids(session, responses.keys())
             for plan_id, response in responses.items():
-                plan: Optional[models.Plan] = session.get(models.Plan, plan_id)
-                if not plan:
+                if plan_id not in existing_plan_ids:
                     # Plan has been deleted in the middle of POST. Nothing
                     # to see here, move on
                     LOGGER.info(
@@ -1872,35 +3806,51 @@ class RyhtiClient:
                     continue
                 LOGGER.info(f"Saving response for plan matter {plan_id}...")
                 LOGGER.info(response)
+                values = plan_values[plan_id] = dict()
+                if plan_id in self.plan_matter_states:
+                    values["plan_matter_state"] = self.plan_matter_states.pop(plan_id)
                 # In case Ryhti API does not respond in the expected manner,
                 # save the response for debugging.
                 if "status" not in response or "errors" not in response:
                     details[
                         plan_id
                     ] = f"RYHTI API returned unexpected response: {response}"
-                    plan.validation_errors = f"RYHTI API ERROR: {response}"
+                    values["validation_errors"] = f"RYHTI API ERROR: {response}"
                 elif response["status"] == 200:
                     details[
                         plan_id
                     ] = f"Plan matter phase PUT successful for {plan_id}!"
-                    plan.validation_errors = "Kaava-asian vaihe on päivitetty Ryhtiin."
-                    plan.exported_at = datetime.datetime.now(tz=LOCAL_TZ)
-                    plan.to_be_exported = False
+                    values[
+                        "validation_errors"
+                    ] = "Kaava-asian vaihe on päivitetty Ryhtiin."
+                    values["exported_at"] = exported_at
+                    values["to_be_exported"] = False
+                elif response["status"] == 304:
+                    details[
+                        plan_id
+                    ] = f"Plan matter phase unchanged in Ryhti for {plan_id}."
+                    values[
+                        "validation_errors"
+                    ] = "Kaava-asian vaihe on jo ajan tasalla Ryhtissä."
+                    values["to_be_exported"] = False
                 elif response["status"] == 201:
                     details[plan_id] = (
                         "Plan matter or plan matter phase POST successful for "
                         + plan_id
                         + "!"
                     )
-                    plan.validation_errors = "Uusi kaava-asian vaihe on viety Ryhtiin."
-                    plan.exported_at = datetime.datetime.now(tz=LOCAL_TZ)
-                    plan.to_be_exported = False
+                    values[
+                        "validation_errors"
+                    ] = "Uusi kaava-asian vaihe on viety Ryhtiin."
+                    values["exported_at"] = exported_at
+                    values["to_be_exported"] = False
                 else:
                     details[plan_id] = f"Plan matter POST FAILED for {plan_id}."
-                    plan.validation_errors = response["errors"]
+                    values["validation_errors"] = response["errors"]
 
                 LOGGER.info(details[plan_id])
                 LOGGER.info(f"Ryhti response: {json.dumps(response)}")
+            self.update_plans(session, plan_values)
             session.commit()
         return Response(
             statusCode=200,
@@ -1914,25 +3864,673 @@ class RyhtiClient:
             ),
         )
 
+    def process_plans(
+        self,
+        plan_ids: Optional[Iterable[str]] = None,
+        use_xroad: bool = False,
+        authenticate: bool = True,
+    ) -> Response:
+        """
+        Serialize, validate and, if requested, POST the given plans, or all plans in
+        the client. Each stage is run for all the given plans before moving on to the
+        next stage.
+
+        X-Road stages are only run if use_xroad is set. If authenticate is not set,
+        the client must already be authenticated to X-Road API.
+
+        Returns the lambda response with the details and Ryhti responses of the last
+        stage each plan reached.
+        """
+        if plan_ids is not None:
+            plan_ids = list(plan_ids)
+        # Stages are only started if there is time left. Finished stages are saved
+        # in the database, so the next run will not have to repeat them.
+        if self.out_of_time(plan_ids):
+            return Response(
+                statusCode=200,
+                body=ResponseBody(
+                    title="Ran out of time before processing plans.",
+                    details={},
+                    ryhti_responses={},
+                ),
+            )
+        # 1) Serialize plans in database
+        LOGGER.info("Formatting plan data...")
+        self.plan_dictionaries |= self.get_plan_dictionaries(plan_ids)
+        self.save_plan_object_fragments()
+
+        # 2) Validate plans in database with public API
+        LOGGER.info("Validating plans...")
+        responses = self.validate_plans(plan_ids)
+
+        # 3) Save plan validation data
+        LOGGER.info("Saving plan validation data...")
+        lambda_response = self.save_plan_validation_responses(responses)
+
+        # *Also* validate plan matter if plans are already valid.
+        #
+        # This can be done *without* POSTing plans, but it *will* give the plan a
+        # permanent plan identifier the moment the plan itself is valid. Does this make
+        # sense?
+        # When we want to upload plans, we need to embed plan objects
+        # further, to create kaava-asiat etc. With uploading, therefore, the
+        # JSON to be POSTed is more complex, but it has plan_dictionary embedded.
+        # Invalid plans are finished, only valid plans are left unfinished.
+        if not use_xroad or self.out_of_time(
+            self.select_plans(self.valid_plans, plan_ids)
+        ):
+            return lambda_response
+
+        if authenticate:
+            # Set authentication header first.
+            LOGGER.info("Authenticating to X-road Ryhti API...")
+            self.xroad_ryhti_authenticate()
+
+        # Documents are exported separately from plan matter. Also, they need to be
+        # present in Ryhti *before* plan matter is created.
+        #
+        # Therefore, let's export all the documents right away, and update them to
+        # the latest version when needed. Otherwise, the plan matter would never be
+        # valid. Only upload documents for those plans that are valid.
+        # 4) If changed documents exist, upload documents
+        LOGGER.info("Checking and updating plan documents for valid plans...")
+        plan_documents = self.upload_plan_documents(plan_ids)
+
+        LOGGER.info("Marking documents exported...")
+        self.set_plan_documents(plan_documents)
+        if self.out_of_time(self.select_plans(self.valid_plans, plan_ids)):
+            return lambda_response
+
+        # Only get identifiers for those plans that are valid.
+        # 5) Check or create permanent plan identifier for valid plans, from X-Road
+        # API
+        LOGGER.info("Getting permanent plan identifiers for valid plans...")
+        plan_identifiers = self.get_permanent_plan_identifiers(plan_ids)
+
+        LOGGER.info("Setting permanent plan identifiers for valid plans...")
+        self.set_permanent_plan_identifiers(plan_identifiers)
+        if self.out_of_time(self.select_plans(self.valid_plans, plan_ids)):
+            return lambda_response
+
+        # 6) Validate plan matters with identifiers with X-Road API
+        LOGGER.info("Formatting plan matter data for valid plans...")
+        self.plan_matter_dictionaries |= self.get_plan_matters(plan_ids)
+
+        LOGGER.info("Validating plan matters for valid plans...")
+        responses = self.validate_plan_matters(plan_ids)
+
+        # 7) Save plan matter validation data
+        LOGGER.info("Saving plan matter validation data for valid plans...")
+        # Merge details and ryhti_responses for valid and invalid plans. Invalid
+        # plans will have plan validation responses, valid plans will have plan
+        # matter validation responses.
+        plan_matter_validation_response = self.save_plan_matter_validation_responses(
+            responses
+        )
+        merge_responses(lambda_response, plan_matter_validation_response)
+        if self.event_type is Action.POST_PLANS and not self.out_of_time(
+            self.get_plans_to_post(plan_ids)
+        ):
+            # 8) Update Ryhti plan matters
+            LOGGER.info("POSTing marked and valid plan matters:")
+            responses = self.post_plan_matters(plan_ids)
+
+            # 9) Save plan matter update responses
+            LOGGER.info("Saving plan matter POST data for posted plans...")
+            # Merge details and ryhti_responses for valid and invalid plan matters.
+            # Invalid plans will have plan validation responses, invalid plan
+            # matters will have plan matter validation responses, and valid plan
+            # matters will have plan POST responses.
+            plan_matter_post_response = self.save_plan_matter_post_responses(responses)
+            merge_responses(lambda_response, plan_matter_post_response)
+        return lambda_response
+
+    def out_of_time(self, plan_ids: Optional[Iterable[str]] = None) -> bool:
+        """
+        Check if the deadline of the run has passed. If it has, the given plans, or
+        all plans in the client, are marked unfinished. Only plans that still have
+        stages left should be given.
+        """
+        if self.deadline is None or time.monotonic() < self.deadline:
+            return False
+        LOGGER.info("Deadline reached, not starting new stages.")
+        self.unfinished_plans.update(self.plans if plan_ids is None else plan_ids)
+        return True
+
+    def get_continuation_token(self) -> Optional[str]:
+        """
+        Returns the token to resume the run from the first unfinished plan, or None
+        if all plans were finished.
+
+        Plans are processed in order, so the token contains the last plan before the
+        first unfinished plan, and any plans finished after it.
+        """
+        if not self.unfinished_plans:
+            return None
+        first_unfinished = next(
+            index
+            for index, plan_id in enumerate(self.plan_order)
+            if plan_id in self.unfinished_plans
+        )
+        after = (
+            self.plan_order[first_unfinished - 1]
+            if first_unfinished
+            else self.resume_after
+        )
+        done = [
+            plan_id
+            for plan_id in self.resume_done + self.plan_order[first_unfinished:]
+            if plan_id not in self.unfinished_plans and (not after or plan_id > after)
+        ]
+        return encode_continuation_token(after, done)
+
+    def release_plan(self, plan_id: str) -> None:
+        """
+        Drop all cached data of a single plan from the client.
+        """
+        self.plans.pop(plan_id, None)
+        self.valid_plans.pop(plan_id, None)
+        self.plan_digests.pop(plan_id, None)
+        self.plan_dictionaries.pop(plan_id, None)
+        self.plan_matter_dictionaries.pop(plan_id, None)
+        self.valid_plan_matters.pop(plan_id, None)
+        self.plan_matter_states.pop(plan_id, None)
+
+    def process_plans_pipelined(
+        self,
+        workers: int,
+        use_xroad: bool = False,
+        plan_ids: Optional[Iterable[str]] = None,
+        authenticate: bool = True,
+    ) -> Response:
+        """
+        Run all stages separately for the given plans, or each plan in the client, so
+        that a slow plan does not hold up the other plans. At most the given number
+        of plans are processed concurrently, and the cached data of each plan are
+        released as soon as the plan is finished.
+
+        Returns the same lambda response as processing all the plans with
+        process_plans.
+        """
+        if use_xroad and authenticate:
+            # Authenticate only once for all plans.
+            LOGGER.info("Authenticating to X-road Ryhti API...")
+            self.xroad_ryhti_authenticate()
+
+        def process_plan(plan_id: str, _: None) -> Response:
+            start = time.perf_counter()
+            try:
+                return self.process_plans([plan_id], use_xroad, authenticate=False)
+            finally:
+                self.release_plan(plan_id)
+                self.record_timing("plan_pipeline", plan_id, start)
+
+        responses = self.map_plans(
+            process_plan,
+            dict.fromkeys(self.plans if plan_ids is None else plan_ids),
+            workers,
+        )
+        lambda_response = Response(
+            statusCode=200,
+            body=ResponseBody(title="", details={}, ryhti_responses={}),
+        )
+        for response in responses.values():
+            merge_responses(lambda_response, response)
+        return lambda_response
+
+    def process_plans_in_batches(
+        self, use_xroad: bool = False, pipeline_workers: int = 0
+    ) -> Response:
+        """
+        Run all stages for each batch of plans before loading the next batch, so that
+        memory usage does not grow with the number of plans. Plans in each batch are
+        pipelined, if the number of pipeline workers is given.
+
+        Returns the same lambda response as processing all the plans with
+        process_plans.
+        """
+        if use_xroad:
+            # Authenticate only once for all batches.
+            LOGGER.info("Authenticating to X-road Ryhti API...")
+            self.xroad_ryhti_authenticate()
+        lambda_response = Response(
+            statusCode=200,
+            body=ResponseBody(title="", details={}, ryhti_responses={}),
+        )
+        for batch in self.get_plan_batches():
+            if pipeline_workers:
+                response = self.process_plans_pipelined(
+                    pipeline_workers, use_xroad, batch, authenticate=False
+                )
+            else:
+                response = self.process_plans(batch, use_xroad, authenticate=False)
+            merge_responses(lambda_response, response)
+        return lambda_response
+
+    def get_plan_dictionaries_in_batches(self) -> Dict[str, RyhtiPlan]:
+        """
+        Serialize the plans in the client one batch at a time. Only the serialized
+        plans are kept after each batch.
+        """
+        plan_dictionaries: Dict[str, RyhtiPlan] = dict()
+        for batch in self.get_plan_batches():
+            plan_dictionaries |= self.get_plan_dictionaries(batch)
+            self.save_plan_object_fragments()
+        return plan_dictionaries
+
+
+def get_client_engine(connection_string: str) -> Engine:
+    """
+    Returns the engine shared by all Ryhti clients with the same connection string.
+    """
+    # Our own changes to plans (validation responses, identifiers etc.) must not
+    # mark the plans changed again, or they would be processed on every run.
+    # By default, psycopg2 sends executemany statements one row at a time. Send the
+    # updates of all plans in pages instead.
+    return get_engine(
+        connection_string,
+        connect_args={"options": "-c hame.skip_change_tracking=on"},
+        executemany_mode="values_plus_batch",
+    )
+
+
+def get_code_list_version(session: Session) -> str:
+    """
+    Returns digest of the values and statuses of all codes in the database.
+    """
+    code_classes = [
+        code_class
+        for _, code_class in inspect.getmembers(codes, inspect.isclass)
+        if issubclass(code_class, codes.CodeBase) and code_class is not codes.CodeBase
+    ]
+    # Let the database calculate digests for all code lists in a single query.
+    code_list_query = union_all(
+        *[
+            select(
+                literal(code_class.__tablename__),
+                func.md5(
+                    func.string_agg(
+                        code_class.value + ":" + code_class.status,
+                        aggregate_order_by(literal(","), code_class.value),
+                    )
+                ),
+            )
+            for code_class in code_classes
+        ]
+    )
+    code_list_digests = sorted(
+        f"{table}:{digest}" for table, digest in session.execute(code_list_query)
+    )
+    return hashlib.sha256(",".join(code_list_digests).encode()).hexdigest()
+
+
+def get_plan_data_version_query(plan_id: str) -> Any:
+    """
+    Returns query for the number of rows and their latest modification time in each
+    table containing data of the plan. Association tables have no modification
+    times, so a digest of the association rows is returned instead.
+    """
+    plan_object_classes: Tuple[Type[base.PlanObjectBase], ...] = (
+        models.LandUseArea,
+        models.OtherArea,
+        models.Line,
+        models.LandUsePoint,
+        models.OtherPoint,
+    )
+    group_ids = select(models.PlanRegulationGroup.id).where(
+        models.PlanRegulationGroup.plan_id == plan_id
+    )
+    regulation_ids = select(models.PlanRegulation.id).where(
+        models.PlanRegulation.plan_regulation_group_id.in_(group_ids)
+    )
+    proposition_ids = select(models.PlanProposition.id).where(
+        models.PlanProposition.plan_regulation_group_id.in_(group_ids)
+    )
+    lifecycle_date_filter = or_(
+        models.LifeCycleDate.plan_id == plan_id,
+        models.LifeCycleDate.plan_regulation_id.in_(regulation_ids),
+        models.LifeCycleDate.plan_proposition_id.in_(proposition_ids),
+        *[
+            getattr(models.LifeCycleDate, f"{plan_object_class.__tablename__}_id").in_(
+                select(plan_object_class.id).where(plan_object_class.plan_id == plan_id)
+            )
+            for plan_object_class in plan_object_classes
+        ],
+    )
+    row_filters: Dict[Type[base.VersionedBase], Any] = {
+        models.Plan: models.Plan.id == plan_id,
+        models.Organisation: models.Organisation.id
+        == select(models.Plan.organisation_id)
+        .where(models.Plan.id == plan_id)
+        .scalar_subquery(),
+        models.PlanRegulationGroup: models.PlanRegulationGroup.plan_id == plan_id,
+        models.PlanRegulation: models.PlanRegulation.id.in_(regulation_ids),
+        models.PlanProposition: models.PlanProposition.id.in_(proposition_ids),
+        models.AdditionalInformation: (
+            models.AdditionalInformation.plan_regulation_id.in_(regulation_ids)
+        ),
+        models.LifeCycleDate: lifecycle_date_filter,
+        models.EventDate: models.EventDate.lifecycle_date_id.in_(
+            select(models.LifeCycleDate.id).where(lifecycle_date_filter)
+        ),
+        models.Document: models.Document.plan_id == plan_id,
+        models.SourceData: models.SourceData.plan_id == plan_id,
+    } | {
+        plan_object_class: plan_object_class.plan_id == plan_id
+        for plan_object_class in plan_object_classes
+    }
+    association_filters = {
+        models.regulation_group_association: or_(
+            models.regulation_group_association.c.plan_id == plan_id,
+            models.regulation_group_association.c.plan_regulation_group_id.in_(
+                group_ids
+            ),
+        ),
+        models.legal_effects_association: (
+            models.legal_effects_association.c.plan_id == plan_id
+        ),
+        models.type_of_verbal_regulation_association: (
+            models.type_of_verbal_regulation_association.c.plan_regulation_id.in_(
+                regulation_ids
+            )
+        ),
+    }
+    row_queries = [
+        select(
+            literal(entity.__tablename__),
+            func.count(),
+            func.max(entity.modified_at).cast(Text),
+        ).where(row_filter)
+        for entity, row_filter in row_filters.items()
+    ]
+    association_queries = []
+    for table, row_filter in association_filters.items():
+        row_text = func.concat_ws(":", *table.c)
+        association_queries.append(
+            select(
+                literal(table.name),
+                func.count(),
+                func.md5(
+                    func.string_agg(
+                        row_text, aggregate_order_by(literal(","), row_text)
+                    )
+                ),
+            ).where(row_filter)
+        )
+    return union_all(*row_queries, *association_queries)
+
+
+def get_plan_etag(
+    connection_string: str, plan_id: str, parameters: Dict[str, Any]
+) -> Optional[str]:
+    """
+    Returns strong ETag for the serialized plan and the given serialization
+    parameters, or None if the plan does not exist.
+
+    The ETag is calculated from the plan id and the modification times of the plan
+    data and the code lists, so the plan need not be loaded or serialized. All plans
+    are requested from the same URL, so plans with identical data versions must
+    still have different ETags.
+    """
+    with Session(get_client_engine(connection_string)) as session:
+        data_versions = sorted(
+            list(row) for row in session.execute(get_plan_data_version_query(plan_id))
+        )
+        if not any(table == "plan" and count for table, count, _ in data_versions):
+            return None
+        plan_version = json.dumps(
+            {
+                "plan_id": plan_id,
+                "data": data_versions,
+                "code_lists": get_code_list_version(session),
+                "parameters": parameters,
+            },
+            sort_keys=True,
+        )
+    return f'"{hashlib.sha256(plan_version.encode()).hexdigest()}"'
+
+
+@lru_cache
+def get_schema_version() -> str:
+    """
+    Returns digest of the local Ryhti schema file. The file is only read once per
+    process.
+    """
+    with open(schema_path, "rb") as schema_file:
+        return hashlib.sha256(schema_file.read()).hexdigest()
+
+
+@lru_cache
+def get_schema_validator(schema_name: str) -> Draft202012Validator:
+    """
+    Returns validator for the given schema in the local Ryhti schema. Each validator
+    is only created once per process.
+    """
+    with open(schema_path) as schema_file:
+        schemas = json.load(schema_file)
+    return Draft202012Validator(
+        {
+            "$ref": f"#/components/schemas/{schema_name}",
+            "components": schemas["components"],
+        }
+    )
+
+
+def encode_continuation_token(after: Optional[str], done: List[str]) -> str:
+    """
+    Returns an opaque token containing the last plan before the first unfinished
+    plan, and the plans finished after it.
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps({"after": after, "done": done}).encode()
+    ).decode()
+
+
+def decode_continuation_token(token: Optional[str]) -> Tuple[Optional[str], List[str]]:
+    """
+    Returns the last plan before the first unfinished plan, and the plans finished
+    after it. Raises ValueError if the token is invalid.
+    """
+    if not token:
+        return None, []
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token))
+        after, done = data["after"], data["done"]
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError("Invalid continuation token.") from error
+    if not (after is None or isinstance(after, str)) or not isinstance(done, list):
+        raise ValueError("Invalid continuation token.")
+    return after, [str(plan_id) for plan_id in done]
+
+
+def is_count(value: Any, minimum: int) -> bool:
+    """
+    Check that the event parameter is an integer of at least the given minimum.
+    """
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+
+def is_key_list(value: Any) -> bool:
+    """
+    Check that the event parameter is a list of dictionary keys.
+    """
+    return isinstance(value, list) and all(isinstance(key, str) for key in value)
+
+
+def get_retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Returns the seconds to wait given in the Retry-After header of the response,
+    either as seconds or as a HTTP date, or None if the header is missing or invalid.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        LOGGER.warning(f"Could not parse Retry-After header {retry_after}")
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(
+        (retry_at - datetime.datetime.now(tz=datetime.timezone.utc)).total_seconds(),
+        0.0,
+    )
+
+
+def get_token_expiry(token: str) -> Optional[float]:
+    """
+    Returns the expiry time of a JSON Web Token as a POSIX timestamp, or None if the
+    token is not a JWT or has no expiry time.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        )
+        return float(claims["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def merge_responses(response: Response, other_response: Response) -> Response:
+    """
+    Merge the title, details and Ryhti responses of another lambda response into
+    the response. Details and Ryhti responses of the other response replace those of
+    the same plans in the response.
+    """
+    response["body"]["title"] = other_response["body"]["title"]
+    response["body"]["details"] |= other_response["body"]["details"]
+    response["body"]["ryhti_responses"] |= other_response["body"]["ryhti_responses"]
+    return response
+
+
+def project_plan_dictionary(
+    value: Any, exclude: Set[str], coordinate_precision: Optional[int] = None
+) -> Any:
+    """
+    Returns a copy of the plan dictionary without the excluded keys at any depth,
+    with coordinates rounded to the given number of decimals.
+
+    Plan dictionaries may share memoized fragments, so they are never modified.
+    """
+
+    def project(value: Any, in_coordinates: bool) -> Any:
+        if isinstance(value, dict):
+            return {
+                key: project(item, in_coordinates or key == "coordinates")
+                for key, item in value.items()
+                if key not in exclude
+            }
+        if isinstance(value, list):
+            return [project(item, in_coordinates) for item in value]
+        if in_coordinates and coordinate_precision is not None:
+            return round(value, coordinate_precision)
+        return value
+
+    return project(value, False)
+
+
+def normalize_plan_matter_phase(phase: RyhtiPlanMatterPhase) -> Any:
+    """
+    Returns a copy of the plan matter phase that can be compared to the same phase
+    returned by Ryhti. Randomly generated keys are dropped, missing and null values
+    are considered equal, and decimals are converted to floats like in any JSON
+    parsed from Ryhti.
+    """
+
+    def normalize(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {
+                key: normalize(item)
+                for key, item in value.items()
+                if key not in generated_keys and item is not None
+            }
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        return value
+
+    return normalize(json.loads(json.dumps(phase)))
+
+
+def get_plan_matter_phase_digest(phase: RyhtiPlanMatterPhase) -> str:
+    """
+    Returns digest of the normalized plan matter phase.
+    """
+    phase_data = json.dumps(normalize_plan_matter_phase(phase), sort_keys=True)
+    return hashlib.sha256(phase_data.encode()).hexdigest()
+
 
 def responsify(
-    response: Response, using_api_gateway: bool = False
+    response: Response,
+    using_api_gateway: bool = False,
+    compress: bool = False,
+    headers: Optional[Dict[str, str]] = None,
 ) -> Response | AWSAPIGatewayResponse:
     """
     Convert response to API gateway response if the request arrived through API gateway.
     If we want to provide status code to API gateway, the JSON body must be string.
+
+    If compress is set, the API gateway response body is gzip compressed and base64
+    encoded. Any given headers are added to the API gateway response.
     """
-    return (
-        AWSAPIGatewayResponse(
-            statusCode=response["statusCode"], body=json.dumps(response["body"])
+    if not using_api_gateway:
+        return response
+    body = json.dumps(response["body"])
+    if not compress:
+        gateway_response = AWSAPIGatewayResponse(
+            statusCode=response["statusCode"], body=body
+        )
+    else:
+        gateway_response = AWSAPIGatewayResponse(
+            statusCode=response["statusCode"],
+            body=base64.b64encode(gzip.compress(body.encode())).decode(),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+            isBase64Encoded=True,
         )
-        if using_api_gateway
-        else response
+    if headers:
+        gateway_response["headers"] = gateway_response.get("headers", {}) | headers
+    return gateway_response
+
+
+def get_header(payload: Event | AWSAPIGatewayPayload, name: str) -> str:
+    """
+    Returns the value of the API gateway request header, or an empty string if the
+    header is missing. HTTP API passes header names in lowercase, while REST API
+    keeps their case, so names are compared case-insensitively.
+    """
+    headers = cast(AWSAPIGatewayPayload, payload).get("headers") or {}
+    return next(
+        (value for key, value in headers.items() if key.lower() == name.lower()), ""
     )
 
 
+def accepts_gzip(payload: Event | AWSAPIGatewayPayload) -> bool:
+    """
+    Check if the API gateway request accepts gzip compressed responses.
+    """
+    return "gzip" in get_header(payload, "Accept-Encoding")
+
+
+def matches_etag(payload: Event | AWSAPIGatewayPayload, etag: str) -> bool:
+    """
+    Check if the API gateway request already has the representation with the ETag.
+    """
+    # If-None-Match uses weak comparison, so weak ETags match too
+    request_etags = [
+        request_etag.strip().removeprefix("W/")
+        for request_etag in get_header(payload, "If-None-Match").split(",")
+    ]
+    return "*" in request_etags or etag in request_etags
+
+
+@retry_after_password_change
 def handler(
-    payload: Event | AWSAPIGatewayPayload, _
+    payload: Event | AWSAPIGatewayPayload, context: Any
 ) -> Response | AWSAPIGatewayResponse:
     """
     Handler which is called when accessing the endpoint. We must handle both API
@@ -1943,8 +4541,18 @@ def handler(
     exception occurs, AWS lambda will return the exception.
 
     We want to return general result message of the lambda run, as well as all the
-    Ryhti API results and errors, separated by plan id.
+    Ryhti API results and errors, separated by plan id. If the lambda is about to
+    run out of time, we stop starting new stages and return a continuation token
+    instead.
     """
+    start_time = time.perf_counter()
+    deadline = None
+    if context and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = (
+            time.monotonic()
+            + context.get_remaining_time_in_millis() / 1000
+            - time_margin
+        )
     LOGGER.info(f"Received {payload}...")
 
     using_api_gateway = False
@@ -1952,7 +4560,10 @@ def handler(
     # API Gateway HTTP request. We kinda have to infer which one is the case here.
     try:
         # API Gateway request. The JSON body has to be converted to python object.
-        event = cast(Event, json.loads(cast(AWSAPIGatewayPayload, payload)["body"]))
+        body = cast(AWSAPIGatewayPayload, payload)["body"]
+        if cast(AWSAPIGatewayPayload, payload).get("isBase64Encoded"):
+            body = base64.b64decode(body).decode()
+        event = cast(Event, json.loads(body))
         using_api_gateway = True
     except KeyError:
         # Direct lambda request
@@ -1977,7 +4588,50 @@ def handler(
             using_api_gateway,
         )
     debug_json = event.get("save_json", False)
+    force_validation = event.get("force_validation", False)
+    only_changed = event.get("only_changed", False)
     plan_uuid = event.get("plan_uuid", None)
+    continuation_token = event.get("continuation_token", None)
+    try:
+        decode_continuation_token(continuation_token)
+    except ValueError as error:
+        return responsify(
+            Response(
+                statusCode=400,
+                body=ResponseBody(
+                    title=str(error),
+                    details={"continuation_token": str(error)},
+                    ryhti_responses={},
+                ),
+            ),
+            using_api_gateway,
+        )
+    page_size = event.get("page_size", None)
+    exclude = event.get("exclude", [])
+    coordinate_precision = event.get("coordinate_precision", None)
+    for parameter, value, valid in (
+        ("page_size", page_size, page_size is None or is_count(page_size, 1)),
+        ("exclude", exclude, is_key_list(exclude)),
+        (
+            "coordinate_precision",
+            coordinate_precision,
+            coordinate_precision is None or is_count(coordinate_precision, 0),
+        ),
+    ):
+        if not valid:
+            response_title = f"Invalid {parameter}."
+            LOGGER.info(response_title)
+            return responsify(
+                Response(
+                    statusCode=400,
+                    body=ResponseBody(
+                        title=response_title,
+                        details={parameter: f"Invalid value {value}."},
+                        ryhti_responses={},
+                    ),
+                ),
+                using_api_gateway,
+            )
     if event_type is Action.POST_PLANS and (
         not xroad_server_address
         or not xroad_member_code
@@ -1997,8 +4651,30 @@ def handler(
             )
         )
 
+    # write access is required to update plan information after
+    # validating or POSTing data. Credentials are cached in warm containers.
+    db_helper = DatabaseHelper(user=User.READ_WRITE)
+    connection_string = db_helper.get_connection_string()
+    # Polled plans need not be loaded and serialized again if they have not changed
+    etag = None
+    if event_type is Action.GET_PLANS and plan_uuid and using_api_gateway:
+        etag = get_plan_etag(
+            connection_string,
+            plan_uuid,
+            {
+                "exclude": sorted(exclude),
+                "coordinate_precision": coordinate_precision,
+                "gzip": accepts_gzip(payload),
+            },
+        )
+        if etag and matches_etag(payload, etag):
+            LOGGER.info(f"Plan {plan_uuid} has not changed.")
+            log_handler_time(start_time)
+            return AWSAPIGatewayResponse(
+                statusCode=304, body="", headers={"ETag": etag}
+            )
     client = RyhtiClient(
-        db_helper.get_connection_string(),
+        connection_string,
         event_type=event_type,
         plan_uuid=plan_uuid,
         debug_json=debug_json,
@@ -2011,129 +4687,101 @@ def handler(
         xroad_member_class=xroad_member_class,
         xroad_member_code=xroad_member_code,
         xroad_member_client_name=xroad_member_client_name,
+        max_workers=max_workers,
+        document_upload_workers=document_upload_workers,
+        public_api_pool_size=public_api_pool_size,
+        xroad_pool_size=xroad_pool_size,
+        xroad_max_in_flight=xroad_max_in_flight,
+        public_api_rate=(public_api_rate, public_api_burst),
+        xroad_rate=(xroad_rate, xroad_burst),
+        throttle_retries=throttle_retries,
+        throttle_max_wait=throttle_max_wait,
+        retries=retries,
+        retry_backoff=(retry_backoff, retry_max_backoff),
+        circuit_breaker_threshold=circuit_breaker_threshold,
+        timeout=(connect_timeout, read_timeout),
+        bulk_load=bulk_load,
+        server_side_geojson=server_side_geojson,
+        row_serializer=row_serializer,
+        batch_size=batch_size,
+        fragment_cache=fragment_cache,
+        force_validation=force_validation,
+        only_changed=only_changed,
+        deadline=deadline,
+        prevalidate=prevalidate,
+        continuation_token=continuation_token,
+        page_size=page_size if event_type is Action.GET_PLANS else None,
     )
     if client.plans:
-        # 1) Serialize plans in database
-        LOGGER.info("Formatting plan data...")
-        client.plan_dictionaries = client.get_plan_dictionaries()
         if event_type is Action.GET_PLANS:
+            # 1) Serialize plans in database
+            LOGGER.info("Formatting plan data...")
+            if client.batch_size:
+                client.plan_dictionaries = client.get_plan_dictionaries_in_batches()
+            else:
+                client.plan_dictionaries = client.get_plan_dictionaries()
+                client.save_plan_object_fragments()
+            if exclude or coordinate_precision is not None:
+                client.plan_dictionaries = project_plan_dictionary(
+                    client.plan_dictionaries, set(exclude), coordinate_precision
+                )
             # just return the JSON to the user
             response_title = "Returning serialized plans from database."
             LOGGER.info(response_title)
-            return responsify(
-                Response(
-                    statusCode=200,
-                    body=ResponseBody(
-                        title=response_title,
-                        details=cast(dict, client.plan_dictionaries),
-                        ryhti_responses={},
-                    ),
+            lambda_response = Response(
+                statusCode=200,
+                body=ResponseBody(
+                    title=response_title,
+                    details=cast(dict, client.plan_dictionaries),
+                    ryhti_responses={},
                 ),
+            )
+            if client.next_page_after:
+                lambda_response["body"][
+                    "continuation_token"
+                ] = encode_continuation_token(client.next_page_after, [])
+            log_handler_time(start_time)
+            return responsify(
+                lambda_response,
                 using_api_gateway,
+                compress=accepts_gzip(payload),
+                headers={"ETag": etag} if etag else None,
             )
 
-        # 2) Validate plans in database with public API
-        LOGGER.info("Validating plans...")
-        responses = client.validate_plans()
-
-        # 3) Save plan validation data
-        LOGGER.info("Saving plan validation data...")
-        lambda_response = client.save_plan_validation_responses(responses)
-
-        # *Also* validate plan matter if plans are already valid.
-        #
-        # This can be done *without* POSTing plans, but it *will* give the plan a
-        # permanent plan identifier the moment the plan itself is valid. Does this make
-        # sense?
-        # When we want to upload plans, we need to embed plan objects
-        # further, to create kaava-asiat etc. With uploading, therefore, the
-        # JSON to be POSTed is more complex, but it has plan_dictionary embedded.
-
-        if (
+        use_xroad = bool(
             xroad_server_address
             and xroad_member_code
             and xroad_syke_client_id
             and xroad_syke_client_secret
-        ):
-            # Set authentication header first.
-            LOGGER.info("Authenticating to X-road Ryhti API...")
-            client.xroad_ryhti_authenticate()
-
-            # Documents are exported separately from plan matter. Also, they need to be
-            # present in Ryhti *before* plan matter is created.
-            #
-            # Therefore, let's export all the documents right away, and update them to
-            # the latest version when needed. Otherwise, the plan matter would never be
-            # valid. Only upload documents for those plans that are valid.
-            # 4) If changed documents exist, upload documents
-            LOGGER.info("Checking and updating plan documents for valid plans...")
-            plan_documents = client.upload_plan_documents()
-
-            LOGGER.info("Marking documents exported...")
-            client.set_plan_documents(plan_documents)
-
-            # Only get identifiers for those plans that are valid.
-            # 5) Check or create permanent plan identifier for valid plans, from X-Road
-            # API
-            LOGGER.info("Getting permanent plan identifiers for valid plans...")
-            plan_identifiers = client.get_permanent_plan_identifiers()
-
-            LOGGER.info("Setting permanent plan identifiers for valid plans...")
-            client.set_permanent_plan_identifiers(plan_identifiers)
-
-            # 6) Validate plan matters with identifiers with X-Road API
-            LOGGER.info("Formatting plan matter data for valid plans...")
-            client.plan_matter_dictionaries = client.get_plan_matters()
-
-            LOGGER.info("Validating plan matters for valid plans...")
-            responses = client.validate_plan_matters()
-
-            # 7) Save plan matter validation data
-            LOGGER.info("Saving plan matter validation data for valid plans...")
-            # Merge details and ryhti_responses for valid and invalid plans. Invalid
-            # plans will have plan validation responses, valid plans will have plan
-            # matter validation responses.
-            plan_matter_validation_response = (
-                client.save_plan_matter_validation_responses(responses)
-            )
-            lambda_response["body"]["title"] = plan_matter_validation_response["body"][
-                "title"
-            ]
-            lambda_response["body"]["details"] |= plan_matter_validation_response[
-                "body"
-            ]["details"]
-            lambda_response["body"][
-                "ryhti_responses"
-            ] |= plan_matter_validation_response["body"]["ryhti_responses"]
-            if event_type is Action.POST_PLANS:
-                # 8) Update Ryhti plan matters
-                LOGGER.info("POSTing marked and valid plan matters:")
-                responses = client.post_plan_matters()
-
-                # 9) Save plan matter update responses
-                LOGGER.info("Saving plan matter POST data for posted plans...")
-                # Merge details and ryhti_responses for valid and invalid plan matters.
-                # Invalid plans will have plan validation responses, invalid plan
-                # matters will have plan matter validation responses, and valid plan
-                # matters will have plan POST responses.
-                plan_matter_post_response = client.save_plan_matter_post_responses(
-                    responses
-                )
-                lambda_response["body"]["title"] = plan_matter_post_response["body"][
-                    "title"
-                ]
-                lambda_response["body"]["details"] |= plan_matter_post_response["body"][
-                    "details"
-                ]
-                lambda_response["body"]["ryhti_responses"] |= plan_matter_post_response[
-                    "body"
-                ]["ryhti_responses"]
-        else:
+        )
+        if not use_xroad:
             LOGGER.info(
                 "Local XROAD_SERVER_ADDRESS, your organization XROAD_MEMBER_CODE, your "
                 "XROAD_SYKE_CLIENT_ID or your XROAD_SYKE_CLIENT_SECRET "
                 "not set. Cannot fetch permanent id or validate or post plan matters."
             )
+        if client.batch_size:
+            # Only keep a single batch of plans in memory at a time
+            lambda_response = client.process_plans_in_batches(
+                use_xroad, pipeline_workers
+            )
+        elif pipeline_workers:
+            # Let each plan move through all the stages on its own
+            lambda_response = client.process_plans_pipelined(
+                pipeline_workers, use_xroad
+            )
+        else:
+            lambda_response = client.process_plans(use_xroad=use_xroad)
+        # Changed plans stay in the queue until they have been sent to Ryhti.
+        if event_type is Action.POST_PLANS:
+            client.clear_plan_changes()
+        continuation_token = client.get_continuation_token()
+        if continuation_token:
+            lambda_response["body"]["title"] = (
+                f"Ran out of time or throttled with {len(client.unfinished_plans)} "
+                "plans unfinished. Send the continuation token to process them."
+            )
+            lambda_response["body"]["continuation_token"] = continuation_token
     else:
         lambda_response = Response(
             statusCode=200,
@@ -2144,5 +4792,7 @@ def handler(
             ),
         )
 
+    client.metrics["handler_seconds"] = dict([log_handler_time(start_time)])
+    lambda_response["body"]["metrics"] = client.metrics
     LOGGER.info(lambda_response["body"]["title"])
     return responsify(lambda_response, using_api_gateway)
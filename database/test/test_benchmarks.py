@@ -0,0 +1,284 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Tuple, cast
+
+import db_helper
+import models
+import psycopg2.extensions
+import pytest
+from koodistot_loader.koodistot_loader import KoodistotLoader
+from mml_loader.mml_loader import MMLLoader
+from ryhti_client.ryhti_client import Action, RyhtiClient, RyhtiResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .conftest import LOCAL_TZ
+
+# Benchmarks take a while, so they are only run when requested
+pytestmark = pytest.mark.skipif(
+    os.environ.get("RUN_BENCHMARKS", "0") != "1",
+    reason="Benchmarks are only run if RUN_BENCHMARKS=1",
+)
+
+# Number of extra plan objects to add to the complete test plan
+benchmark_object_count = 200
+# Number of extra plans to add to the database
+benchmark_plan_count = 50
+
+
+def run_timed(function: Callable, rounds: int = 3) -> Tuple[float, object]:
+    """
+    Run function a number of times, and return the fastest run time and the result.
+    """
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+@pytest.fixture()
+def report(pytestconfig) -> Callable[[str], None]:
+    """
+    Return function that writes benchmark results to the pytest terminal report.
+    """
+    reporter = pytestconfig.pluginmanager.get_plugin("terminalreporter")
+
+    def write_line(line: str) -> None:
+        reporter.write_line(line)
+
+    return write_line
+
+
+@pytest.fixture()
+def plan_with_many_objects(
+    temp_session_feature,
+    complete_test_plan: models.Plan,
+    land_use_area_instance: models.LandUseArea,
+) -> models.Plan:
+    """
+    Add lots of land use areas to the complete test plan.
+    """
+    for ordering in range(100, 100 + benchmark_object_count):
+        temp_session_feature(
+            models.LandUseArea(
+                geom=land_use_area_instance.geom,
+                name=land_use_area_instance.name,
+                description=land_use_area_instance.description,
+                ordering=ordering,
+                lifecycle_status=land_use_area_instance.lifecycle_status,
+                type_of_underground=land_use_area_instance.type_of_underground,
+                plan=complete_test_plan,
+                plan_regulation_groups=land_use_area_instance.plan_regulation_groups,
+            )
+        )
+    return complete_test_plan
+
+
+def test_benchmark_server_side_geojson(
+    rw_connection_string: str, plan_with_many_objects: models.Plan, report: Callable
+):
+    """
+    Compare loading and serializing plans with GeoJSON created by PostGIS and
+    by Python.
+    """
+    timings: Dict[bool, float] = {}
+    plan_dictionaries: Dict[bool, object] = {}
+    for server_side_geojson in (False, True):
+
+        def serialize_plans():
+            client = RyhtiClient(
+                rw_connection_string, server_side_geojson=server_side_geojson
+            )
+            return client.get_plan_dictionaries()
+
+        (
+            timings[server_side_geojson],
+            plan_dictionaries[server_side_geojson],
+        ) = run_timed(serialize_plans)
+    report(
+        f"Serializing {benchmark_object_count} extra plan objects: "
+        f"Python GeoJSON {timings[False]:.3f} s, "
+        f"PostGIS GeoJSON {timings[True]:.3f} s"
+    )
+    assert plan_dictionaries[True] == plan_dictionaries[False]
+
+
+def test_benchmark_row_serializer(
+    rw_connection_string: str, plan_with_many_objects: models.Plan, report: Callable
+):
+    """
+    Compare time and memory taken by loading and serializing plans from ORM objects
+    and from plain database rows.
+    """
+    timings: Dict[bool, float] = {}
+    peak_memory: Dict[bool, int] = {}
+    plan_dictionaries: Dict[bool, object] = {}
+    for row_serializer in (False, True):
+
+        def serialize_plans():
+            client = RyhtiClient(
+                rw_connection_string,
+                event_type=Action.GET_PLANS,
+                row_serializer=row_serializer,
+            )
+            return client.get_plan_dictionaries()
+
+        (
+            timings[row_serializer],
+            plan_dictionaries[row_serializer],
+        ) = run_timed(serialize_plans)
+        tracemalloc.start()
+        try:
+            serialize_plans()
+            _, peak_memory[row_serializer] = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    report(
+        f"Serializing {benchmark_object_count} extra plan objects: "
+        f"ORM objects {timings[False]:.3f} s, {peak_memory[False] / 1024**2:.1f} MiB, "
+        f"database rows {timings[True]:.3f} s, {peak_memory[True] / 1024**2:.1f} MiB"
+    )
+    assert repr(plan_dictionaries[True]) == repr(plan_dictionaries[False])
+    assert peak_memory[True] < peak_memory[False]
+
+
+@pytest.fixture()
+def many_plans(temp_session_feature, plan_instance: models.Plan) -> List[models.Plan]:
+    """
+    Add lots of plans to the database.
+    """
+    plans = [plan_instance]
+    for _ in range(benchmark_plan_count):
+        plans.append(
+            temp_session_feature(
+                models.Plan(
+                    geom=plan_instance.geom,
+                    scale=plan_instance.scale,
+                    description=plan_instance.description,
+                    lifecycle_status=plan_instance.lifecycle_status,
+                    organisation=plan_instance.organisation,
+                    plan_type=plan_instance.plan_type,
+                    to_be_exported=True,
+                )
+            )
+        )
+    return plans
+
+
+@contextmanager
+def server_statements(engine: Engine) -> Iterator[List[str]]:
+    """
+    Record the statements that psycopg2 sends to the database server through the
+    engine. Psycopg2 executemany sends a separate statement for each row.
+    """
+    statements: List[str] = []
+
+    class TracingCursor(psycopg2.extensions.cursor):
+        def execute(self, query, vars=None):
+            statements.append(str(query))
+            return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            vars_list = list(vars_list)
+            statements.extend(str(query) for _ in vars_list)
+            return super().executemany(query, vars_list)
+
+    def trace(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["cursor_factory"] = dbapi_connection.cursor_factory
+        dbapi_connection.cursor_factory = TracingCursor
+
+    def untrace(dbapi_connection, connection_record):
+        dbapi_connection.cursor_factory = connection_record.info.pop(
+            "cursor_factory", None
+        )
+
+    event.listen(engine, "checkout", trace)
+    event.listen(engine, "checkin", untrace)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "checkout", trace)
+        event.remove(engine, "checkin", untrace)
+
+
+def test_benchmark_save_plan_validation_responses(
+    rw_connection_string: str, many_plans: List[models.Plan], report: Callable
+):
+    """
+    Compare the database round trips needed to save validation responses for many
+    plans one plan at a time, as before, and with a single UPDATE.
+    """
+    client = RyhtiClient(rw_connection_string)
+    responses = {
+        plan.id: RyhtiResponse(
+            status=422, errors={"error": "invalid"}, detail=None, warnings=None
+        )
+        for plan in many_plans
+    }
+    # Plans used to be fetched and flushed one at a time, with psycopg2 defaults
+    per_plan_engine = db_helper.get_engine(
+        rw_connection_string,
+        connect_args={"options": "-c hame.skip_change_tracking=on"},
+    )
+
+    def save_responses_per_plan() -> None:
+        with Session(per_plan_engine, expire_on_commit=False) as session:
+            for plan_id, response in responses.items():
+                plan = session.get(models.Plan, plan_id)
+                assert plan
+                plan.validation_errors = response["errors"]
+                plan.validated_at = datetime.now(tz=LOCAL_TZ)
+                plan.validation_response = cast(dict, response)
+            session.commit()
+
+    with server_statements(per_plan_engine) as per_plan_statements:
+        per_plan_timing, _ = run_timed(save_responses_per_plan, rounds=1)
+    with server_statements(client.Session.kw["bind"]) as statements:
+        timing, _ = run_timed(
+            lambda: client.save_plan_validation_responses(responses), rounds=1
+        )
+    report(
+        f"Saving validation responses for {len(many_plans)} plans: "
+        f"per plan {len(per_plan_statements)} round trips in {per_plan_timing:.3f} s, "
+        f"single UPDATE {len(statements)} round trips in {timing:.3f} s"
+    )
+    assert len(statements) < len(many_plans) < len(per_plan_statements)
+
+
+def test_benchmark_warm_start(
+    admin_connection_string: str, rw_connection_string: str, report: Callable
+):
+    """
+    Compare connecting to the database in cold and warm lambda containers.
+    """
+    loaders: Dict[str, Callable] = {
+        "ryhti_client": lambda: RyhtiClient(rw_connection_string),
+        "koodistot_loader": lambda: KoodistotLoader(
+            admin_connection_string, load_suomifi_codes=False
+        ),
+        "mml_loader": lambda: MMLLoader(admin_connection_string),
+    }
+    for name, create_loader in loaders.items():
+
+        def cold_start():
+            db_helper.invalidate_cache()
+            with create_loader().Session() as session:
+                return session.connection().engine
+
+        def warm_start():
+            with create_loader().Session() as session:
+                return session.connection().engine
+
+        cold_time, cold_engine = run_timed(cold_start)
+        warm_time, warm_engine = run_timed(warm_start)
+        report(
+            f"Connecting {name} to database: "
+            f"cold start {cold_time:.3f} s, warm start {warm_time:.3f} s"
+        )
+        assert warm_engine is cold_engine
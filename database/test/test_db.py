@@ -1,6 +1,8 @@
 import os
 
+import db_helper
 import psycopg2
+from db_helper import get_engine, retry_after_password_change
 
 from .conftest import assert_database_is_alright, hame_count
 
@@ -108,3 +110,30 @@ def test_database_downgrade(main_db_params_with_root_user, hame_database_downgra
 
     finally:
         conn.close()
+
+
+def test_retry_after_password_change(main_db_params, hame_database_created):
+    """
+    Check that handlers are run again, if the cached password is rejected, and
+    engines with the rejected password are closed.
+    """
+    connection_strings = [
+        (
+            f'postgresql://{main_db_params["user"]}:{password}'
+            f'@{main_db_params["host"]}:{main_db_params["port"]}'
+            f'/{main_db_params["dbname"]}'
+        )
+        for password in ("outdated", main_db_params["password"])
+    ]
+    old_connection_string = connection_strings[0]
+
+    @retry_after_password_change
+    def handler() -> None:
+        with get_engine(connection_strings.pop(0)).connect():
+            pass
+
+    handler()
+    assert not connection_strings
+    assert old_connection_string not in [
+        connection_string for connection_string, _ in db_helper.cached_engines
+    ]
@@ -2,6 +2,7 @@ import json
 import logging
 from copy import deepcopy
 from typing import Type
+from uuid import uuid4
 
 import psycopg2
 import pytest
@@ -699,6 +700,12 @@ def test_save_objects(loader, koodistot_data, main_db_params):
     assert_data_is_imported(main_db_params)
 
 
+def test_save_objects_invalidates_code_registry(loader, koodistot_data):
+    codes.code_registry = {uuid4(): ("02", "http://mock.url/code/02")}
+    loader.save_objects(koodistot_data)
+    assert not codes.code_registry
+
+
 def test_save_changed_objects(
     changed_koodistot_data, admin_connection_string, main_db_params
 ):
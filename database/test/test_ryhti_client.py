@@ -1,6 +1,11 @@
+import base64
+import gzip
 import json
 import os
 import re
+import threading
+import time
+from datetime import datetime
 from typing import Callable
 from uuid import uuid4
 
@@ -8,11 +13,27 @@ import codes
 import models
 import pytest
 from requests_mock.request import _RequestObjectProxy
-from ryhti_client.ryhti_client import RyhtiClient
+from ryhti_client import ryhti_client
+from ryhti_client.ryhti_client import (
+    Action,
+    CircuitBreaker,
+    Response,
+    RyhtiClient,
+    TokenBucket,
+    accepts_gzip,
+    encode_continuation_token,
+    get_plan_etag,
+    get_schema_validator,
+    is_key_list,
+    matches_etag,
+    project_plan_dictionary,
+    responsify,
+)
 from simplejson import JSONEncoder
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 
-from .conftest import deepcompare
+from .conftest import LOCAL_TZ, deepcompare
 
 mock_rule = "random_rule"
 mock_matter_rule = "another_random_rule"
@@ -95,8 +116,31 @@ def mock_public_map_document(requests_mock):
         yield
 
 
+@pytest.fixture()
+def mock_public_map_document_without_last_modified(requests_mock):
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "test_ryhti_client_plan_map.tif"
+    )
+    with open(path, "rb") as plan_map:
+        content = plan_map.read()
+    requests_mock.get(
+        "https://raw.githubusercontent.com/GeoTIFF/test-data/refs/heads/main/files/GeogToWGS84GeoKey5.tif",
+        content=content,
+        headers={"Content-type": "image/tiff"},
+        status_code=200,
+    )
+    requests_mock.head(
+        "https://raw.githubusercontent.com/GeoTIFF/test-data/refs/heads/main/files/GeogToWGS84GeoKey5.tif",
+        headers={"Content-type": "image/tiff"},
+        status_code=200,
+    )
+
+
 @pytest.fixture()
 def mock_xroad_ryhti_authenticate(requests_mock) -> None:
+    # Tokens are cached on module level, so each test must authenticate again
+    ryhti_client.xroad_tokens.clear()
+
     def match_request_body(request: _RequestObjectProxy):
         # Oh great, looks like requests json method will not parse minimal json consisting of just string.
         # Instead, we'll have to match the request text.
@@ -367,6 +411,22 @@ def client_with_plan_data(
     return client
 
 
+@pytest.fixture(scope="function")
+def client_with_plans(
+    rw_connection_string: str,
+    complete_test_plan: models.Plan,
+    another_test_plan: models.Plan,
+) -> RyhtiClient:
+    """
+    Return RyhtiClient that has two plans read in and serialized, so that plans may
+    actually be processed concurrently.
+    """
+    client = RyhtiClient(rw_connection_string, public_api_url="http://mock.url")
+    client.plan_dictionaries = client.get_plan_dictionaries()
+    assert len(client.plans) == 2
+    return client
+
+
 @pytest.fixture(scope="function")
 def client_with_plan_data_in_proposal_phase(
     session: Session,
@@ -424,6 +484,212 @@ def test_get_plan_dictionaries(
     )
 
 
+def test_get_plan_dictionaries_without_queries(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    desired_plan_dict: dict,
+):
+    """
+    Check that plans are serialized from bulk loaded plan data without any further
+    database queries
+    """
+    engine = client_with_plan_data.Session.kw["bind"]
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        plan_dictionaries = client_with_plan_data.get_plan_dictionaries()
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert not statements
+    deepcompare(
+        plan_dictionaries[plan_instance.id],
+        desired_plan_dict,
+        ignore_order_for_keys=[
+            "planRegulationGroupRelations",
+            "additionalInformations",
+        ],
+    )
+
+
+def test_get_plan_dictionaries_without_loading_codes(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that codes are found in the code registry instead of loading them with
+    plan data
+    """
+    plan = client_with_plan_data.plans[plan_instance.id]
+    land_use_area = plan.land_use_areas[0]
+    assert "lifecycle_status" in inspect(plan).unloaded
+    assert "type_of_underground" in inspect(land_use_area).unloaded
+    plan_dictionary = client_with_plan_data.plan_dictionaries[plan_instance.id]
+    assert (
+        codes.code_registry[plan.lifecycle_status_id][1]
+        == plan_dictionary["lifeCycleStatus"]
+    )
+    assert (
+        codes.code_registry[land_use_area.type_of_underground_id][1]
+        == plan_dictionary["planObjects"][0]["undergroundStatus"]
+    )
+
+
+def test_code_registry_reloaded_after_code_list_changes(
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that a new client does not use codes registered from outdated code lists,
+    e.g. if another process has changed the codes in a warm lambda container
+    """
+    plan = client_with_plan_data.plans[plan_instance.id]
+    uri = client_with_plan_data.get_code_uri_by_id(plan.lifecycle_status_id)
+    assert codes.code_registry_version == client_with_plan_data.code_list_version
+    codes.code_registry[plan.lifecycle_status_id] = ("99", "http://outdated.url")
+    codes.code_registry_version = "outdated"
+
+    client = RyhtiClient(rw_connection_string, event_type=Action.GET_PLANS)
+    assert client.get_code_uri_by_id(plan.lifecycle_status_id) == uri
+    assert codes.code_registry_version == client.code_list_version
+
+
+def test_get_plan_dictionaries_with_memoized_fragments(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that regulation groups serialized earlier in the run are reused
+    """
+    plan_dictionary = client_with_plan_data.plan_dictionaries[plan_instance.id]
+    misses = dict(client_with_plan_data.metrics["fragment_misses"])
+    hits = dict(client_with_plan_data.metrics.get("fragment_hits", {}))
+    plan_dictionaries = client_with_plan_data.get_plan_dictionaries()
+    assert plan_dictionaries[plan_instance.id] == plan_dictionary
+    assert (
+        plan_dictionaries[plan_instance.id]["planRegulationGroups"][0]
+        is plan_dictionary["planRegulationGroups"][0]
+    )
+    assert client_with_plan_data.metrics["fragment_misses"] == misses
+    assert client_with_plan_data.metrics["fragment_hits"] == {
+        "plan_regulation_group": hits.get("plan_regulation_group", 0)
+        + len(plan_dictionary["generalRegulationGroups"])
+        + len(plan_dictionary["planRegulationGroups"])
+    }
+
+
+def test_get_plan_dictionaries_with_saved_plan_objects(
+    session: Session,
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    land_use_area_instance: models.LandUseArea,
+):
+    """
+    Check that plan objects saved in earlier runs are only serialized again if they
+    have been modified
+    """
+    client = RyhtiClient(rw_connection_string, fragment_cache=True)
+    plan_dictionary = client.get_plan_dictionaries()[plan_instance.id]
+    client.save_plan_object_fragments()
+    object_count = len(plan_dictionary["planObjects"])
+    assert client.metrics["plan_object_fragments"] == {"serialized": object_count}
+
+    client = RyhtiClient(rw_connection_string, fragment_cache=True)
+    assert len(client.plan_object_fragments) == object_count
+    reused_plan_dictionary = client.get_plan_dictionaries()[plan_instance.id]
+    assert reused_plan_dictionary == plan_dictionary
+    assert client.metrics["plan_object_fragments"] == {"reused": object_count}
+    # Decimal heights must not be serialized differently from reused ones
+    assert client.get_plan_digest(reused_plan_dictionary, {}) == client.get_plan_digest(
+        plan_dictionary, {}
+    )
+
+    land_use_area_instance.name = {"fin": "Muutettu nimi"}
+    session.commit()
+    client = RyhtiClient(rw_connection_string, fragment_cache=True)
+    plan_objects = client.get_plan_dictionaries()[plan_instance.id]["planObjects"]
+    assert client.metrics["plan_object_fragments"] == {
+        "reused": object_count - 1,
+        "serialized": 1,
+    }
+    assert {"fin": "Muutettu nimi"} in [
+        plan_object["name"] for plan_object in plan_objects
+    ]
+    client.save_plan_object_fragments()
+
+    # Plan objects contain code URIs, so they are serialized again if codes change
+    client = RyhtiClient(rw_connection_string, fragment_cache=True)
+    client.code_list_version = "changed"
+    client.get_plan_dictionaries()
+    assert client.metrics["plan_object_fragments"] == {"serialized": object_count}
+
+
+def test_get_plan_dictionaries_from_rows(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    desired_plan_dict: dict,
+):
+    """
+    Check that plans serialized from database rows match plans serialized from ORM
+    objects
+    """
+    plan_dictionaries = client_with_plan_data.get_plan_dictionaries_from_rows()
+    # Also the order of keys and lists must be identical
+    assert repr(plan_dictionaries[plan_instance.id]) == repr(
+        client_with_plan_data.plan_dictionaries[plan_instance.id]
+    )
+    deepcompare(
+        plan_dictionaries[plan_instance.id],
+        desired_plan_dict,
+        ignore_order_for_keys=[
+            "planRegulationGroupRelations",
+            "additionalInformations",
+        ],
+    )
+
+
+def test_get_plan_dictionaries_with_several_valid_periods(
+    temp_session_feature: Callable,
+    rw_connection_string: str,
+    complete_test_plan: models.Plan,
+    valid_status_instance: codes.LifeCycleStatus,
+):
+    """
+    Check that the last valid period is serialized from both ORM objects and database
+    rows, no matter in which order the periods were added
+    """
+    later_date = temp_session_feature(
+        models.LifeCycleDate(
+            plan=complete_test_plan,
+            lifecycle_status=valid_status_instance,
+            starting_at=datetime(2025, 1, 1, tzinfo=LOCAL_TZ),
+        )
+    )
+    temp_session_feature(
+        models.LifeCycleDate(
+            plan=complete_test_plan,
+            lifecycle_status=valid_status_instance,
+            starting_at=datetime(2024, 1, 1, tzinfo=LOCAL_TZ),
+            ending_at=datetime(2025, 1, 1, tzinfo=LOCAL_TZ),
+        )
+    )
+    client = RyhtiClient(rw_connection_string)
+    plan_dictionaries = client.get_plan_dictionaries()
+    assert repr(client.get_plan_dictionaries_from_rows()) == repr(plan_dictionaries)
+    period = plan_dictionaries[complete_test_plan.id]["periodOfValidity"]
+    assert period
+    assert not period["end"]
+    assert (
+        datetime.fromisoformat(period["begin"].replace("Z", "+00:00"))
+        == later_date.starting_at
+    )
+
+
 def test_validate_plans(
     client_with_plan_data: RyhtiClient,
     plan_instance: models.Plan,
@@ -444,6 +710,235 @@ def test_validate_plans(
         ]
 
 
+def test_desired_dictionaries_match_schema(
+    desired_plan_dict: dict, desired_plan_matter_dict: dict
+):
+    """
+    Check that the local Ryhti schema accepts correct plans and plan matters
+    """
+    assert not list(get_schema_validator("Plan").iter_errors(desired_plan_dict))
+    assert not list(
+        get_schema_validator("PlanMatter").iter_errors(desired_plan_matter_dict)
+    )
+
+
+def test_validate_plans_with_schema_errors(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    mock_public_ryhti_validate_invalid: Callable,
+    requests_mock,
+):
+    """
+    Check that plans that don't match the local Ryhti schema are not posted
+    """
+    client_with_plan_data.prevalidate = True
+    plan_dict = client_with_plan_data.plan_dictionaries[plan_instance.id]
+    del plan_dict["lifeCycleStatus"]
+    plan_dict["geographicalArea"]["geometry"]["type"] = "Triangle"
+    responses = client_with_plan_data.validate_plans()
+    assert not requests_mock.called
+    response = responses[plan_instance.id]
+    assert response["status"] == 422
+    assert response["errors"] == [
+        {
+            "ruleId": "schema.required",
+            "message": "'lifeCycleStatus' is a required property",
+            "instance": "$",
+        },
+        {
+            "ruleId": "schema.enum",
+            "message": "'Triangle' is not one of ['Point', 'LineString', 'Polygon', "
+            "'MultiPoint', 'MultiLineString', 'MultiPolygon']",
+            "instance": "$.geographicalArea.geometry.type",
+        },
+    ]
+
+
+def test_get_plan_digest_with_prevalidation(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that plans checked against the local schema are validated again, once
+    prevalidation is turned off
+    """
+    plan_dict = client_with_plan_data.plan_dictionaries[plan_instance.id]
+    digest = client_with_plan_data.get_plan_digest(plan_dict, {})
+    client_with_plan_data.prevalidate = True
+    prevalidated_digest = client_with_plan_data.get_plan_digest(plan_dict, {})
+    assert prevalidated_digest != digest
+    assert client_with_plan_data.get_plan_digest(plan_dict, {}) == prevalidated_digest
+
+
+def test_validate_plans_concurrently(
+    client_with_plans: RyhtiClient,
+    mock_public_ryhti_validate_invalid: Callable,
+    requests_mock,
+):
+    """
+    Check that concurrent validation returns responses in plan order and records
+    request timings
+    """
+    client_with_plans.max_workers = 4
+    responses = client_with_plans.validate_plans()
+    assert list(responses.keys()) == list(client_with_plans.plan_dictionaries.keys())
+    assert requests_mock.call_count == 2
+    for plan_id, response in responses.items():
+        assert response["errors"] == [
+            {
+                "ruleId": mock_rule,
+                "message": mock_error_string,
+                "instance": mock_instance,
+            }
+        ]
+        assert plan_id in client_with_plans.metrics["plan_validation_seconds"]
+
+
+def test_validate_plans_throttled(
+    client_with_plan_data: RyhtiClient,
+    requests_mock,
+):
+    """
+    Check that throttled validation requests are sent again after Retry-After, and
+    throttling is recorded in client metrics
+    """
+    requests_mock.post(
+        "http://mock.url/Plan/validate",
+        [
+            {"status_code": 429, "headers": {"Retry-After": "0"}},
+            {"status_code": 200, "json": {}},
+        ],
+    )
+    responses = client_with_plan_data.validate_plans()
+    for response in responses.values():
+        assert response["status"] == 200
+    assert client_with_plan_data.metrics["rate_limit_throttled"]["public_api"] == 1
+    assert "public_api" in client_with_plan_data.metrics["rate_limit_wait_seconds"]
+
+
+def test_validate_plans_throttled_too_long(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    requests_mock,
+):
+    """
+    Check that plans are left unfinished instead of waiting, if Retry-After is longer
+    than the maximum wait or would pass the deadline
+    """
+    requests_mock.post(
+        "http://mock.url/Plan/validate",
+        status_code=429,
+        headers={"Retry-After": "3600"},
+    )
+    start = time.monotonic()
+    responses = client_with_plan_data.validate_plans()
+    assert time.monotonic() - start < 10
+    assert responses[plan_instance.id]["status"] == 429
+    assert plan_instance.id in client_with_plan_data.unfinished_plans
+    assert client_with_plan_data.get_continuation_token()
+
+    client_with_plan_data.unfinished_plans.clear()
+    client_with_plan_data.throttle_max_wait = 7200
+    client_with_plan_data.deadline = time.monotonic() + 60
+    responses = client_with_plan_data.validate_plans()
+    assert responses[plan_instance.id]["status"] == 429
+    assert plan_instance.id in client_with_plan_data.unfinished_plans
+    assert requests_mock.call_count == 2
+
+
+def test_validate_plans_after_server_error(
+    client_with_plan_data: RyhtiClient,
+    requests_mock,
+):
+    """
+    Check that validation requests are sent again after server errors
+    """
+    requests_mock.post(
+        "http://mock.url/Plan/validate",
+        [{"status_code": 502, "text": "Bad Gateway"}, {"status_code": 200}],
+    )
+    client_with_plan_data.retry_backoff = (0, 0)
+    responses = client_with_plan_data.validate_plans()
+    for response in responses.values():
+        assert response["status"] == 200
+    assert client_with_plan_data.metrics["retries"]["public_api"] == 1
+
+
+def test_validate_plans_with_circuit_open(
+    session: Session,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    requests_mock,
+):
+    """
+    Check that failed validation requests are saved as plan errors instead of
+    raising, and further requests fail fast once the circuit is open
+    """
+    requests_mock.post(
+        "http://mock.url/Plan/validate", status_code=502, text="Bad Gateway"
+    )
+    client_with_plan_data.retries = 0
+    client_with_plan_data.circuit_breakers["public_api"] = CircuitBreaker(1)
+    responses = client_with_plan_data.validate_plans()
+    assert responses[plan_instance.id]["status"] == 502
+    assert plan_instance.id in client_with_plan_data.metrics["request_errors"]
+    assert plan_instance.id in client_with_plan_data.failed_requests
+    client_with_plan_data.save_plan_validation_responses(responses)
+    session.refresh(plan_instance)
+    assert plan_instance.validation_errors.startswith("RYHTI API ERROR")
+    assert not plan_instance.validation_digest
+
+    responses = client_with_plan_data.validate_plans()
+    assert responses[plan_instance.id]["status"] is None
+    assert requests_mock.call_count == 1
+
+
+def test_count_metric_concurrently(client_with_plan_data: RyhtiClient):
+    """
+    Check that metrics counted by concurrent threads are not lost
+    """
+
+    def count_retries():
+        for _ in range(1000):
+            client_with_plan_data.count_metric("retries", "public_api")
+
+    threads = [threading.Thread(target=count_retries) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client_with_plan_data.metrics["retries"]["public_api"] == 8000
+
+
+def test_token_bucket():
+    """
+    Check that the token bucket limits the request rate after the burst, and waits
+    while paused
+    """
+    bucket = TokenBucket(rate=20, burst=2)
+    assert bucket.acquire() < 0.01
+    assert bucket.acquire() < 0.01
+    assert bucket.acquire() >= 0.04
+    bucket.pause(0.1)
+    assert bucket.acquire() >= 0.1
+    assert bucket.throttled == 1
+    assert bucket.waited >= 0.14
+
+
+def test_validate_plans_with_pooled_connections(
+    client_with_plan_data: RyhtiClient,
+    mock_public_ryhti_validate_invalid: Callable,
+    requests_mock,
+):
+    """
+    Check that requests to Ryhti API use the client connection pools and timeouts
+    """
+    adapter = client_with_plan_data.http.adapters["http://mock.url"]
+    assert adapter._pool_maxsize == 10
+    client_with_plan_data.validate_plans()
+    assert requests_mock.last_request.timeout == client_with_plan_data.timeout
+
+
 def test_save_plan_validation_responses(
     session: Session,
     client_with_plan_data: RyhtiClient,
@@ -460,6 +955,329 @@ def test_save_plan_validation_responses(
     assert plan_instance.validation_errors == next(iter(responses.values()))["errors"]
 
 
+def test_process_plans_pipelined(
+    client_with_plans: RyhtiClient,
+    mock_public_ryhti_validate_invalid: Callable,
+):
+    """
+    Check that processing each plan separately returns the same response as running
+    each stage for all plans, and releases the processed plans.
+    """
+    plan_ids = list(client_with_plans.plans.keys())
+    response = client_with_plans.process_plans()
+    pipelined_response = client_with_plans.process_plans_pipelined(2)
+    assert pipelined_response == response
+    assert list(pipelined_response["body"]["details"].keys()) == plan_ids
+    assert not client_with_plans.plans
+    assert not client_with_plans.plan_dictionaries
+    for plan_id in plan_ids:
+        assert plan_id in client_with_plans.metrics["plan_pipeline_seconds"]
+
+
+def test_process_plans_in_batches(
+    temp_session_feature: Callable,
+    rw_connection_string: str,
+    complete_test_plan: models.Plan,
+    another_test_plan: models.Plan,
+    mock_public_ryhti_validate_invalid: Callable,
+):
+    """
+    Check that processing plans in batches returns the same response as processing
+    all plans at once, and only keeps the plans of the current batch.
+    """
+    temp_session_feature(
+        models.Plan(
+            geom=another_test_plan.geom,
+            scale=another_test_plan.scale,
+            description={"fin": "third_test_plan"},
+            lifecycle_status=another_test_plan.lifecycle_status,
+            organisation=another_test_plan.organisation,
+            plan_type=another_test_plan.plan_type,
+            to_be_exported=True,
+        )
+    )
+    client = RyhtiClient(rw_connection_string, public_api_url="http://mock.url")
+    plan_ids = list(client.plans.keys())
+    assert len(plan_ids) == 3
+    response = client.process_plans()
+
+    client = RyhtiClient(
+        rw_connection_string,
+        public_api_url="http://mock.url",
+        force_validation=True,
+        batch_size=2,
+    )
+    assert list(client.plans.keys()) == plan_ids
+    process_plans = client.process_plans
+    batches = []
+
+    def process_batch(batch, *args, **kwargs):
+        batches.append((batch, list(client.plans.keys())))
+        return process_plans(batch, *args, **kwargs)
+
+    client.process_plans = process_batch
+    batched_response = client.process_plans_in_batches()
+    assert batched_response == response
+    assert batches == [
+        (plan_ids[:2], plan_ids[:2]),
+        (plan_ids[2:], plan_ids[2:]),
+    ]
+    assert not client.plans
+    assert not client.plan_dictionaries
+    assert list(client.metrics["batch_peak_rss_mb"].keys()) == ["0", "1"]
+
+
+def test_validate_unchanged_plans(
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    mock_public_ryhti_validate_invalid: Callable,
+    requests_mock,
+):
+    """
+    Check that plans are not validated again if they haven't changed, unless
+    validation is forced.
+    """
+    responses = client_with_plan_data.validate_plans()
+    client_with_plan_data.save_plan_validation_responses(responses)
+    assert requests_mock.call_count == 1
+
+    client = RyhtiClient(rw_connection_string, public_api_url="http://mock.url")
+    client.plan_dictionaries = client.get_plan_dictionaries()
+    assert client.validate_plans() == responses
+    assert requests_mock.call_count == 1
+    assert plan_instance.id in client.metrics["plan_validation_unchanged"]
+
+    client = RyhtiClient(
+        rw_connection_string, public_api_url="http://mock.url", force_validation=True
+    )
+    client.plan_dictionaries = client.get_plan_dictionaries()
+    assert client.validate_plans() == responses
+    assert requests_mock.call_count == 2
+
+
+def test_process_only_changed_plans(
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that only changed plans are processed, and processed plans are removed
+    from the queue of changed plans.
+    """
+    client = RyhtiClient(rw_connection_string, only_changed=True)
+    assert plan_instance.id in client.plans
+    assert plan_instance.id in client.plan_changes
+
+    client.clear_plan_changes()
+    client = RyhtiClient(rw_connection_string, only_changed=True)
+    assert not client.plans
+    assert not client.plan_changes
+
+
+def test_process_plans_after_deadline(
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    requests_mock,
+):
+    """
+    Check that no stages are started after the deadline, and that the run can be
+    resumed from the first unfinished plan.
+    """
+    client = RyhtiClient(rw_connection_string, deadline=time.monotonic() - 1)
+    response = client.process_plans()
+    assert not response["body"]["details"]
+    assert not requests_mock.called
+    assert client.unfinished_plans == set(client.plans)
+    continuation_token = client.get_continuation_token()
+    assert continuation_token
+
+    client = RyhtiClient(rw_connection_string, continuation_token=continuation_token)
+    assert plan_instance.id in client.plans
+    assert not client.get_continuation_token()
+
+
+def test_process_plans_until_deadline(
+    client_with_plans: RyhtiClient,
+    mock_public_ryhti_validate_invalid: Callable,
+    requests_mock,
+):
+    """
+    Check that no plans are started once the deadline passes in the middle of a
+    stage, and only the plans left unprocessed are marked unfinished.
+    """
+    plan_ids = list(client_with_plans.plans)
+    client_with_plans.deadline = time.monotonic() + 60
+    request = client_with_plans.http.request
+
+    def request_until_deadline(*args, **kwargs):
+        # The deadline passes while the first plan is being validated
+        client_with_plans.deadline = time.monotonic()
+        return request(*args, **kwargs)
+
+    client_with_plans.http.request = request_until_deadline
+    response = client_with_plans.process_plans(use_xroad=True, authenticate=False)
+    assert requests_mock.call_count == 1
+    assert list(response["body"]["ryhti_responses"]) == plan_ids[:1]
+    # The first plan is invalid, so it is finished
+    assert client_with_plans.unfinished_plans == set(plan_ids[1:])
+
+
+def test_resume_after_finished_plans(
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that plans finished before the deadline are not processed again.
+    """
+    for continuation_token in (
+        encode_continuation_token(plan_instance.id, []),
+        encode_continuation_token(None, [plan_instance.id]),
+    ):
+        client = RyhtiClient(
+            rw_connection_string, continuation_token=continuation_token
+        )
+        assert plan_instance.id not in client.plans
+
+
+def test_get_plans_in_pages(
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+):
+    """
+    Check that plans can be fetched one page at a time.
+    """
+    plan_ids = list(client_with_plan_data.plans.keys())
+    continuation_token = None
+    pages = []
+    while True:
+        client = RyhtiClient(
+            rw_connection_string,
+            event_type=Action.GET_PLANS,
+            continuation_token=continuation_token,
+            page_size=1,
+        )
+        if not client.plans:
+            break
+        assert len(client.plans) == 1
+        pages.append(list(client.plans.keys()))
+        assert client.next_page_after == pages[-1][0]
+        continuation_token = encode_continuation_token(client.next_page_after, [])
+    assert pages == [[plan_id] for plan_id in plan_ids]
+
+
+def test_project_plan_dictionary(
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+):
+    """
+    Check that excluded keys are left out and coordinates are rounded, without
+    modifying the serialized plan.
+    """
+    plan_dictionary = client_with_plan_data.plan_dictionaries[plan_instance.id]
+    original = json.dumps(plan_dictionary, cls=JSONEncoder)
+    projected = project_plan_dictionary(plan_dictionary, {"planObjects"}, 0)
+    assert "planObjects" not in projected
+    assert "planObjects" in plan_dictionary
+    coordinates = projected["geographicalArea"]["geometry"]["coordinates"]
+    assert all(
+        coordinate == round(coordinate)
+        for ring in coordinates
+        for point in ring
+        for coordinate in point
+    )
+    assert json.dumps(plan_dictionary, cls=JSONEncoder) == original
+
+
+def test_responsify_with_gzip():
+    """
+    Check that API gateway responses can be compressed.
+    """
+    response = Response(
+        statusCode=200,
+        body={"title": "Test", "details": {}, "ryhti_responses": {}},
+    )
+    gateway_response = responsify(response, using_api_gateway=True, compress=True)
+    assert gateway_response["headers"]["Content-Encoding"] == "gzip"
+    assert gateway_response["isBase64Encoded"]
+    body = gzip.decompress(base64.b64decode(gateway_response["body"]))
+    assert json.loads(body) == response["body"]
+
+
+def test_read_headers_from_rest_api():
+    """
+    Check that headers are found in REST API requests, which keep the case of header
+    names.
+    """
+    payload = {
+        "resource": "/ryhti",
+        "path": "/ryhti",
+        "httpMethod": "POST",
+        "headers": {
+            "Accept-Encoding": "gzip, deflate",
+            "Content-Type": "application/json",
+            "If-None-Match": 'W/"first", "second"',
+        },
+        "multiValueHeaders": {
+            "Accept-Encoding": ["gzip, deflate"],
+            "Content-Type": ["application/json"],
+            "If-None-Match": ['W/"first", "second"'],
+        },
+        "queryStringParameters": None,
+        "requestContext": {"resourcePath": "/ryhti", "stage": "v0"},
+        "body": base64.b64encode(b'{"action": "get_plans"}').decode(),
+        "isBase64Encoded": True,
+    }
+    assert accepts_gzip(payload)
+    assert matches_etag(payload, '"first"')
+    assert matches_etag(payload, '"second"')
+    assert not matches_etag(payload, '"third"')
+    assert not accepts_gzip(payload | {"headers": None})
+
+
+def test_is_key_list():
+    """
+    Check that only lists of keys are accepted as excluded keys.
+    """
+    assert is_key_list([])
+    assert is_key_list(["geometry", "planObjects"])
+    assert not is_key_list("geometry")
+    assert not is_key_list([["geometry"]])
+    assert not is_key_list(["geometry", 1])
+
+
+def test_get_plan_etag(
+    session: Session,
+    rw_connection_string: str,
+    client_with_plan_data: RyhtiClient,
+    plan_instance: models.Plan,
+    another_plan_instance: models.Plan,
+    land_use_area_instance: models.LandUseArea,
+    text_plan_regulation_instance: models.PlanRegulation,
+):
+    """
+    Check that the ETag of a plan only changes when the plan data or the requested
+    representation change.
+    """
+    etag = get_plan_etag(rw_connection_string, plan_instance.id, {})
+    assert etag
+    assert etag == get_plan_etag(rw_connection_string, plan_instance.id, {})
+    assert etag != get_plan_etag(rw_connection_string, plan_instance.id, {"gzip": 1})
+    assert not get_plan_etag(rw_connection_string, str(uuid4()), {})
+    assert etag != get_plan_etag(rw_connection_string, another_plan_instance.id, {})
+
+    land_use_area_instance.height_unit = "blah"
+    session.commit()
+    object_etag = get_plan_etag(rw_connection_string, plan_instance.id, {})
+    assert object_etag != etag
+
+    text_plan_regulation_instance.ordering = 1000
+    session.commit()
+    assert get_plan_etag(rw_connection_string, plan_instance.id, {}) != object_etag
+
+
 def test_authenticate_to_xroad_ryhti_api(
     session: Session,
     client_with_plan_data: RyhtiClient,
@@ -472,6 +1290,61 @@ def test_authenticate_to_xroad_ryhti_api(
     assert client_with_plan_data.xroad_headers["Authorization"] == "Bearer test-token"
 
 
+def test_authenticate_with_cached_token(
+    session: Session,
+    client_with_plan_data: RyhtiClient,
+    mock_xroad_ryhti_authenticate: Callable,
+    requests_mock,
+):
+    """
+    Test that X-Road token is cached between clients, and refreshed when it is about
+    to expire.
+    """
+    call_count = requests_mock.call_count
+    client_with_plan_data.xroad_ryhti_authenticate()
+    assert requests_mock.call_count == call_count + 1
+    client_with_plan_data.xroad_ryhti_authenticate()
+    assert requests_mock.call_count == call_count + 1
+    assert client_with_plan_data.xroad_headers["Authorization"] == "Bearer test-token"
+
+    token_key = ("test-id", "FI")
+    ryhti_client.xroad_tokens[token_key] = ("old-token", time.time() + 1)
+    client_with_plan_data.xroad_ryhti_authenticate()
+    assert requests_mock.call_count == call_count + 2
+    assert client_with_plan_data.xroad_headers["Authorization"] == "Bearer test-token"
+    assert ryhti_client.xroad_tokens[token_key][0] == "test-token"
+
+
+def test_authenticate_again_if_token_is_rejected(
+    session: Session,
+    client_with_plan_data: RyhtiClient,
+    mock_xroad_ryhti_authenticate: Callable,
+    requests_mock,
+):
+    """
+    Test that X-Road request is retried with a new token if the cached token is
+    rejected.
+    """
+    ryhti_client.xroad_tokens[("test-id", "FI")] = ("old-token", time.time() + 3600)
+    client_with_plan_data.xroad_ryhti_authenticate()
+    assert client_with_plan_data.xroad_headers["Authorization"] == "Bearer old-token"
+    url = (
+        client_with_plan_data.xroad_server_address
+        + client_with_plan_data.xroad_api_path
+        + "RegionalPlanMatter/MK-123456"
+    )
+    requests_mock.get(url, [{"status_code": 401}, {"json": {}, "status_code": 200}])
+
+    response = client_with_plan_data.request(
+        "GET", url, headers=client_with_plan_data.xroad_headers
+    )
+    assert response.status_code == 200
+    assert requests_mock.request_history[-1].headers["Authorization"] == (
+        "Bearer test-token"
+    )
+    assert client_with_plan_data.xroad_headers["Authorization"] == "Bearer test-token"
+
+
 @pytest.fixture()
 def authenticated_client_with_valid_plan(
     session: Session,
@@ -676,6 +1549,40 @@ def test_upload_unchanged_plan_documents(
     assert plan_instance.documents[0].exported_file_key == old_file_key
 
 
+def test_upload_unchanged_plan_documents_without_last_modified(
+    session: Session,
+    authenticated_client_with_valid_plan: RyhtiClient,
+    plan_instance: models.Plan,
+    mock_public_map_document_without_last_modified: Callable,
+    mock_xroad_ryhti_fileupload: Callable,
+):
+    """
+    Check that plan documents are compared by checksum if the server does not report
+    when they were last modified, and unchanged documents are not uploaded.
+    """
+    responses = authenticated_client_with_valid_plan.upload_plan_documents()
+    authenticated_client_with_valid_plan.set_plan_documents(responses)
+    session.refresh(plan_instance.documents[0])
+    assert plan_instance.documents[0].exported_file_key
+    assert plan_instance.documents[0].exported_file_checksum
+    document_id = plan_instance.documents[0].id
+    assert authenticated_client_with_valid_plan.metrics["document_bytes"][document_id]
+    assert (
+        document_id
+        in authenticated_client_with_valid_plan.metrics["document_upload_seconds"]
+    )
+
+    old_file_key = plan_instance.documents[0].exported_file_key
+    reupload_responses = authenticated_client_with_valid_plan.upload_plan_documents()
+    for document_responses in reupload_responses.values():
+        for document_response in document_responses:
+            assert document_response["status"] is None
+            assert document_response["detail"] == "File unchanged since last upload."
+    authenticated_client_with_valid_plan.set_plan_documents(reupload_responses)
+    session.refresh(plan_instance.documents[0])
+    assert plan_instance.documents[0].exported_file_key == old_file_key
+
+
 def test_set_permanent_plan_identifiers_in_wrong_region(
     session: Session,
     authenticated_client_with_valid_plan_in_wrong_region: RyhtiClient,
@@ -850,6 +1757,46 @@ def test_validate_plan_matters(
         ]
 
 
+def test_validate_plan_matters_concurrently(
+    client_with_plan_with_permanent_identifier: RyhtiClient,
+    plan_instance: models.Plan,
+    mock_xroad_ryhti_validate_invalid: Callable,
+):
+    """
+    Check that concurrent plan matter validation returns the same responses, and
+    sends plan matters one at a time when there is only a single X-Road slot
+    """
+    client = client_with_plan_with_permanent_identifier
+    # Validating a plan matter only needs the plan matter dictionary
+    another_plan_id = str(uuid4())
+    client.plan_matter_dictionaries[another_plan_id] = dict(
+        client.plan_matter_dictionaries[plan_instance.id]
+    )
+    responses = client.validate_plan_matters()
+    assert list(responses.keys()) == [plan_instance.id, another_plan_id]
+    client.max_workers = 4
+    client.xroad_slots = threading.BoundedSemaphore(1)
+    send = client.http.request
+    in_flight = {"now": 0, "max": 0}
+    in_flight_lock = threading.Lock()
+
+    def request(*args, **kwargs):
+        with in_flight_lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            # Give the other plan time to send its request, if it may
+            time.sleep(0.1)
+            return send(*args, **kwargs)
+        finally:
+            with in_flight_lock:
+                in_flight["now"] -= 1
+
+    client.http.request = request
+    assert client.validate_plan_matters() == responses
+    assert in_flight["max"] == 1
+
+
 def test_save_plan_matter_validation_responses(
     session: Session,
     client_with_plan_with_permanent_identifier: RyhtiClient,
@@ -1033,3 +1980,115 @@ def test_save_update_existing_matter_phase_post_responses(
     assert plan_instance.exported_at
     assert not plan_instance.to_be_exported
     assert plan_instance.validation_errors == "Kaava-asian vaihe on päivitetty Ryhtiin."
+
+
+def test_skip_unchanged_plan_matter_phase(
+    session: Session,
+    client_with_plan_matter_to_be_posted: RyhtiClient,
+    plan_instance: models.Plan,
+    requests_mock,
+):
+    """
+    Check that the plan matter phase is not updated if it only differs from the
+    phase in Ryhti by generated keys, and the plan is no longer marked to be exported.
+    """
+    client = client_with_plan_matter_to_be_posted
+    plan_matter = client.valid_plan_matters[plan_instance.id]
+    remote_phase = {
+        **plan_matter["planMatterPhases"][0],
+        "planMatterPhaseKey": "third_phase_test",
+    }
+    plan_matter_url = "http://mock2.url:8080/r1/FI/GOV/0996189-5/Ryhti-Syke-service/planService/api/RegionalPlanMatter/MK-123456"
+    requests_mock.get(
+        plan_matter_url,
+        json={**plan_matter, "planMatterPhases": [remote_phase]},
+        json_encoder=JSONEncoder,
+    )
+    put = requests_mock.put(
+        plan_matter_url + "/phase/third_phase_test", json={"warnings": []}
+    )
+    responses = client.post_plan_matters()
+    assert responses[plan_instance.id]["status"] == 304
+    assert not put.called
+    assert client.metrics["plan_matter_phase_unchanged"][plan_instance.id]
+
+    client.save_plan_matter_post_responses(responses)
+    session.refresh(plan_instance)
+    assert not plan_instance.to_be_exported
+    assert (
+        plan_instance.validation_errors
+        == "Kaava-asian vaihe on jo ajan tasalla Ryhtissä."
+    )
+
+
+def test_post_plan_matter_from_known_state(
+    session: Session,
+    client_with_plan_matter_to_be_posted: RyhtiClient,
+    plan_instance: models.Plan,
+    requests_mock,
+):
+    """
+    Check that a known plan matter phase is updated without fetching the plan matter
+    first, and not updated at all if it hasn't changed since the last export.
+    """
+    client = client_with_plan_matter_to_be_posted
+    plan_matter = client.valid_plan_matters[plan_instance.id]
+    lifecycle_status = plan_matter["planMatterPhases"][0]["lifeCycleStatus"]
+    plan_matter_url = "http://mock2.url:8080/r1/FI/GOV/0996189-5/Ryhti-Syke-service/planService/api/RegionalPlanMatter/MK-123456"
+    get = requests_mock.get(plan_matter_url, status_code=404)
+    put = requests_mock.put(
+        plan_matter_url + "/phase/third_phase_test", json={"warnings": []}
+    )
+    client.plans[plan_instance.id].plan_matter_state = {
+        "permanentPlanIdentifier": "MK-123456",
+        "phaseKeys": {lifecycle_status: "third_phase_test"},
+        "digest": None,
+    }
+    responses = client.post_plan_matters()
+    assert responses[plan_instance.id]["status"] == 200
+    assert put.call_count == 1
+    assert not get.called
+
+    client.save_plan_matter_post_responses(responses)
+    session.refresh(plan_instance)
+    state = plan_instance.plan_matter_state
+    assert state["phaseKeys"] == {lifecycle_status: "third_phase_test"}
+    assert state["digest"]
+
+    # Unchanged phase is not sent at all
+    client.plans[plan_instance.id].to_be_exported = True
+    responses = client.post_plan_matters()
+    assert responses[plan_instance.id]["status"] == 304
+    assert put.call_count == 1
+    assert not get.called
+
+
+def test_post_plan_matter_from_out_of_date_state(
+    session: Session,
+    client_with_plan_matter_to_be_posted: RyhtiClient,
+    plan_instance: models.Plan,
+    mock_xroad_ryhti_update_existing_plan_matter: Callable,
+    requests_mock,
+):
+    """
+    Check that the plan matter is fetched if the known phase is not found in Ryhti,
+    and the phase found in Ryhti is updated instead.
+    """
+    client = client_with_plan_matter_to_be_posted
+    plan_matter = client.valid_plan_matters[plan_instance.id]
+    lifecycle_status = plan_matter["planMatterPhases"][0]["lifeCycleStatus"]
+    plan_matter_url = "http://mock2.url:8080/r1/FI/GOV/0996189-5/Ryhti-Syke-service/planService/api/RegionalPlanMatter/MK-123456"
+    requests_mock.put(plan_matter_url + "/phase/deleted_phase", status_code=404)
+    client.plans[plan_instance.id].plan_matter_state = {
+        "permanentPlanIdentifier": "MK-123456",
+        "phaseKeys": {lifecycle_status: "deleted_phase"},
+        "digest": None,
+    }
+    responses = client.post_plan_matters()
+    assert responses[plan_instance.id]["status"] == 200
+
+    client.save_plan_matter_post_responses(responses)
+    session.refresh(plan_instance)
+    assert plan_instance.plan_matter_state["phaseKeys"] == {
+        lifecycle_status: "third_phase_test"
+    }
@@ -4,6 +4,7 @@ import codes
 import models
 from geoalchemy2.shape import from_shape
 from shapely.geometry import MultiLineString, MultiPoint, MultiPolygon, shape
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 
@@ -665,3 +666,68 @@ def test_add_plan_id_fkey_triggers(
 
     # Delete created objects from the test database
     session.rollback()
+
+
+def test_mark_plan_changed_triggers(
+    session: Session,
+    plan_instance: models.Plan,
+    land_use_area_instance: models.LandUseArea,
+    text_plan_regulation_instance: models.PlanRegulation,
+):
+    # Start with an empty queue of changed plans
+    session.query(models.PlanChange).delete()
+    session.commit()
+
+    # Editing a plan object marks its plan changed
+    land_use_area_instance.height_unit = "blah"
+    session.commit()
+    plan_change = session.query(models.PlanChange).one()
+    assert plan_change.plan_id == plan_instance.id
+    first_modified_at = plan_change.modified_at
+
+    # Editing a regulation marks the plan of its regulation group changed again
+    text_plan_regulation_instance.ordering = 1000
+    session.commit()
+    session.refresh(plan_change)
+    assert session.query(models.PlanChange).count() == 1
+    assert plan_change.modified_at > first_modified_at
+
+    # Changes made by Ryhti client are not tracked
+    session.query(models.PlanChange).delete()
+    session.execute(text("SET LOCAL hame.skip_change_tracking = 'on'"))
+    plan_instance.exported_at = datetime.now()
+    session.commit()
+    assert session.query(models.PlanChange).count() == 0
+
+
+def test_invalidate_plan_object_fragment_triggers(
+    session: Session,
+    plan_instance: models.Plan,
+    land_use_area_instance: models.LandUseArea,
+):
+    def add_fragment() -> None:
+        session.add(
+            models.PlanObjectFragment(
+                plan_id=plan_instance.id,
+                plan_object_id=land_use_area_instance.id,
+                object_modified_at=land_use_area_instance.modified_at,
+                fragment={"planObjectKey": land_use_area_instance.id},
+            )
+        )
+        session.commit()
+
+    # Changing the lifecycle dates of a plan object removes its fragment
+    add_fragment()
+    lifecycle_date = land_use_area_instance.lifecycle_dates[0]
+    lifecycle_date.ending_at = datetime.now()
+    session.commit()
+    assert session.query(models.PlanObjectFragment).count() == 0
+
+    # Deleting a plan object removes its fragment
+    add_fragment()
+    session.delete(land_use_area_instance)
+    session.flush()
+    assert session.query(models.PlanObjectFragment).count() == 0
+
+    # Delete created objects from the test database
+    session.rollback()
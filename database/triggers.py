@@ -374,3 +374,185 @@ def generate_add_plan_id_fkey_triggers():
         trgs.append(trg)
 
     return trgs, [trgfunc]
+
+
+def get_lifecycle_date_plan_id(lifecycle_date: str) -> str:
+    """
+    Returns SQL expression for the plan id of the given lifecycle date row.
+    """
+    plan_ids = [f"{lifecycle_date}.plan_id"]
+    for table in plan_object_tables:
+        plan_ids.append(
+            f"(SELECT plan_id FROM hame.{table} WHERE id = {lifecycle_date}.{table}_id)"
+        )
+    for table in plan_regulation_tables:
+        plan_ids.append(
+            f"""(
+                SELECT prg.plan_id
+                FROM
+                    hame.{table} rt
+                    JOIN hame.plan_regulation_group prg
+                        ON prg.id = rt.plan_regulation_group_id
+                WHERE rt.id = {lifecycle_date}.{table}_id
+            )"""
+        )
+    return (
+        "coalesce(\n                "
+        + ",\n                ".join(plan_ids)
+        + "\n            )"
+    )
+
+
+def get_changed_plan_ids_query(table: str, row: str) -> str:
+    """
+    Returns SQL query for the ids of the plans that the given row of the given table
+    belongs to.
+    """
+    if table == "plan":
+        return f"SELECT {row}.id"
+    if table == "organisation":
+        return f"SELECT id FROM hame.plan WHERE organisation_id = {row}.id"
+    if table in plan_regulation_tables or table == "regulation_group_association":
+        return (
+            "SELECT plan_id FROM hame.plan_regulation_group "
+            f"WHERE id = {row}.plan_regulation_group_id"
+        )
+    if table in (
+        "additional_information",
+        "type_of_verbal_regulation_association",
+    ):
+        return f"""
+            SELECT prg.plan_id
+            FROM
+                hame.plan_regulation pr
+                JOIN hame.plan_regulation_group prg
+                    ON prg.id = pr.plan_regulation_group_id
+            WHERE pr.id = {row}.plan_regulation_id
+            """
+    if table == "lifecycle_date":
+        return f"SELECT {get_lifecycle_date_plan_id(row)}"
+    if table == "event_date":
+        return f"""
+            SELECT {get_lifecycle_date_plan_id("ld")}
+            FROM hame.lifecycle_date ld
+            WHERE ld.id = {row}.lifecycle_date_id
+            """
+    # All the other tables refer to plan directly
+    return f"SELECT {row}.plan_id"
+
+
+# All tables whose changes change the plan data. Association tables are not models.
+plan_change_tables = [
+    table
+    for table in hame_tables
+    if table not in ("plan_change", "plan_object_fragment")
+] + [
+    "regulation_group_association",
+    "type_of_verbal_regulation_association",
+    "legal_effects_association",
+]
+
+
+def generate_mark_plan_changed_triggers():
+    trgs = []
+    trgfuncs = []
+    for table in plan_change_tables:
+        trgfunc_signature = f"trgfunc_{table}_mark_plan_changed()"
+        trgfunc_definition = f"""
+        RETURNS TRIGGER AS $$
+        BEGIN
+            -- Ryhti client does not mark plans changed when saving its results
+            IF current_setting('hame.skip_change_tracking', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO hame.plan_change (plan_id)
+                SELECT id FROM hame.plan
+                WHERE id IN ({get_changed_plan_ids_query(table, "NEW")})
+                ON CONFLICT (plan_id) DO UPDATE SET modified_at = CURRENT_TIMESTAMP;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                INSERT INTO hame.plan_change (plan_id)
+                SELECT id FROM hame.plan
+                WHERE id IN ({get_changed_plan_ids_query(table, "OLD")})
+                ON CONFLICT (plan_id) DO UPDATE SET modified_at = CURRENT_TIMESTAMP;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+        """
+        trgfunc = PGFunction(
+            schema="hame", signature=trgfunc_signature, definition=trgfunc_definition
+        )
+        trgfuncs.append(trgfunc)
+
+        trg_signature = f"trg_{table}_mark_plan_changed"
+        trg_definition = f"""
+        AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW
+        EXECUTE FUNCTION hame.{trgfunc_signature}
+        """
+        trg = PGTrigger(
+            schema="hame",
+            signature=trg_signature,
+            on_entity=f"hame.{table}",
+            is_constraint=False,
+            definition=trg_definition,
+        )
+        trgs.append(trg)
+
+    return trgs, trgfuncs
+
+
+def generate_invalidate_plan_object_fragment_triggers():
+    trgs = []
+    trgfuncs = []
+    # Changes to plan object rows are detected by modified_at, but deleted plan
+    # objects and changes to their lifecycle dates must remove the fragments
+    fragment_id_columns = {table: ["id"] for table in plan_object_tables}
+    fragment_id_columns["lifecycle_date"] = [
+        f"{table}_id" for table in plan_object_tables
+    ]
+    for table, id_columns in fragment_id_columns.items():
+        operations = (
+            "INSERT OR UPDATE OR DELETE" if table == "lifecycle_date" else "DELETE"
+        )
+        new_ids = ", ".join(f"NEW.{column}" for column in id_columns)
+        old_ids = ", ".join(f"OLD.{column}" for column in id_columns)
+        trgfunc_signature = f"trgfunc_{table}_invalidate_plan_object_fragment()"
+        trgfunc_definition = f"""
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                DELETE FROM hame.plan_object_fragment
+                WHERE plan_object_id IN ({new_ids});
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM hame.plan_object_fragment
+                WHERE plan_object_id IN ({old_ids});
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+        """
+        trgfunc = PGFunction(
+            schema="hame", signature=trgfunc_signature, definition=trgfunc_definition
+        )
+        trgfuncs.append(trgfunc)
+
+        trg_signature = f"trg_{table}_invalidate_plan_object_fragment"
+        trg_definition = f"""
+        AFTER {operations} ON {table}
+        FOR EACH ROW
+        EXECUTE FUNCTION hame.{trgfunc_signature}
+        """
+        trg = PGTrigger(
+            schema="hame",
+            signature=trg_signature,
+            on_entity=f"hame.{table}",
+            is_constraint=False,
+            definition=trg_definition,
+        )
+        trgs.append(trg)
+
+    return trgs, trgfuncs
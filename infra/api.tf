@@ -38,6 +38,10 @@ resource "aws_api_gateway_rest_api" "lambda_api" {
     ]
   })
 
+  # Gzip compressed responses are binary. REST API only passes them on if their
+  # media type is binary. This also makes request bodies arrive base64 encoded.
+  binary_media_types = ["*/*"]
+
   endpoint_configuration {
     types = ["PRIVATE"]
     vpc_endpoint_ids = [aws_vpc_endpoint.lambda_api.id]
@@ -86,6 +90,7 @@ resource "aws_api_gateway_deployment" "api_deployment" {
       jsonencode(aws_api_gateway_resource.ryhti_client),
       jsonencode(aws_api_gateway_method.ryhti_call),
       jsonencode(aws_api_gateway_integration.lambda_integration),
+      jsonencode(aws_api_gateway_rest_api.lambda_api.binary_media_types),
     ]))
   }
 
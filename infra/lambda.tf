@@ -110,6 +110,9 @@ resource "aws_lambda_function" "ryhti_client" {
       XROAD_MEMBER_CLIENT_NAME = var.x-road_subdomain
       XROAD_SYKE_CLIENT_ID = var.syke_xroad_client_id
       XROAD_SYKE_CLIENT_SECRET_ARN = aws_secretsmanager_secret.syke-xroad-client-secret.arn
+      RYHTI_MAX_WORKERS = 4
+      RYHTI_PIPELINE_WORKERS = 4
+      RYHTI_DOCUMENT_UPLOAD_WORKERS = 4
     }
   }
   tags = merge(local.default_tags, { Name = "${var.prefix}-ryhti_client" })